@@ -11,6 +11,7 @@ import traceback
 from dataclasses import dataclass
 
 import dapper.stats
+import dapper.tools.multiproc as mp
 
 
 def da_method(*default_dataclasses):
@@ -112,7 +113,10 @@ def da_method(*default_dataclasses):
             # Assimilate
             time0 = time.time()
             try:
-                _assimilate(self, HMM, xx, yy)
+                # Any multiprocessing (by the method or the model)
+                # reuses the same pool throughout the run.
+                with mp.Pool():
+                    _assimilate(self, HMM, xx, yy)
             except Exception as ERR:
                 if fail_gently:
                     self.crashed = True
@@ -1,5 +1,7 @@
 """The EnKF and other ensemble-based methods."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import numpy.random as rnd
 import scipy.linalg as sla
@@ -553,14 +555,19 @@ class LETKF:
     (`batch_size=(2,2)` or less) it is quicker.
 
     NB: If `len(ii)` is small, analysis may be slowed-down with '-N' infl.
+
+    With `batched` (default), the local analyses are computed together,
+    by `batched_local_analyses`, and `mp` instead distributes
+    the groups of local domains among threads.
     """
 
     N: int
     loc_rad: float
-    taper: str = 'GC'
-    xN: float  = 1.0
-    g: int     = 0
-    mp: bool   = False
+    taper: str    = 'GC'
+    xN: float     = 1.0
+    g: int        = 0
+    mp: bool      = False
+    batched: bool = True
 
     def assimilate(self, HMM, xx, yy):
         N = self.N
@@ -596,49 +603,54 @@ class LETKF:
                 # Avoid pickling self
                 xN, g, infl = self.xN, self.g, self.infl
 
-                def local_analysis(ii):
-                    """Do the local analysis.
-
-                    Notation:
-
-                    - `ii`: inds. for the state batch defining the locality
-                    - `jj`: inds. for the associated obs
-                    """
-                    # Locate local obs
-                    jj, tapering = obs_taperer(ii)
-                    if len(jj) == 0:
-                        return E[:, ii], N1  # no update
-                    Y_jj   = Y[:, jj]
-                    dy_jj  = dy[jj]
-
-                    # Adaptive inflation
-                    za = effective_N(Y_jj, dy_jj, xN, g) if infl == '-N' else N1
-
-                    # Taper
-                    Y_jj  *= sqrt(tapering)
-                    dy_jj *= sqrt(tapering)
-
-                    # Compute ETKF update
-                    if len(jj) < N:
-                        # SVD version
-                        V, sd, _ = svd0(Y_jj)
-                        d      = pad0(sd**2, N) + za
-                        Pw     = (V * d**(-1.0)) @ V.T
-                        T      = (V * d**(-0.5)) @ V.T * sqrt(za)
-                    else:
-                        # EVD version
-                        d, V  = sla.eigh(Y_jj@Y_jj.T + za*eye(N))
-                        T     = V@diag(d**(-0.5))@V.T * sqrt(za)
-                        Pw    = V@diag(d**(-1.0))@V.T
-                    AT  = T @ A[:, ii]
-                    dmu = dy_jj @ Y_jj.T @ Pw @ A[:, ii]
-                    Eii = mu[ii] + dmu + AT
-                    return Eii, za
-
-                # Run local analyses
-                EE, za = zip(*_map(local_analysis, state_batches))
-                for ii, Eii in zip(state_batches, EE):
-                    E[:, ii] = Eii
+                if self.batched:
+                    E, za = batched_local_analyses(
+                        E, Y, dy, state_batches, obs_taperer,
+                        infl, xN, g, threads=self.mp)
+                else:
+                    def local_analysis(ii):
+                        """Do the local analysis.
+
+                        Notation:
+
+                        - `ii`: inds. for the state batch defining the locality
+                        - `jj`: inds. for the associated obs
+                        """
+                        # Locate local obs
+                        jj, tapering = obs_taperer(ii)
+                        if len(jj) == 0:
+                            return E[:, ii], N1  # no update
+                        Y_jj   = Y[:, jj]
+                        dy_jj  = dy[jj]
+
+                        # Adaptive inflation
+                        za = effective_N(Y_jj, dy_jj, xN, g) if infl == '-N' else N1
+
+                        # Taper
+                        Y_jj  *= sqrt(tapering)
+                        dy_jj *= sqrt(tapering)
+
+                        # Compute ETKF update
+                        if len(jj) < N:
+                            # SVD version
+                            V, sd, _ = svd0(Y_jj)
+                            d      = pad0(sd**2, N) + za
+                            Pw     = (V * d**(-1.0)) @ V.T
+                            T      = (V * d**(-0.5)) @ V.T * sqrt(za)
+                        else:
+                            # EVD version
+                            d, V  = sla.eigh(Y_jj@Y_jj.T + za*eye(N))
+                            T     = V@diag(d**(-0.5))@V.T * sqrt(za)
+                            Pw    = V@diag(d**(-1.0))@V.T
+                        AT  = T @ A[:, ii]
+                        dmu = dy_jj @ Y_jj.T @ Pw @ A[:, ii]
+                        Eii = mu[ii] + dmu + AT
+                        return Eii, za
+
+                    # Run local analyses
+                    EE, za = zip(*_map(local_analysis, state_batches))
+                    for ii, Eii in zip(state_batches, EE):
+                        E[:, ii] = Eii
 
                 # Global post-processing
                 E = post_process(E, self.infl, self.rot)
@@ -648,6 +660,80 @@ class LETKF:
             self.stats.assess(k, ko, E=E)
 
 
+def batched_local_analyses(E, Y, dy, state_batches, obs_taperer,
+                           infl, xN, g, threads=False):
+    """Do the LETKF local analyses of all of the `state_batches` together.
+
+    The batches are grouped by their number of local obs, `p`,
+    and the ETKF transforms of each group are computed by a single
+    (stacked) `eigh` of the `(nbatch, N, N)` array of `Y Y^T + za I`.
+    The transforms are then applied to the state batches of equal size together.
+    With `threads`, the groups are distributed among threads
+    (numpy releases the GIL in `eigh` and `matmul`).
+
+    `Y` and `dy` must be pre-whitened by `R`.
+    Returns the updated ensemble and the `za` of each state batch.
+    """
+    N, N1 = len(E), len(E)-1
+    mu    = np.mean(E, 0)
+    A     = E - mu
+    nB    = len(state_batches)
+
+    # Locate local obs, and group the batches by their number
+    local = [obs_taperer(ii) for ii in state_batches]
+    groups = {}
+    for b, (jj, _) in enumerate(local):
+        if len(jj):  # otherwise: no update
+            groups.setdefault(len(jj), []).append(b)
+
+    za = np.full(nB, float(N1))
+    # The update of each batch is Eii = mu[ii] + G @ A[:, ii],
+    # with G = T + w (added to each row).
+    G  = np.zeros((nB, N, N))
+
+    def solve(bb):
+        jj       = np.array([local[b][0] for b in bb])        # (nb, p)
+        tapering = np.array([local[b][1] for b in bb])        # (nb, p)
+        Y_jj     = Y[:, jj].transpose(1, 0, 2)                # (nb, N, p)
+        dy_jj    = dy[jj]                                     # (nb, p)
+
+        # Adaptive inflation
+        if infl == '-N':
+            za[bb] = [effective_N(Yb, dyb, xN, g) for Yb, dyb in zip(Y_jj, dy_jj)]
+        zb = za[bb][:, None, None]
+
+        # Taper
+        Y_jj  = Y_jj * sqrt(tapering)[:, None, :]
+        dy_jj = dy_jj * sqrt(tapering)
+
+        # Compute ETKF update (EVD version)
+        d, V = np.linalg.eigh(Y_jj @ Y_jj.transpose(0, 2, 1) + zb*eye(N))
+        VT   = V.transpose(0, 2, 1)
+        T    = (V * d[:, None, :]**(-0.5)) @ VT * sqrt(zb)
+        Pw   = (V * d[:, None, :]**(-1.0)) @ VT
+        w    = np.einsum('bp,bnp,bnm->bm', dy_jj, Y_jj, Pw)
+        G[bb] = T + w[:, None, :]
+
+    if threads and len(groups) > 1:
+        with ThreadPoolExecutor(mp.NMAX) as pool:
+            list(pool.map(solve, groups.values()))
+    else:
+        for bb in groups.values():
+            solve(bb)
+
+    # Apply the updates, grouping the batches by their size
+    sizes = {}
+    for bb in groups.values():
+        for b in bb:
+            sizes.setdefault(len(state_batches[b]), []).append(b)
+    for bb in sizes.values():
+        ii = np.array([state_batches[b] for b in bb])         # (nb, len(ii))
+        A_ii = A[:, ii].transpose(1, 0, 2)                    # (nb, N, len(ii))
+        E[:, ii] = (mu[ii][:, None, :] + G[bb] @ A_ii).transpose(1, 0, 2)
+
+    return E, za
+
+
 def effective_N(YR, dyR, xN, g):
     """Effective ensemble size N.
 
@@ -53,6 +53,7 @@ else:
     x = Path(x)
 rc.dirs.data = x / "dpr_data"
 rc.dirs.samples = rc.dirs.data / "samples"
+rc.dirs.simulations = rc.dirs.data / "simulations"
 
 # Expanduser, create dir
 for d in rc.dirs:
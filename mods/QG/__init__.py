@@ -115,7 +115,7 @@ class model_config:
                 # Note: the relative overhead for parallelization decreases
                 # as the ratio dtout/dt increases.
                 # But the overhead is already negligible with a ratio of 4.
-                E = np.array(mp.map(self.step_1, E, t=t, dt=dt))
+                E = mp.map_members(self.step_1, E, t=t, dt=dt)
             else:  # NON-PARALLELIZED:
                 for n, x in enumerate(E):
                     E[n] = self.step_1(x, t, dt)
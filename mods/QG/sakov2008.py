@@ -69,7 +69,7 @@ localizer = nd_Id_localization(shape[::-1], batch_shape[::-1], obs_inds, periodi
 Obs = {
     'M': Ny,
     'model': hmod,
-    'noise': modelling.GaussRV(C=4*np.eye(Ny)),
+    'noise': modelling.GaussRV(C=4, M=Ny),
     'localizer': localizer,
 }
 
@@ -14,6 +14,7 @@ from dapper.mods.Qgs.qgs.params.params import QgParams
 from dapper.mods.Qgs.qgs.functions.tendencies import create_tendencies
 from dapper.mods.Qgs.qgs.integrators.integrator import RungeKuttaIntegrator
 from dapper.mods.Qgs.qgs.integrators.integrate import integrate_runge_kutta
+from dapper.mods.Qgs.qgs.integrators.checkpoint import spin_up, spin_up_key
 
 
 if __name__ == "__main__":
@@ -98,15 +99,20 @@ if __name__ == "__main__":
 
 
     #2:Time(need to modify)    
-    to_time = transient_time + integration_time
+    # The transient is integrated (once, then cached) by spin_up below,
+    # so the experiment starts directly on the attractor.
+    to_time = integration_time
     dt = 100*0.1
-    t = modelling.Chronology(dt=dt, dto=100*dt, T=to_time,  BurnIn=transient_time)
+    t = modelling.Chronology(dt=dt, dto=100*dt, T=to_time)
     #t = modelling.Chronology(dt=dt, dto=100, T=to_time,  BurnIn=transient_time)
     
-    np.random.seed(21217) 
-    ic = np.random.rand(50,model_parameters.ndim)*0.01
-    x0=ic
-    X0 = modelling.GaussRV(C=0.0, M=Dyn['M'])
+    # Spin-up from the (zero) mean of the initial distribution, restarted from
+    # its checkpoint (in the spin-up cache folder) if interrupted, and cached for the next runs
+    key = spin_up_key(model_parameters, 0.1, transient_time, None,
+                      integrator.b, integrator.c, integrator.a)
+    x0 = spin_up(integrator, transient_time, 0.1, np.zeros(Nx), segment_time=1000*dt,
+                 checkpoint=True, cache=True, key=key)
+    X0 = modelling.GaussRV(C=0.0, mu=x0)
 
     jj = np.arange(Nx)  # obs_inds
     Obs = modelling.partial_Id_Obs(Nx, jj)
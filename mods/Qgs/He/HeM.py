@@ -19,9 +19,8 @@ from multiprocessing import freeze_support, get_start_method
 
 from dapper.mods.Qgs.qgs.params.params import QgParams
 from dapper.mods.Qgs.qgs.functions.tendencies import create_tendencies
-from dapper.mods.Qgs.qgs.integrators.integrator import RungeKuttaIntegrator
-from dapper.mods.Qgs.qgs.integrators.integrate import integrate_runge_kutta
-import dapper.tools.multiproc as mp
+from dapper.mods.Qgs import QgsEnsembleStepper
+from dapper.mods.Qgs.qgs.integrators.checkpoint import spin_up, spin_up_key
 
 
 if __name__ == "__main__":
@@ -70,7 +69,8 @@ if __name__ == "__main__":
 
     model_parameters.print_params()
 
-    f, Df = create_tendencies(model_parameters)   
+    f, Df, f_ens, Df_ens, Df_dot, Df_tdot = create_tendencies(model_parameters, return_ensemble_tendencies=True,
+                                                              return_jacobian_action=True)
     # ## Time integration
     # Defining an integrator
    # integrator = RungeKuttaIntegrator()
@@ -81,24 +81,8 @@ if __name__ == "__main__":
 # step = with_rk4(f, autonom=False)
 # 
 # =============================================================================
-    integrator = RungeKuttaIntegrator()
-    integrator.set_func(f)
-    
-    
-    def step_1(x0, t0, dt):
-       y = x0
-       integrator.integrate(t0, t0+dt, 0.1, ic=y, write_steps=0)
-       t0, y0 = integrator.get_trajectories()
-       #y = np.round(y,7)
-       #t,y = integrate_runge_kutta(f, t0, t0+dt, 0.1, ic=y, forward=True,write_steps=0, b=None, c=None, a=None)
-       return y0
-   
-    def step(E, t, dt):
-      if E.ndim == 1:
-          return step_1(E, t, dt)
-      if E.ndim == 2:
-          E = np.array(mp.map(step_1, E, t=t, dt=dt))
-          return E
+    # In-process ensemble stepper: all members are advanced in a single jitted call
+    step = QgsEnsembleStepper(f, 0.1, f_ens=f_ens, Df_dot=Df_dot)
 ###
 #parameter setting
 
@@ -106,22 +90,29 @@ if __name__ == "__main__":
     Dyn = {
         'M': Nx,
         'model': step,
-        'linear': Df,
+        'linear': step.linear,
         'noise': 0.0,
     }
 
 
 
     #2:Time(need to modify)    
-    to_time = transient_time + integration_time
+    # The transient is integrated (once, then cached) by spin_up below,
+    # so the experiment starts directly on the attractor.
+    to_time = integration_time
     dt = 100*0.1
-    t = modelling.Chronology(dt=dt, dto=100*dt, T=to_time,  BurnIn=transient_time)
+    t = modelling.Chronology(dt=dt, dto=100*dt, T=to_time)
     #t = modelling.Chronology(dt=dt, dto=100, T=to_time,  BurnIn=transient_time)
     
-    np.random.seed(21217) 
+    seed = 21217
+    np.random.seed(seed) 
     ic = np.random.rand(model_parameters.ndim)*0.01
     
-    x0=ic
+    # Spin-up, restarted from its checkpoint (in the spin-up cache folder) if interrupted,
+    # and cached for the next runs
+    key = spin_up_key(model_parameters, step.dt, transient_time, seed, step.b, step.c, step.a)
+    x0 = spin_up(step, transient_time, step.dt, ic, segment_time=1000*dt,
+                 checkpoint=True, cache=True, key=key)
     X0 = modelling.GaussRV(C=0.0, mu=x0)
 
     jj = np.arange(Nx)  # obs_inds
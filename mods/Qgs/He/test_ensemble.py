@@ -32,8 +32,7 @@ from multiprocessing import freeze_support, get_start_method
 
 from dapper.mods.Qgs.qgs.params.params import QgParams
 from dapper.mods.Qgs.qgs.functions.tendencies import create_tendencies
-from dapper.mods.Qgs.qgs.integrators.integrator import RungeKuttaIntegrator
-from dapper.mods.Qgs.qgs.integrators.integrate import integrate_runge_kutta
+from dapper.mods.Qgs import QgsEnsembleStepper
 # Initializing the random number generator (for reproducibility). -- Disable if needed.
 np.random.seed(21217)
 
@@ -107,12 +106,11 @@ if __name__ == "__main__":
         model_parameters.print_params()
 
     # Creating the tendencies functions
-    f, Df = create_tendencies(model_parameters)
+    f, Df, f_ens, Df_ens = create_tendencies(model_parameters, return_ensemble_tendencies=True)
 
     # ## Time integration
     # Defining an integrator
-    integrator = RungeKuttaIntegrator()
-    integrator.set_func(f)
+    step = QgsEnsembleStepper(f, dt, f_ens=f_ens)
 
     # Start on a random initial condition
     #ic = np.random.rand(model_parameters.ndim)*0.01
@@ -126,9 +124,8 @@ if __name__ == "__main__":
     total_time = 0.
     t_up = ws * dt / integration_time * 100
     while total_time < transient_time:
-        integrator.integrate(0., ws * dt, dt, ic=y, write_steps=0)
-        t, y = integrator.get_trajectories()
-        total_time += t
+        y = step(y, total_time, ws * dt)
+        total_time += ws * dt
         if total_time/transient_time * 100 % 0.1 < t_up:
             print_progress(total_time/transient_time)
             
@@ -142,9 +139,8 @@ if __name__ == "__main__":
 
     print(Bcolors.OKBLUE + "Starting the time evolution ..." + Bcolors.ENDC)
     while total_time < integration_time:
-        integrator.integrate(0., write_steps * dt, dt, ic=y, write_steps=0)
-        t, y = integrator.get_trajectories()
-        total_time += t
+        y = step(y, total_time, write_steps * dt)
+        total_time += write_steps * dt
         #ty = np.insert(y, 0, total_time)
        # traj = np.concatenate((traj, ty[np.newaxis, ...]))
         if total_time/integration_time*100 % 0.1 < t_up:
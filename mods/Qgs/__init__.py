@@ -25,7 +25,15 @@ import sys,os
 # Importing the model's modules
 from dapper.mods.Qgs.qgs.params.params import QgParams
 from dapper.mods.Qgs.qgs.integrators.integrator import RungeKuttaIntegrator
-from dapper.mods.Qgs.qgs.functions.tendencies import create_tendencies
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_runge_kutta_jit, _integrate_runge_kutta_ens_jit
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_dormand_prince_jit, _integrate_runge_kutta_csr_jit
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_etdrk4_jit, _integrate_etdrk4_ens_jit
+from dapper.mods.Qgs.qgs.integrators.integrate import etdrk4_coefficients
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_runge_kutta_tgls_batch_jit
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_runge_kutta_ens_members_jit
+from dapper.mods.Qgs.qgs.integrators.trajectory import TrajectoryWriter
+from dapper.mods.Qgs.qgs.integrators.checkpoint import spin_up, spin_up_key
+from dapper.mods.Qgs.qgs.functions.tendencies import create_tendencies, create_parametric_tendencies
 
 # Initializing the random number generator (for reproducibility). -- Disable if needed.
 
@@ -48,9 +56,10 @@ class QGS_model:
     self.transient_time = tr
     # integration time on the attractor
     self.integration_time = inte
-   def algorithm(self,atx=2,aty=2,otx=2,oty=4):
-    # file where to write the output
-    filename = "evol_fields.dat"
+   def algorithm(self,atx=2,aty=2,otx=2,oty=4,dtype=np.float64,spin_up_cache=True):
+    # file where to write the output (rows of time and state, use np.float32 as dtype to halve its size)
+    filename = "evol_fields.npy"
+    seed = 21217
 
     # Setting some model parameters
     # Model parameters instantiation with default specs
@@ -78,39 +87,314 @@ class QGS_model:
     # Defining an integrator
     integrator = RungeKuttaIntegrator()
     integrator.set_func(f)
-    np.random.seed(21217)
+    np.random.seed(seed)
     # Start on a random initial condition
     ic = np.random.rand(model_parameters.ndim)*0.01
     # Integrate over a transient time to obtain an initial condition on the attractors
+    # (or get it from the spin-up cache if it was already computed)
     print('start')  
     ws = 10000
-    y = ic
+    key = spin_up_key(model_parameters, self.dt, self.transient_time, seed,
+                      integrator.b, integrator.c, integrator.a)
+    # checkpoint of the transient integration (in the spin-up cache folder), to restart it if interrupted
+    y = spin_up(integrator, self.transient_time, self.dt, ic, segment_time=ws * self.dt,
+                checkpoint=True, cache=spin_up_cache, key=key)
+    # Now integrate to obtain a trajectory on the attractor, streamed to the output file
     total_time = 0.
-    #t_up = ws * self.dt / self.integration_time * 100
-    while total_time < self.transient_time:
-        integrator.integrate(0., ws * self.dt, self.dt, ic=y, write_steps=0)
-        t, y = integrator.get_trajectories()
-        total_time += t
-    # Now integrate to obtain a trajectory on the attractor
-    total_time = 0.
-    traj = np.insert(y, 0, total_time)
-    traj = traj[np.newaxis, ...]
     #t_up = self.write_steps * self.dt / self.integration_time * 100
 
     print('finish spin up')
-    while total_time < self.integration_time:
-        integrator.integrate(0., self.write_steps * self.dt, self.dt, ic=y, write_steps=0)
-        t, y = integrator.get_trajectories()
-        total_time += t
-        ty = np.insert(y, 0, total_time)
-        traj = np.concatenate((traj, ty[np.newaxis, ...]))
+    with TrajectoryWriter(filename, model_parameters.ndim, dtype=dtype) as writer:
+        writer.append(total_time, y)
+        while total_time < self.integration_time:
+            integrator.integrate(0., self.write_steps * self.dt, self.dt, ic=y, write_steps=0)
+            integrator.write_trajectories(writer, total_time)
+            t, y = integrator.get_trajectories()
+            total_time += t
     print('finish integration')  
 
-    np.savetxt(filename, traj)
+    traj = np.load(filename, mmap_mode='r')
     return traj
 
 
+class QgsEnsembleStepper:
+    """In-process time stepper of a qgs model, for use as `Dyn.model`.
+
+    Advances a state (1D array) or an ensemble (2D array of shape `(N, ndim)`)
+    from `t` to `t+dt` with the fixed-step Runge-Kutta scheme of qgs
+    (RK4 by default). The whole ensemble is integrated in a single
+    jitted call: no worker processes are involved,
+    so nothing is pickled nor sent through queues.
+
+    Parameters
+    ----------
+    f: callable
+        The numba-jitted tendencies `f(t, x)`, as returned by `create_tendencies`.
+    dt: float
+        The internal integration time step.
+        The `dt` requested by DAPPER is split in steps of (at most) this length.
+    f_ens: callable, optional
+        The numba-jitted ensemble tendencies `f_ens(t, X)`
+        (see `return_ensemble_tendencies` in `create_tendencies`).
+        If provided, each Runge-Kutta stage evaluates all members at once.
+        Otherwise, the members are advanced one after the other with `f`.
+        If the tendencies carry their tensor (attribute `tensor_csr`, set by
+        `create_tendencies`), the fixed step integration uses instead a kernel
+        cached on disk, which is not compiled again in every process.
+    b, c, a: ndarray, optional
+        Coefficients of the Runge-Kutta method. Default: RK4.
+    rtol: float, optional
+        If provided, integrate instead with the adaptive Dormand-Prince 5(4) scheme
+        with this relative tolerance, each member choosing its own time steps
+        (`dt` is then only the first trial step). Default: fixed step.
+    atol: float, optional
+        Absolute tolerance of the adaptive scheme.
+    Df_dot: callable, optional
+        The numba-jitted matrix-free Jacobian action `Df_dot(t, X, V)`
+        (see `return_jacobian_action` in `create_tendencies`).
+        Required by `linear`, together with `f_ens`.
+
+    Example
+    -------
+    >>> f, Df, f_ens, Df_ens, Df_dot, Df_tdot = create_tendencies(
+    ...     params, return_ensemble_tendencies=True, return_jacobian_action=True)
+    >>> step = QgsEnsembleStepper(f, 0.1, f_ens, Df_dot=Df_dot)
+    >>> Dyn = {'M': params.ndim, 'model': step, 'linear': step.linear}
+    """
+
+    def __init__(self, f, dt, f_ens=None, b=None, c=None, a=None, rtol=None, atol=1e-8, Df_dot=None):
+        self.f = f
+        self.f_ens = f_ens
+        self.tensor_csr = getattr(f_ens if f_ens is not None else f, 'tensor_csr', None)
+        self.Df_dot = Df_dot
+        self.dt = dt
+        self.rtol = rtol
+        self.atol = atol
+
+        # Default is RK4
+        if a is None and b is None and c is None:
+            c = np.array([0., 0.5, 0.5, 1.])
+            b = np.array([1./6, 1./3, 1./3, 1./6])
+            a = np.zeros((len(c), len(b)))
+            a[1, 0] = 0.5
+            a[2, 1] = 0.5
+            a[3, 2] = 1.
+        self.a = a
+        self.b = b
+        self.c = c
+
+    @classmethod
+    def from_params(cls, params, dt, parallel=False, **kwargs):
+        """Build the tendencies of the model defined by `params` and wrap them."""
+        f, Df, f_ens, Df_ens, Df_dot, Df_tdot = create_tendencies(
+            params, return_ensemble_tendencies=True, parallel_ensemble=parallel,
+            return_jacobian_action=True)
+        return cls(f, dt, f_ens=f_ens, Df_dot=Df_dot, **kwargs)
+
+    def time(self, t, dt):
+        """The internal time steps from `t` to `t+dt`."""
+        n = max(1, int(np.ceil(dt/self.dt - 1e-9)))
+        time = t + self.dt*np.arange(n+1)
+        time[-1] = t + dt
+        return time
+
+    def __call__(self, E, t, dt):
+        E = np.asarray(E, dtype=float)
+        ens = E.ndim == 2
+        E = np.atleast_2d(E)
+        time = self.time(t, dt)
+
+        if self.rtol is not None:
+            traj = _integrate_dormand_prince_jit(
+                self.f, time, E, 1, 0, self.rtol, self.atol, np.inf)
+        elif self.tensor_csr is not None:
+            traj = _integrate_runge_kutta_csr_jit(
+                *self.tensor_csr, time, E, 1, 0, self.b, self.c, self.a)
+        elif self.f_ens is not None:
+            traj = _integrate_runge_kutta_ens_jit(
+                self.f_ens, time, E, 1, 0, self.b, self.c, self.a)
+        else:
+            traj = _integrate_runge_kutta_jit(
+                self.f, time, E, 1, 0, self.b, self.c, self.a)
+
+        E = traj[:, :, -1]
+        return E if ens else E[0]
+
+    def linear(self, x, t, dt, V=None):
+        """The tangent linear model (TLM) of the step from `t` to `t+dt`, for use as `Dyn.linear`.
+
+        The tangent vectors are propagated with the Runge-Kutta scheme of the stepper
+        (fixed step, even if `rtol` is set) and the matrix-free Jacobian action `Df_dot`,
+        without forming the Jacobian matrices.
+
+        Parameters
+        ----------
+        x: ndarray
+            The state (1D) or ensemble (2D, shape `(N, ndim)`) linearized around.
+        V: ndarray, optional
+            Tangent vectors, of shape `(ndim, n_vec)` or `(N, ndim, n_vec)`.
+            Default: the identity, yielding the resolvent matrix `(ndim, ndim)`
+            of the step (or one per member).
+
+        Returns
+        -------
+        ndarray
+            The propagated tangent vectors, shaped like `V`.
+        """
+        if self.Df_dot is None or self.f_ens is None:
+            raise ValueError("The tangent linear model requires `f_ens` and `Df_dot`.")
+        x = np.asarray(x, dtype=float)
+        ens = x.ndim == 2
+        X = np.atleast_2d(x)
+        if V is None:
+            V = np.eye(X.shape[1])
+        V = np.asarray(V, dtype=float)
+        if V.ndim == 2:
+            V = np.repeat(V[None], len(X), axis=0)
+        time = self.time(t, dt)
+
+        traj, M = _integrate_runge_kutta_tgls_batch_jit(
+            self.f_ens, self.Df_dot, time, X, np.ascontiguousarray(V),
+            1, 0, self.b, self.c, self.a, 1.)
+
+        M = M[..., -1]
+        return M if ens else M[0]
+
+
+class QgsEtdStepper(QgsEnsembleStepper):
+    """In-process exponential time stepper of a qgs model, for use as `Dyn.model`.
+
+    Same as `QgsEnsembleStepper`, but with the ETDRK4 scheme of Cox and Matthews:
+    the linear part `L` of the tendencies is integrated exactly,
+    and only the nonlinear part `f_nl` is treated with Runge-Kutta stages
+    (like `step_ETD_RK4` of `dapper.mods.KS`).
+    The coefficients (matrix functions of `L`) are computed once per step length.
+
+    Parameters
+    ----------
+    L: ndarray
+        The linear part of the tendencies, of shape `(ndim, ndim)`.
+    f_nl: callable
+        The numba-jitted nonlinear part of the tendencies `f_nl(t, x)`
+        (see `return_linear_part` in `create_tendencies`).
+    dt: float
+        The internal integration time step.
+    f_nl_ens: callable, optional
+        The numba-jitted ensemble version `f_nl_ens(t, X)` of `f_nl`.
+        If provided, each stage evaluates all members at once.
+
+    Example
+    -------
+    >>> f, Df, L, f_nl = create_tendencies(params, return_linear_part=True)
+    >>> Dyn = {'M': params.ndim, 'model': QgsEtdStepper(L, f_nl, 0.5), 'linear': Df}
+    """
+
+    def __init__(self, L, f_nl, dt, f_nl_ens=None):
+        self.L = np.asarray(L, dtype=float)
+        self.f_nl = f_nl
+        self.f_nl_ens = f_nl_ens
+        self.dt = dt
+        self.Df_dot = None
+        self._coeffs = {}
+
+    @classmethod
+    def from_params(cls, params, dt, parallel=False):
+        """Build the tendencies of the model defined by `params` and wrap them."""
+        f, Df, f_ens, Df_ens, L, f_nl, f_nl_ens = create_tendencies(
+            params, return_ensemble_tendencies=True, parallel_ensemble=parallel,
+            return_linear_part=True)
+        return cls(L, f_nl, dt, f_nl_ens=f_nl_ens)
+
+    def coefficients(self, h):
+        """The ETDRK4 coefficients for the step length `h` (cached)."""
+        key = round(h, 12)
+        if key not in self._coeffs:
+            self._coeffs[key] = etdrk4_coefficients(self.L, h)
+        return self._coeffs[key]
+
+    def __call__(self, E, t, dt):
+        E = np.asarray(E, dtype=float)
+        ens = E.ndim == 2
+        E = np.atleast_2d(E)
+        time = self.time(t, dt)
+        coeffs = np.array([self.coefficients(time[1] - time[0]),
+                           self.coefficients(time[-1] - time[-2])])
+
+        if self.f_nl_ens is not None:
+            traj = _integrate_etdrk4_ens_jit(self.f_nl_ens, time, E, 0, coeffs)
+        else:
+            traj = _integrate_etdrk4_jit(self.f_nl, time, E, 0, coeffs)
+
+        E = traj[:, :, -1]
+        return E if ens else E[0]
+
+
+class QgsParametricStepper(QgsEnsembleStepper):
+    """In-process time stepper of a qgs model whose members have their own parameters.
+
+    For augmented-state parameter estimation: the state is the model state
+    (`ndim` components) followed by the estimated parameters,
+    which the step leaves unchanged (persistence).
+    Each member is integrated with its own parameters,
+    all members at once in a single jitted call,
+    with a single compilation of the tendencies.
+
+    Parameters
+    ----------
+    tensor_values: callable
+        The numba-jitted function `tensor_values(P)`
+        (see `return_ensemble_tendencies` in `create_parametric_tendencies`).
+    f_ens: callable
+        The numba-jitted ensemble tendencies `f_ens(t, X, V)`.
+    p: ndarray
+        The parameters vector of the model. Its non-estimated components
+        are used by all members.
+    dt: float
+        The internal integration time step.
+    indices: list of int
+        The components of `p` which are estimated,
+        i.e. appended to the model state.
+    b, c, a: ndarray, optional
+        Coefficients of the Runge-Kutta method. Default: RK4.
+
+    Example
+    -------
+    >>> step = QgsParametricStepper.from_params(params, 0.1, ['kd', 'kdp'])
+    >>> Dyn = {'M': params.ndim + 2, 'model': step, 'noise': 0}
+    """
+
+    def __init__(self, tensor_values, f_ens, p, dt, indices, b=None, c=None, a=None):
+        super().__init__(None, dt, b=b, c=c, a=a)
+        self.tensor_values = tensor_values
+        self.f_ens_params = f_ens
+        self.p = np.asarray(p, dtype=float)
+        self.indices = np.asarray(indices, dtype=int)
+
+    @classmethod
+    def from_params(cls, params, dt, names, **kwargs):
+        """Build the parametric tendencies of the model defined by `params` and wrap them.
+
+        `names` are the estimated parameters, among the `affine_parameters`
+        of the tensor (e.g. `'kd'`, `'Cpa[0]'`).
+        """
+        f, Df, p, tensor_values, f_ens, Df_ens, qgtensor = create_parametric_tendencies(
+            params, return_ensemble_tendencies=True, return_qgtensor=True)
+        indices = [qgtensor.affine_parameters.index(name) for name in names]
+        return cls(tensor_values, f_ens, p, dt, indices, **kwargs)
+
+    def __call__(self, E, t, dt):
+        E = np.asarray(E, dtype=float)
+        ens = E.ndim == 2
+        E = np.atleast_2d(E)
+        ndim = E.shape[1] - len(self.indices)
+        time = self.time(t, dt)
 
- 
+        P = np.repeat(self.p[None], len(E), axis=0)
+        P[:, self.indices] = E[:, ndim:]
+        traj = _integrate_runge_kutta_ens_members_jit(
+            self.f_ens_params, time, np.ascontiguousarray(E[:, :ndim]),
+            self.tensor_values(P), 1, 0, self.b, self.c, self.a)
 
-   
+        E = E.copy()
+        E[:, :ndim] = traj[:, :, -1]
+        return E if ens else E[0]
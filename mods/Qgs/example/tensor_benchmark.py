@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the construction of the qgs tendencies tensor: vectorized path against the
+element-by-element reference path, for increasing MAOOAM truncations.
+
+The reference path takes tens of minutes from the 6x6-6x6 truncation on, set
+`reference` to False in the configurations below to skip it.
+"""
+
+# In[Modules import]
+
+import sys, os
+sys.path.extend([os.path.abspath('../')])
+import time
+import numpy as np
+
+from qgs.params.params import QgParams
+from qgs.inner_products.analytic import AtmosphericAnalyticInnerProducts, OceanicAnalyticInnerProducts
+from qgs.tensors.qgtensor import QgsTensor
+
+# In[Configurations]
+
+# (atmospheric nx, ny, oceanic nx, ny, compute also the reference tensor)
+configurations = [(2, 2, 2, 4, True),
+                  (6, 6, 6, 6, True),
+                  (8, 8, 8, 8, False),
+                  (10, 10, 10, 10, False)]
+
+
+def build(vectorized):
+    t0 = time.time()
+    aip = AtmosphericAnalyticInnerProducts(model_parameters, vectorized=vectorized)
+    oip = OceanicAnalyticInnerProducts(model_parameters, vectorized=vectorized)
+    aip.connect_to_ocean(oip)
+    t1 = time.time()
+    agotensor = QgsTensor(model_parameters, aip, oip, vectorized=vectorized)
+    t2 = time.time()
+    return agotensor, t1 - t0, t2 - t1
+
+
+# In[Benchmark]
+
+for a_nx, a_ny, o_nx, o_ny, reference in configurations:
+
+    model_parameters = QgParams()
+    model_parameters.set_atmospheric_channel_fourier_modes(a_nx, a_ny)
+    model_parameters.set_oceanic_basin_fourier_modes(o_nx, o_ny)
+
+    print("Atmosphere {}x{} - Ocean {}x{}: ndim = {}".format(a_nx, a_ny, o_nx, o_ny, model_parameters.ndim))
+
+    agotensor, tip, ttensor = build(True)
+    print("    vectorized: inner products {:.2f} s, tensor {:.2f} s, nnz = {}".format(tip, ttensor, agotensor.tensor.nnz))
+
+    if reference:
+        ref_tensor, tip, ttensor = build(False)
+        print("    reference:  inner products {:.2f} s, tensor {:.2f} s".format(tip, ttensor))
+        diff = np.max(np.abs(agotensor.tensor.todense() - ref_tensor.tensor.todense()))
+        print("    max. absolute difference: {:.3e}".format(diff))
@@ -0,0 +1,179 @@
+import sys
+import os
+
+path = os.path.abspath('./')
+base = os.path.basename(path)
+if base == 'model_test':
+    sys.path.extend([os.path.abspath('../')])
+else:
+    sys.path.extend([path])
+
+
+import unittest
+import tempfile
+import numpy as np
+
+from qgs.params.params import QgParams
+from qgs.diagnostics import projection
+from qgs.diagnostics.projection import FieldsProjector, grid_basis, clear_grid_basis_cache
+from qgs.diagnostics.streamfunctions import MiddleAtmosphericStreamfunctionDiagnostic
+from qgs.diagnostics.streamfunctions import LowerLayerAtmosphericStreamfunctionDiagnostic
+from qgs.diagnostics.streamfunctions import OceanicLayerStreamfunctionDiagnostic
+from qgs.diagnostics.temperatures import MiddleAtmosphericTemperatureDiagnostic, OceanicLayerTemperatureDiagnostic
+from qgs.diagnostics.wind import UpperLayerAtmosphericUWindDiagnostic, MiddleAtmosphericVWindDiagnostic
+from qgs.diagnostics.wind import LowerLayerAtmosphericWindIntensityDiagnostic
+from qgs.diagnostics.eddy import MiddleAtmosphericEddyHeatFluxDiagnostic
+from qgs.diagnostics.variables import VariablesDiagnostic, GeopotentialHeightDifferenceDiagnostic
+from qgs.diagnostics.multi import MultiDiagnostic
+from qgs.diagnostics.base import LazyDiagnostic
+
+
+class TestFieldsProjector(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2)
+        pars.set_oceanic_basin_fourier_modes(2, 4)
+        cls.params = pars
+        cls.data = 0.01 * np.random.RandomState(3).randn(pars.ndim, 11)
+
+    def test_grid_basis_cache(self):
+        clear_grid_basis_cache()
+        psi = MiddleAtmosphericStreamfunctionDiagnostic(self.params)
+        theta = MiddleAtmosphericTemperatureDiagnostic(self.params)
+        self.assertIs(psi._grid_basis, theta._grid_basis)
+        self.assertFalse(psi._grid_basis.flags.writeable)
+        X, Y = psi._X, psi._Y
+        self.assertIsNot(grid_basis(self.params.atmospheric_basis, X, Y, derivative='x'), psi._grid_basis)
+        self.assertIsNot(grid_basis(self.params.atmospheric_basis, X[:, :-1], Y[:, :-1]), psi._grid_basis)
+
+    def test_grid_basis_cache_eviction(self):
+        clear_grid_basis_cache()
+        basis = self.params.atmospheric_basis
+        X, Y = np.meshgrid(np.linspace(0., 6., 20), np.linspace(0., 3., 10))
+        max_size = projection.grid_basis_cache_max_size
+        try:
+            first = grid_basis(basis, X, Y)
+            projection.grid_basis_cache_max_size = 2 * first.nbytes
+            second = grid_basis(basis, X, Y, derivative='x')
+            self.assertIs(grid_basis(basis, X, Y), first)
+            # the least recently used grid is dropped
+            third = grid_basis(basis, X, Y, derivative='y')
+            self.assertIs(grid_basis(basis, X, Y), first)
+            self.assertIs(grid_basis(basis, X, Y, derivative='y'), third)
+            self.assertIsNot(grid_basis(basis, X, Y, derivative='x'), second)
+            self.assertEqual(len(projection._grid_basis_cache), 2)
+            # a grid larger than the cache is still returned
+            projection.grid_basis_cache_max_size = first.nbytes // 2
+            self.assertTrue(np.array_equal(grid_basis(basis, X, Y), first))
+            self.assertEqual(len(projection._grid_basis_cache), 1)
+        finally:
+            projection.grid_basis_cache_max_size = max_size
+            clear_grid_basis_cache()
+
+    def test_diagnostics(self):
+        diagnostics = {'psi_a': MiddleAtmosphericStreamfunctionDiagnostic,
+                       'psi_a3': LowerLayerAtmosphericStreamfunctionDiagnostic,
+                       'theta_a': MiddleAtmosphericTemperatureDiagnostic,
+                       'u_a1': UpperLayerAtmosphericUWindDiagnostic,
+                       'v_a': MiddleAtmosphericVWindDiagnostic,
+                       'psi_o': OceanicLayerStreamfunctionDiagnostic,
+                       'T_o': OceanicLayerTemperatureDiagnostic}
+        delta_x, delta_y = 0.3, 0.2
+        for dimensional in [False, True]:
+            projector = FieldsProjector(self.params, list(diagnostics.keys()), delta_x, delta_y, dimensional)
+            fields = projector(self.data)
+            for name, diagnostic in diagnostics.items():
+                ref = diagnostic(self.params, delta_x, delta_y, dimensional=dimensional)(None, self.data)
+                self.assertEqual(fields[name].shape, ref.shape)
+                self.assertTrue(np.allclose(fields[name], ref, rtol=1.e-12, atol=1.e-12 * np.abs(ref).max()))
+
+    def test_float32(self):
+        projector = FieldsProjector(self.params, ['psi_a', 'geopotential'], dtype=np.float32)
+        fields = projector(self.data[:, 0])
+        ref = FieldsProjector(self.params, ['psi_a', 'geopotential'])(self.data[:, 0])
+        self.assertEqual(fields['geopotential'].dtype, np.float32)
+        self.assertEqual(fields['geopotential'].shape, projector.grid_shape)
+        self.assertTrue(np.allclose(fields['geopotential'], ref['geopotential'], rtol=1.e-4, atol=1.e-3))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            FieldsProjector(self.params, ['psi_x'])
+
+
+class TestLazyDiagnostics(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2)
+        cls.params = pars
+        cls.time = np.arange(23) * 0.1
+        cls.data = 0.01 * np.random.RandomState(4).randn(pars.ndim, 23)
+
+    def _check(self, diagnostic_class):
+        ref = diagnostic_class(self.params)(self.time, self.data)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            data = np.memmap(os.path.join(tmpdir, 'traj.dat'), dtype=float, mode='w+', shape=self.data.shape)
+            data[:] = self.data
+            diagnostic = diagnostic_class(self.params)
+            diagnostic.set_data(self.time, data, lazy=True, chunk_size=5)
+            view = diagnostic.diagnostic
+            self.assertIsInstance(view, LazyDiagnostic)
+            self.assertEqual(view.shape, ref.shape)
+            self.assertEqual(len(diagnostic), len(ref))
+            self.assertTrue(np.allclose(view[7], ref[7]))
+            self.assertTrue(np.allclose(view[-1], ref[-1]))
+            self.assertTrue(np.allclose(view[2:19:3], ref[2:19:3]))
+            self.assertTrue(np.allclose(view[::-2, 1], ref[::-2, 1]))
+            self.assertTrue(np.allclose(np.asarray(view), ref))
+            for axis in [None, 0]:
+                self.assertTrue(np.allclose(view.mean(axis=axis), ref.mean(axis=axis)))
+                self.assertTrue(np.allclose(view.var(axis=axis), ref.var(axis=axis)))
+                self.assertTrue(np.allclose(view.min(axis=axis), ref.min(axis=axis)))
+                self.assertTrue(np.allclose(view.max(axis=axis), ref.max(axis=axis)))
+            self.assertTrue(np.isclose(np.max(view), ref.max()))
+            with self.assertRaises(ValueError):
+                view.mean(axis=1)
+            del view, data, diagnostic
+
+    def test_streamfunction(self):
+        self._check(LowerLayerAtmosphericStreamfunctionDiagnostic)
+
+    def test_wind_intensity(self):
+        self._check(LowerLayerAtmosphericWindIntensityDiagnostic)
+
+    def test_not_time_local(self):
+        diagnostic = MiddleAtmosphericEddyHeatFluxDiagnostic(self.params)
+        ref = diagnostic(self.time, self.data)
+        res = diagnostic(self.time, self.data, lazy=True)
+        self.assertIsInstance(res, np.ndarray)
+        self.assertTrue(np.allclose(ref, res))
+
+    def test_variables(self):
+        for dimensional in [False, True]:
+            diagnostic = VariablesDiagnostic([2, 1, 0], self.params, dimensional)
+            ref = diagnostic(self.time, self.data)
+            res = diagnostic(self.time, self.data, lazy=True)
+            self.assertIsInstance(res, np.ndarray)
+            self.assertEqual(res.shape, (3, 23))
+            self.assertEqual(res[0].shape, (23,))
+            self.assertTrue(np.allclose(ref, res))
+            self.assertEqual(len(diagnostic), 23)
+
+    def test_multi_variables(self):
+        diagnostics = [VariablesDiagnostic([2, 1, 0], self.params, False),
+                       GeopotentialHeightDifferenceDiagnostic([[[np.pi / 3, 0.3], [np.pi / 3, 2.5]]], self.params, True)]
+        refs = [diagnostic(self.time, self.data) for diagnostic in diagnostics]
+        multi = MultiDiagnostic(1, 2)
+        multi.add_diagnostic(diagnostics[0])
+        multi.add_diagnostic(diagnostics[1])
+        multi.set_data(self.time, self.data, lazy=True)
+        for diagnostic, ref in zip(diagnostics, refs):
+            self.assertIsInstance(diagnostic.diagnostic, np.ndarray)
+            self.assertTrue(np.allclose(diagnostic.diagnostic, ref))
+
+
+if __name__ == "__main__":
+    unittest.main()
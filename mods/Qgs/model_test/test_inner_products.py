@@ -135,6 +135,58 @@ class TestSymbolicInnerProducts(TestBase):
                 _ip_string_format(tfunc, "W", [i, j], oip.W(i, j))
 
 
+class TestVectorizedAnalyticInnerProducts(unittest.TestCase):
+
+    def test_vectorized(self):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(3, 3)
+        pars.set_oceanic_basin_fourier_modes(3, 5)
+        pars.set_params({'kd': 0.04, 'kdp': 0.04, 'n': 1.5})
+
+        aip = analytic.AtmosphericAnalyticInnerProducts(pars)
+        oip = analytic.OceanicAnalyticInnerProducts(pars)
+        aip.connect_to_ocean(oip)
+
+        aip_ref = analytic.AtmosphericAnalyticInnerProducts(pars, vectorized=False)
+        oip_ref = analytic.OceanicAnalyticInnerProducts(pars, vectorized=False)
+        aip_ref.connect_to_ocean(oip_ref)
+
+        for ip, ip_ref, names in [(aip, aip_ref, ['_a', '_u', '_c', '_b', '_g', '_s', '_d']),
+                                  (oip, oip_ref, ['_M', '_U', '_N', '_O', '_C', '_K', '_W'])]:
+            for name in names:
+                val = getattr(ip, name).todense()
+                ref = getattr(ip_ref, name).todense()
+                self.assertEqual(val.shape, ref.shape)
+                self.assertTrue(np.allclose(val, ref, rtol=1.e-13, atol=real_eps), msg=name)
+
+
+class TestQuadratureInnerProducts(unittest.TestCase):
+
+    def test_quadrature(self):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2, mode='symbolic')
+        pars.set_oceanic_basin_fourier_modes(2, 4, mode='symbolic')
+
+        aip = symbolic.AtmosphericSymbolicInnerProducts(pars, quadrature=True)
+        oip = symbolic.OceanicSymbolicInnerProducts(pars, quadrature=True)
+
+        pars_ref = QgParams()
+        pars_ref.set_atmospheric_channel_fourier_modes(2, 2)
+        pars_ref.set_oceanic_basin_fourier_modes(2, 4)
+
+        aip_ref = analytic.AtmosphericAnalyticInnerProducts(pars_ref)
+        oip_ref = analytic.OceanicAnalyticInnerProducts(pars_ref)
+        aip_ref.connect_to_ocean(oip_ref)
+
+        for ip, ip_ref, names in [(aip, aip_ref, ['_a', '_u', '_c', '_b', '_g', '_s', '_d']),
+                                  (oip, oip_ref, ['_M', '_U', '_N', '_O', '_C', '_K', '_W'])]:
+            for name in names:
+                val = getattr(ip, name).todense()
+                ref = getattr(ip_ref, name).todense()
+                self.assertEqual(val.shape, ref.shape)
+                self.assertTrue(np.allclose(val, ref, rtol=1.e-12, atol=1.e-12), msg=name)
+
+
 def _ip_string_format(func, symbol, indices, value):
     if abs(value) >= real_eps:
         s = symbol
@@ -0,0 +1,473 @@
+
+import sys
+import os
+
+path = os.path.abspath('./')
+base = os.path.basename(path)
+if base == 'model_test':
+    sys.path.extend([os.path.abspath('../')])
+else:
+    sys.path.extend([path])
+
+
+import unittest
+import tempfile
+import numpy as np
+from numba import njit
+
+from qgs.integrators.integrate import _integrate_runge_kutta_jit, _integrate_runge_kutta_ens_jit
+from qgs.integrators.integrate import integrate_runge_kutta, integrate_dormand_prince, integrate_etdrk4
+from qgs.integrators.integrate import integrate_runge_kutta_tgls, integrate_runge_kutta_tgls_batch
+from qgs.integrators.integrate import integrate_runge_kutta_members, warm_up
+from qgs.integrators.integrator import RungeKuttaIntegrator, RungeKuttaTglsIntegrator, DormandPrinceIntegrator
+from qgs.integrators.trajectory import TrajectoryWriter, load_trajectory
+from qgs.integrators.checkpoint import SpinUpCache, spin_up, spin_up_key
+from qgs.params.params import QgParams
+from qgs.functions.tendencies import create_tendencies
+from dapper.mods.Qgs import QgsEnsembleStepper, QgsParametricStepper
+
+# Lorenz 84 model
+a = 0.25
+F = 16.
+G = 3.
+b = 6.
+
+
+@njit
+def fL84(t, x):
+    xx = -x[1] ** 2 - x[2] ** 2 - a * x[0] + a * F
+    yy = x[0] * x[1] - b * x[0] * x[2] - x[1] + G
+    zz = b * x[0] * x[1] + x[0] * x[2] - x[2]
+    return np.array([xx, yy, zz])
+
+
+@njit
+def DfL84(t, x):
+    return np.array([[     -a        , -2. * x[1], -2. * x[2]],
+                     [x[1] - b * x[2], -1. + x[0], -b * x[0]],
+                     [b * x[1] + x[2],  b * x[0], -1. + x[0]]])
+
+
+@njit
+def fL84_ens(t, X):
+    res = np.empty_like(X)
+    for n in range(X.shape[0]):
+        res[n] = fL84(t, X[n])
+    return res
+
+
+@njit
+def fL84_members(t, X, V):
+    # forcing F of each member in V
+    res = np.empty_like(X)
+    for n in range(X.shape[0]):
+        x = X[n]
+        res[n, 0] = -x[1] ** 2 - x[2] ** 2 - a * x[0] + a * V[n, 0]
+        res[n, 1] = x[0] * x[1] - b * x[0] * x[2] - x[1] + G
+        res[n, 2] = b * x[0] * x[1] + x[0] * x[2] - x[2]
+    return res
+
+
+@njit
+def DfL84_dot(t, X, V):
+    res = np.empty_like(V)
+    for n in range(X.shape[0]):
+        res[n] = DfL84(t, X[n]) @ V[n]
+    return res
+
+
+@njit
+def DfL84_tdot(t, X, V):
+    res = np.empty_like(V)
+    for n in range(X.shape[0]):
+        res[n] = DfL84(t, X[n]).T @ V[n]
+    return res
+
+
+# linear part and remaining terms of the Lorenz 84 tendencies
+LL84 = np.diag([-a, -1., -1.])
+
+
+@njit
+def fL84_nl(t, x):
+    return fL84(t, x) + np.array([a, 1., 1.]) * x
+
+
+@njit
+def fL84_nl_ens(t, X):
+    res = np.empty_like(X)
+    for n in range(X.shape[0]):
+        res[n] = fL84_nl(t, X[n])
+    return res
+
+
+# Lorenz 84 tendencies tensor in compressed rows form, acting on the augmented state [1, x]
+L84_csr = (np.array([0, 0, 4, 8, 11], dtype=np.int64),
+           np.array([[0, 0], [0, 1], [2, 2], [3, 3],
+                     [0, 0], [0, 2], [1, 2], [1, 3],
+                     [0, 3], [1, 2], [1, 3]], dtype=np.int64),
+           np.array([a * F, -a, -1., -1., G, -1., 1., -b, -1., b, 1.]))
+
+
+@njit
+def fL84_tensor(t, x):
+    return fL84(t, x)
+
+
+fL84_tensor.tensor_csr = L84_csr
+
+
+@njit
+def f_const(t, x):
+    return np.full(x.shape, 0.5)
+
+
+def rk4_coefficients():
+    c = np.array([0., 0.5, 0.5, 1.])
+    bb = np.array([1. / 6, 1. / 3, 1. / 3, 1. / 6])
+    aa = np.zeros((len(c), len(bb)))
+    aa[1, 0] = 0.5
+    aa[2, 1] = 0.5
+    aa[3, 2] = 1.
+    return bb, c, aa
+
+
+class TestEnsembleIntegration(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(3).randn(5, 3)
+        self.time = np.concatenate((np.arange(0., 2., 0.01), np.full((1,), 2.)))
+
+    def test_forward(self):
+        bb, c, aa = rk4_coefficients()
+        ref = _integrate_runge_kutta_jit(fL84, self.time, self.ic, 1, 7, bb, c, aa)
+        res = _integrate_runge_kutta_ens_jit(fL84_ens, self.time, self.ic, 1, 7, bb, c, aa)
+        self.assertEqual(ref.shape, res.shape)
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+    def test_backward(self):
+        bb, c, aa = rk4_coefficients()
+        ref = _integrate_runge_kutta_jit(fL84, self.time, self.ic, -1, 0, bb, c, aa)
+        res = _integrate_runge_kutta_ens_jit(fL84_ens, self.time, self.ic, -1, 0, bb, c, aa)
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+    def test_members(self):
+        ref = integrate_runge_kutta(fL84, 0., 2., 0.01, ic=self.ic, write_steps=7)
+        values = np.full((len(self.ic), 1), F)
+        res = integrate_runge_kutta_members(fL84_members, 0., 2., 0.01, self.ic, values, write_steps=7)
+        self.assertTrue(np.allclose(ref[0], res[0]))
+        self.assertTrue(np.allclose(ref[1], res[1], rtol=1.e-12, atol=1.e-14))
+
+        # each member is integrated with its own model
+        values[1:] = 8.
+        res = integrate_runge_kutta_members(fL84_members, 0., 2., 0.01, self.ic, values, write_steps=0)[1]
+        alone = integrate_runge_kutta_members(fL84_members, 0., 2., 0.01, self.ic[1:2], values[1:2], write_steps=0)[1]
+        self.assertTrue(np.allclose(ref[1][0, :, -1], res[0], rtol=1.e-12, atol=1.e-14))
+        self.assertTrue(np.allclose(alone[0], res[1], rtol=1.e-12, atol=1.e-14))
+        self.assertFalse(np.allclose(ref[1][1, :, -1], res[1]))
+
+
+class TestParametricStepper(unittest.TestCase):
+
+    def setUp(self):
+        self.params = QgParams()
+        self.params.set_atmospheric_channel_fourier_modes(2, 2)
+        self.ndim = self.params.ndim
+        rs = np.random.RandomState(7)
+        self.E = np.hstack([0.01 * rs.randn(3, self.ndim), [[0.1, 0.01], [0.05, 0.02], [0.2, 0.03]]])
+
+    def test_members(self):
+        step = QgsParametricStepper.from_params(self.params, 0.1, ['kd', 'kdp'])
+        res = step(self.E, 0., 1.)
+        self.assertTrue(np.array_equal(res[:, self.ndim:], self.E[:, self.ndim:]))
+
+        # each member is integrated with the model of its own parameters
+        for e, r in zip(self.E, res):
+            pars = QgParams()
+            pars.set_atmospheric_channel_fourier_modes(2, 2)
+            pars.set_params({'kd': e[self.ndim], 'kdp': e[self.ndim + 1]})
+            f, Df, f_ens, Df_ens = create_tendencies(pars, return_ensemble_tendencies=True, cache=False)
+            ref = QgsEnsembleStepper(f, 0.1, f_ens)(e[:self.ndim], 0., 1.)
+            self.assertTrue(np.allclose(ref, r[:self.ndim], rtol=1.e-12, atol=1.e-14))
+
+        self.assertTrue(np.allclose(step(self.E[1], 0., 1.), res[1], rtol=1.e-12, atol=1.e-14))
+
+
+class TestBatchTgls(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(5).randn(3, 3)
+        self.tg_ic = np.random.RandomState(6).randn(3, 3, 2)
+
+    def _compare(self, forward, adjoint):
+        for i in range(self.ic.shape[0]):
+            t, x, ref = integrate_runge_kutta_tgls(fL84, DfL84, 0., 1., 0.01, ic=self.ic[i], tg_ic=self.tg_ic[i].T,
+                                                   forward=forward, adjoint=adjoint, write_steps=10)
+            tt, xx, res = integrate_runge_kutta_tgls_batch(fL84_ens, DfL84_tdot if adjoint else DfL84_dot,
+                                                           0., 1., 0.01, self.ic, tg_ic=self.tg_ic,
+                                                           forward=forward, write_steps=10)
+            self.assertTrue(np.allclose(t, tt))
+            self.assertTrue(np.allclose(x, xx[i], rtol=1.e-10, atol=1.e-12))
+            self.assertTrue(np.allclose(ref, np.swapaxes(res[i], 0, 1), rtol=1.e-10, atol=1.e-12))
+
+    def test_forward(self):
+        self._compare(True, False)
+
+    def test_backward(self):
+        self._compare(False, False)
+
+    def test_adjoint(self):
+        self._compare(True, True)
+
+    def test_fundamental_matrix(self):
+        t, x, ref = integrate_runge_kutta_tgls(fL84, DfL84, 0., 1., 0.01, ic=self.ic[0], write_steps=0)
+        t, x, res = integrate_runge_kutta_tgls_batch(fL84_ens, DfL84_dot, 0., 1., 0.01, self.ic[0], write_steps=0)
+        self.assertEqual(res.shape, (3, 3))
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+
+class TestWorkersIntegrators(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(5).randn(7, 3)
+
+    def _integrate(self, integrator_class, forward, **kwargs):
+        integrator = integrator_class(num_threads=2, **kwargs)
+        if integrator_class is RungeKuttaIntegrator:
+            integrator.set_func(fL84)
+        else:
+            integrator.set_func(fL84, DfL84)
+        integrator.integrate(0., 1., 0.01, ic=self.ic, forward=forward, write_steps=3)
+        res = integrator.get_trajectories()
+        integrator.terminate()
+        return res
+
+    def test_shared_memory_forward(self):
+        ref = self._integrate(RungeKuttaIntegrator, True)
+        res = self._integrate(RungeKuttaIntegrator, True, shared_memory=True)
+        self.assertTrue(np.allclose(ref[0], res[0]))
+        self.assertEqual(ref[1].shape, res[1].shape)
+        self.assertTrue(np.allclose(ref[1], res[1], rtol=1.e-12, atol=1.e-14))
+
+    def test_shared_memory_backward_chunks(self):
+        ref = self._integrate(RungeKuttaIntegrator, False)
+        res = self._integrate(RungeKuttaIntegrator, False, shared_memory=True, chunk_size=3)
+        self.assertTrue(np.allclose(ref[1], res[1], rtol=1.e-12, atol=1.e-14))
+
+    def test_shared_memory_tgls(self):
+        ref = self._integrate(RungeKuttaTglsIntegrator, True)
+        res = self._integrate(RungeKuttaTglsIntegrator, True, shared_memory=True)
+        self.assertEqual(ref[2].shape, res[2].shape)
+        self.assertTrue(np.allclose(ref[1], res[1], rtol=1.e-12, atol=1.e-14))
+        self.assertTrue(np.allclose(ref[2], res[2], rtol=1.e-12, atol=1.e-14))
+
+    def test_threads(self):
+        ref = self._integrate(RungeKuttaIntegrator, False)
+        res = self._integrate(RungeKuttaIntegrator, False, backend='threads', chunk_size=2)
+        self.assertTrue(np.allclose(ref[0], res[0]))
+        self.assertTrue(np.allclose(ref[1], res[1], rtol=1.e-12, atol=1.e-14))
+
+    def test_threads_tgls(self):
+        ref = self._integrate(RungeKuttaTglsIntegrator, True)
+        res = self._integrate(RungeKuttaTglsIntegrator, True, backend='threads')
+        self.assertTrue(np.allclose(ref[1], res[1], rtol=1.e-12, atol=1.e-14))
+        self.assertTrue(np.allclose(ref[2], res[2], rtol=1.e-12, atol=1.e-14))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            RungeKuttaIntegrator(backend='mpi')
+
+
+class TestCachedKernels(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(6).randn(5, 3)
+        warm_up()
+
+    def test_integrate(self):
+        tt, ref = integrate_runge_kutta(fL84, 0., 1., 0.01, ic=self.ic, forward=False, write_steps=3)
+        t, res = integrate_runge_kutta(fL84_tensor, 0., 1., 0.01, ic=self.ic, forward=False, write_steps=3)
+        self.assertTrue(np.allclose(tt, t))
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+    def test_integrator(self):
+        tt, ref = integrate_runge_kutta(fL84, 0., 1., 0.01, ic=self.ic, write_steps=4)
+        for kwargs in [{}, {'shared_memory': True}, {'backend': 'threads'}]:
+            integrator = RungeKuttaIntegrator(num_threads=2, **kwargs)
+            integrator.set_func(fL84_tensor)
+            integrator.integrate(0., 1., 0.01, ic=self.ic, write_steps=4)
+            t, res = integrator.get_trajectories()
+            integrator.terminate()
+            self.assertTrue(np.allclose(tt, t))
+            self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+
+class TestDormandPrince(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(2).randn(4, 3)
+
+    def test_forward(self):
+        tt, ref = integrate_runge_kutta(fL84, 0., 3., 0.001, ic=self.ic, write_steps=500)
+        t, res = integrate_dormand_prince(fL84, 0., 3., 0.1, ic=self.ic, write_steps=5, rtol=1.e-10, atol=1.e-12)
+        self.assertTrue(np.allclose(tt, t))
+        self.assertEqual(ref.shape, res.shape)
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-5, atol=1.e-6))
+
+    def test_backward(self):
+        tt, ref = integrate_runge_kutta(fL84, 0., 1., 0.001, ic=self.ic, forward=False, write_steps=300)
+        t, res = integrate_dormand_prince(fL84, 0., 1., 0.1, ic=self.ic, forward=False, write_steps=3,
+                                          rtol=1.e-10, atol=1.e-12)
+        self.assertTrue(np.allclose(tt, t))
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-5, atol=1.e-6))
+
+    def test_final_state(self):
+        t, ref = integrate_dormand_prince(fL84, 0., 3., 0.1, ic=self.ic, write_steps=1, rtol=1.e-8)
+        t, res = integrate_dormand_prince(fL84, 0., 3., 0.1, ic=self.ic, write_steps=0, rtol=1.e-8)
+        self.assertEqual(t, 3.)
+        self.assertTrue(np.allclose(ref[..., -1], res, rtol=1.e-12, atol=1.e-14))
+
+    def test_integrator(self):
+        t, ref = integrate_dormand_prince(fL84, 0., 3., 0.1, ic=self.ic, write_steps=2, rtol=1.e-8, max_dt=0.5)
+        integrator = DormandPrinceIntegrator(num_threads=2, rtol=1.e-8, max_dt=0.5, backend='threads')
+        integrator.set_func(fL84)
+        integrator.integrate(0., 3., 0.1, ic=self.ic, write_steps=2)
+        tt, res = integrator.get_trajectories()
+        integrator.terminate()
+        self.assertTrue(np.allclose(tt, t))
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+
+class TestETDRK4(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(4).randn(4, 3)
+
+    def test_forward(self):
+        tt, ref = integrate_runge_kutta(fL84, 0., 1., 0.0001, ic=self.ic, write_steps=1000)
+        t, res = integrate_etdrk4(fL84_nl, LL84, 0., 1., 0.005, ic=self.ic, write_steps=20)
+        self.assertTrue(np.allclose(tt, t))
+        self.assertEqual(ref.shape, res.shape)
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-5, atol=1.e-5))
+
+    def test_ensemble(self):
+        t, ref = integrate_etdrk4(fL84_nl, LL84, 0., 1.05, 0.1, ic=self.ic, write_steps=3)
+        tt, res = integrate_etdrk4(fL84_nl, LL84, 0., 1.05, 0.1, ic=self.ic, write_steps=3, f_nl_ens=fL84_nl_ens)
+        self.assertTrue(np.allclose(tt, t))
+        self.assertEqual(t[-1], 1.05)
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+    def test_linear_exact(self):
+        # with a constant forcing, the scheme is exact whatever the timestep
+        L = np.array([[-1., 3., 0.], [-3., -1., 0.], [0., 0., -20.]])
+        t, res = integrate_etdrk4(f_const, L, 0., 2., 0.5, ic=self.ic[0], write_steps=0)
+        xs = np.linalg.solve(L, -np.full(3, 0.5))
+        lam, v = np.linalg.eig(L)
+        ref = xs + (v @ np.diag(np.exp(2. * lam)) @ np.linalg.solve(v, self.ic[0] - xs)).real
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-10, atol=1.e-12))
+
+
+class TestTrajectoryWriter(unittest.TestCase):
+
+    def test_chunks(self):
+        traj = np.random.RandomState(4).randn(3, 11)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'traj.npy')
+            with TrajectoryWriter(filename, 3, chunk_size=4) as writer:
+                writer.append(0., traj[:, 0])
+                writer.append(np.arange(1., 8.), traj[:, 1:8])
+                self.assertEqual(np.load(filename).shape, (8, 4))
+                writer.append(np.arange(8., 11.), traj[:, 8:])
+            self.assertEqual(writer.n_records, 11)
+            time, res = load_trajectory(filename)
+            self.assertTrue(np.all(time == np.arange(11.)))
+            self.assertTrue(np.all(res == traj))
+            del time, res
+
+    def test_float32(self):
+        traj = np.random.RandomState(4).randn(3, 5)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'traj.npy')
+            with TrajectoryWriter(filename, 3, dtype=np.float32) as writer:
+                writer.append(np.arange(5.), traj)
+            time, res = load_trajectory(filename, mmap_mode=None)
+            self.assertEqual(res.dtype, np.float32)
+            self.assertTrue(np.allclose(res, traj, rtol=1.e-6))
+
+    def test_integrator(self):
+        ic = 0.1 * np.random.RandomState(5).randn(3)
+        integrator = RungeKuttaIntegrator(num_threads=1, backend='threads')
+        integrator.set_func(fL84)
+        integrator.integrate(0., 1., 0.01, ic=ic, write_steps=10)
+        t, ref = integrator.get_trajectories()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'traj.npy')
+            with TrajectoryWriter(filename, 3) as writer:
+                integrator.write_trajectories(writer, 2.)
+            time, res = load_trajectory(filename, mmap_mode=None)
+        integrator.terminate()
+        self.assertTrue(np.allclose(time, t + 2.))
+        self.assertTrue(np.all(res == ref))
+
+
+def step_L84(x, t, dt):
+    return integrate_runge_kutta(fL84, t, t + dt, 0.01, ic=x, write_steps=0)[1]
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = 0.1 * np.random.RandomState(5).randn(3)
+
+    def test_integrator(self):
+        integrator = RungeKuttaIntegrator(num_threads=1, backend='threads')
+        integrator.set_func(fL84)
+        integrator.integrate(0., 2., 0.01, ic=self.ic, write_steps=0)
+        t, ref = integrator.get_trajectories()
+        integrator.integrate(0., 1., 0.01, ic=self.ic, write_steps=10)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'checkpoint.npz')
+            integrator.save_checkpoint(filename, 5.)
+            integrator.set_ic(None)
+            self.assertEqual(integrator.load_checkpoint(filename), 6.)
+        integrator.integrate(0., 1., 0.01, write_steps=0)
+        t, res = integrator.get_trajectories()
+        integrator.terminate()
+        self.assertTrue(np.allclose(ref, res, rtol=1.e-12, atol=1.e-14))
+
+    def test_spin_up(self):
+        ref = step_L84(self.ic, 0., 3.)
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SpinUpCache(directory)
+            checkpoint = os.path.join(directory, 'checkpoint.npz')
+            # interrupted run, then restarted from its checkpoint
+            spin_up(step_L84, 1., 0.01, self.ic, segment_time=1., checkpoint=checkpoint)
+            res = spin_up(step_L84, 3., 0.01, self.ic, segment_time=1., checkpoint=checkpoint, cache=cache, key='L84')
+            self.assertTrue(np.allclose(ref, res, rtol=1.e-10, atol=1.e-12))
+            self.assertFalse(os.path.exists(checkpoint))
+            # cached state
+            res = spin_up(None, 3., 0.01, self.ic, cache=cache, key='L84')
+            self.assertTrue(np.allclose(ref, res, rtol=1.e-10, atol=1.e-12))
+
+            # restarted from the checkpoint in the cache folder, removed once the state is cached
+            spin_up(step_L84, 1., 0.01, self.ic, segment_time=1., checkpoint=cache.checkpoint('L84b'))
+            self.assertTrue(cache.checkpoint('L84b').exists())
+            res = spin_up(step_L84, 3., 0.01, self.ic, segment_time=1., checkpoint=True, cache=cache, key='L84b')
+            self.assertTrue(np.allclose(ref, res, rtol=1.e-10, atol=1.e-12))
+            self.assertFalse(cache.checkpoint('L84b').exists())
+            with self.assertRaises(ValueError):
+                spin_up(step_L84, 3., 0.01, self.ic, checkpoint=True, cache=cache)
+
+    def test_spin_up_key(self):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2)
+        key = spin_up_key(pars, 0.1, 1.e6, 21217)
+        self.assertEqual(key, spin_up_key(pars, 0.1, 1.e6, 21217))
+        self.assertNotEqual(key, spin_up_key(pars, 0.1, 1.e6, 21218))
+        self.assertNotEqual(key, spin_up_key(pars, 0.05, 1.e6, 21217))
+        bb, c, aa = rk4_coefficients()
+        self.assertNotEqual(key, spin_up_key(pars, 0.1, 1.e6, 21217, bb, c, aa))
+
+
+if __name__ == "__main__":
+    unittest.main()
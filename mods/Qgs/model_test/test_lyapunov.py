@@ -0,0 +1,143 @@
+
+import sys
+import os
+
+path = os.path.abspath('./')
+base = os.path.basename(path)
+if base == 'model_test':
+    sys.path.extend([os.path.abspath('../')])
+else:
+    sys.path.extend([path])
+
+
+import unittest
+import tempfile
+import numpy as np
+from numba import njit
+
+from qgs.integrators.integrate import integrate_runge_kutta
+from qgs.toolbox.lyapunov import LyapunovsEstimator, CovariantLyapunovsEstimator
+
+# Lorenz 63 model
+sigma = 10.
+r = 28.
+bb = 8. / 3.
+
+
+@njit
+def fL63(t, x):
+    xx = sigma * (x[1] - x[0])
+    yy = r * x[0] - x[1] - x[0] * x[2]
+    zz = x[0] * x[1] - bb * x[2]
+    return np.array([xx, yy, zz])
+
+
+@njit
+def DfL63(t, x):
+    return np.array([[-sigma, sigma, 0.],
+                     [r - x[2], -1., - x[0]],
+                     [x[1],  x[0], -bb]])
+
+
+def _attractor_ics():
+    ic = np.random.RandomState(3).random_sample((3, 3))
+    return integrate_runge_kutta(fL63, 0., 10., 0.01, ic=ic, write_steps=0)[1]
+
+
+def _estimate(estimator, *args, **kwargs):
+    estimator.set_func(fL63, DfL63)
+    try:
+        if isinstance(estimator, CovariantLyapunovsEstimator):
+            estimator.compute_clvs(*args, **kwargs)
+            return estimator.get_clvs()
+        estimator.compute_lyapunovs(*args, **kwargs)
+        return [np.array(res) for res in estimator.get_lyapunovs()]
+    finally:
+        estimator.terminate()
+
+
+class _LyapunovsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.ic = _attractor_ics()
+
+    def _compare(self, ref, res):
+        # the estimations start from random tangent vectors, so that the converged vectors are only
+        # determined up to their sign
+        for x, y in zip(ref[:3], res[:3]):
+            self.assertEqual(x.shape, y.shape)
+            self.assertTrue(np.allclose(x, y, rtol=1.e-8, atol=1.e-10))
+        self.assertEqual(ref[3].shape, res[3].shape)
+        sign = np.sign(np.sum(ref[3] * res[3], axis=-3, keepdims=True))
+        self.assertTrue(np.allclose(ref[3], sign * res[3], rtol=1.e-8, atol=1.e-10))
+
+
+class TestLyapunovsEstimator(_LyapunovsTestCase):
+
+    # the transients let the tangent vectors converge
+    times = {False: (0., 40., 45.), True: (0., 5., 45.)}
+
+    @classmethod
+    def setUpClass(cls):
+        # compile the kernels once, before the workers of the processes backend are forked
+        for forward in cls.times:
+            _estimate(LyapunovsEstimator(backend='threads'), 0., 0.1, 0.2, 0.01, 0.01, _attractor_ics(),
+                      forward=forward)
+
+    def test_threads(self):
+        for forward, times in self.times.items():
+            ref = _estimate(LyapunovsEstimator(num_threads=2), *times, 0.01, 0.01, self.ic, write_steps=10,
+                            forward=forward)
+            res = _estimate(LyapunovsEstimator(num_threads=2, chunk_size=1, backend='threads'), *times, 0.01, 0.01,
+                            self.ic, write_steps=10, forward=forward)
+            self._compare(ref, res)
+
+    def test_vectors_file(self):
+        for forward, times in self.times.items():
+            ref = _estimate(LyapunovsEstimator(num_threads=2), *times, 0.01, 0.01, self.ic, write_steps=10,
+                            n_vec=2, forward=forward)
+            for backend in ['processes', 'threads']:
+                with tempfile.TemporaryDirectory() as tmpdir:
+                    vectors_file = os.path.join(tmpdir, 'vectors.npy')
+                    res = _estimate(LyapunovsEstimator(num_threads=2, backend=backend), *times, 0.01, 0.01,
+                                    self.ic, write_steps=10, n_vec=2, forward=forward, vectors_file=vectors_file)
+                    self._compare(ref, res)
+                    self.assertTrue(np.array_equal(np.load(vectors_file), res[3]))
+
+
+class TestCovariantLyapunovsEstimator(_LyapunovsTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # compile the kernels once, before the workers of the processes backend are forked
+        for method in [0, 1]:
+            _estimate(CovariantLyapunovsEstimator(backend='threads'), 0., 0.1, 0.2, 0.3, 0.01, 0.01,
+                      _attractor_ics(), method=method)
+
+    def test_threads(self):
+        for method in [0, 1]:
+            ref = _estimate(CovariantLyapunovsEstimator(num_threads=2), 0., 40., 45., 85., 0.01, 0.01, self.ic,
+                            write_steps=10, method=method)
+            res = _estimate(CovariantLyapunovsEstimator(num_threads=2, chunk_size=1, backend='threads'),
+                            0., 40., 45., 85., 0.01, 0.01, self.ic, write_steps=10, method=method)
+            self._compare(ref, res)
+
+    def test_vectors_file(self):
+        estimator = CovariantLyapunovsEstimator(num_threads=2)
+        _estimate(estimator, 0., 40., 45., 85., 0.01, 0.01, self.ic, write_steps=10, method=1,
+                  backward_vectors=True, forward_vectors=True)
+        ref = [estimator.get_clvs(), estimator.get_blvs(), estimator.get_flvs()]
+        for backend in ['processes', 'threads']:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                estimator = CovariantLyapunovsEstimator(num_threads=2, backend=backend)
+                _estimate(estimator, 0., 40., 45., 85., 0.01, 0.01, self.ic, write_steps=10, method=1,
+                          backward_vectors=True, forward_vectors=True,
+                          vectors_file=os.path.join(tmpdir, 'clvs.npy'))
+                res = [estimator.get_clvs(), estimator.get_blvs(), estimator.get_flvs()]
+                for r, s, name in zip(ref, res, ['clvs', 'clvs_backward', 'clvs_forward']):
+                    self._compare(r, s)
+                    self.assertTrue(np.array_equal(np.load(os.path.join(tmpdir, name + '.npy')), s[3]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+
+import sys
+import os
+
+path = os.path.abspath('./')
+base = os.path.basename(path)
+if base == 'model_test':
+    sys.path.extend([os.path.abspath('../')])
+else:
+    sys.path.extend([path])
+
+
+import unittest
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import numpy.random as rnd
+
+import dapper.tools.simcache as simcache
+from dapper.dpr_config import rc
+from dapper.xp_launch import seed_and_simulate
+
+# Key of the simulation of a qgs HMM, computed in a separate process
+qgs_key_script = """
+import numpy as np
+import dapper.mods as modelling
+import dapper.tools.simcache as simcache
+from dapper.mods.Qgs import QgsEnsembleStepper
+from dapper.mods.Qgs.qgs.params.params import QgParams
+
+params = QgParams()
+params.set_atmospheric_channel_fourier_modes(2, 2)
+step = QgsEnsembleStepper.from_params(params, 0.1)
+Dyn = {'M': params.ndim, 'model': step, 'linear': step.linear, 'noise': 0}
+t = modelling.Chronology(dt=1, dko=1, K=10)
+X0 = modelling.GaussRV(C=0.01, mu=np.zeros(params.ndim))
+Obs = modelling.partial_Id_Obs(params.ndim, np.arange(params.ndim))
+Obs['noise'] = 0.01
+HMM = modelling.HiddenMarkovModel(Dyn, Obs, t, X0)
+print(simcache.key(HMM, 3))
+"""
+
+# Number of (actual) simulations of the HMMs below
+simulations = [0]
+
+
+class _HMM(object):
+
+    def __init__(self, Nx=4, K=10):
+        self.Nx = Nx
+        self.K = K
+        self.tseq = "K=" + str(K)
+
+    def simulate(self):
+        simulations[0] += 1
+        xx = np.cumsum(rnd.randn(self.K + 1, self.Nx), axis=0)
+        yy = xx[1:] + rnd.randn(self.K, self.Nx)
+        return xx, yy
+
+
+class _Xp(object):
+
+    def __init__(self, seed):
+        self.seed = seed
+
+
+class TestSimCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dirs = rc.dirs.simulations
+        self.max_size = simcache.max_size
+        self.simcache = rc.simcache
+        rc.dirs.simulations = Path(self.tmpdir.name)
+        rc.simcache = True
+        simcache.clear()
+        simulations[0] = 0
+
+    def tearDown(self):
+        simcache.clear()
+        rc.dirs.simulations = self.dirs
+        rc.simcache = self.simcache
+        simcache.max_size = self.max_size
+        self.tmpdir.cleanup()
+
+    def test_qgs_key(self):
+        keys = [subprocess.run([sys.executable, "-c", qgs_key_script], capture_output=True, text=True,
+                               check=True).stdout.split()[-1] for _ in range(2)]
+        self.assertEqual(len(keys[0]), 40)
+        self.assertEqual(keys[0], keys[1])
+
+    def test_seed_and_simulate(self):
+        HMM = _HMM()
+        _, xx, yy = seed_and_simulate(HMM, _Xp(3))
+        after = rnd.rand()
+        self.assertEqual(simulations[0], 1)
+
+        # hit: same truth and obs, and same random state after them
+        _, xx2, yy2 = seed_and_simulate(HMM, _Xp(3))
+        self.assertEqual(simulations[0], 1)
+        self.assertTrue(np.array_equal(xx, xx2))
+        self.assertTrue(np.array_equal(yy, yy2))
+        self.assertEqual(after, rnd.rand())
+
+        # the users of the cache do not see each other's modifications
+        xx2[:] = 0.
+        _, xx3, _ = seed_and_simulate(HMM, _Xp(3))
+        self.assertTrue(np.array_equal(xx, xx3))
+
+        # miss: other seed, other HMM, disabled cache, or not reproducible
+        seed_and_simulate(HMM, _Xp(4))
+        seed_and_simulate(_HMM(K=11), _Xp(3))
+        seed_and_simulate(HMM, _Xp(None))
+        rc.simcache = False
+        seed_and_simulate(HMM, _Xp(3))
+        self.assertEqual(simulations[0], 5)
+
+    def test_memory(self):
+        HMM = _HMM()
+        k = simcache.key(HMM, 3)
+        xx, yy = HMM.simulate()
+        simcache._memory[k] = xx.copy(), yy.copy(), rnd.get_state()
+        xx2, yy2, _ = simcache.load(k)
+        xx2[:] = 0.
+        self.assertTrue(np.array_equal(simcache.load(k)[0], xx))
+
+    def test_evict(self):
+        keys = [simcache.key(_HMM(), sd) for sd in range(1, 6)]
+        seed_and_simulate(_HMM(), _Xp(1))
+        size = sum(f.stat().st_size for f in (rc.dirs.simulations / keys[0]).iterdir())
+        simcache.max_size = 2.5 * size
+        # the file times may be coarse
+        for sd in range(2, 6):
+            time.sleep(0.1)
+            seed_and_simulate(_HMM(), _Xp(sd))
+        stored = [k for k in keys if (rc.dirs.simulations / k).exists()]
+        self.assertEqual(stored, keys[-2:])
+
+        # the least recently used are evicted
+        time.sleep(0.1)
+        seed_and_simulate(_HMM(), _Xp(4))
+        time.sleep(0.1)
+        seed_and_simulate(_HMM(), _Xp(1))
+        self.assertTrue((rc.dirs.simulations / keys[3]).exists())
+        self.assertFalse((rc.dirs.simulations / keys[4]).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+
+import sys
+import os
+
+path = os.path.abspath('./')
+base = os.path.basename(path)
+if base == 'model_test':
+    sys.path.extend([os.path.abspath('../')])
+else:
+    sys.path.extend([path])
+
+
+import unittest
+import tempfile
+import numpy as np
+
+from qgs.params.params import QgParams
+from qgs.functions.tendencies import create_tendencies, create_parametric_tendencies
+from qgs.functions.sparse_mul import sparse_mul3, sparse_mul2
+from qgs.tensors.cache import TensorCache, configuration_key
+
+
+class TestEnsembleTendencies(unittest.TestCase):
+
+    n_ens = 7
+
+    @classmethod
+    def setUpClass(cls):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2)
+        pars.set_oceanic_basin_fourier_modes(2, 4)
+        pars.set_params({'kd': 0.0290, 'kdp': 0.0290, 'n': 1.5, 'r': 1.e-7,
+                         'h': 136.5, 'd': 1.1e-7})
+        pars.atemperature_params.set_params({'eps': 0.7, 'T0': 289.3, 'hlambda': 15.06})
+        pars.gotemperature_params.set_params({'gamma': 5.6e8, 'T0': 301.46})
+        pars.atemperature_params.set_insolation(103.3333, 0)
+        pars.gotemperature_params.set_insolation(310., 0)
+        cls.params = pars
+
+        tendencies = create_tendencies(pars, return_qgtensor=True, return_ensemble_tendencies=True)
+        cls.tendencies = tendencies[:4]
+        cls.qgtensor = tendencies[4]
+        cls.X = np.random.RandomState(12).randn(cls.n_ens, pars.ndim)
+
+    def test_f_csr(self):
+        f = self.tendencies[0]
+        coo = self.qgtensor.tensor.coords.T
+        val = self.qgtensor.tensor.data
+        for x in self.X:
+            xx = np.concatenate((np.full((1,), 1.), x))
+            self.assertTrue(np.allclose(f(0., x), sparse_mul3(coo, val, xx, xx)[1:], rtol=1.e-12, atol=1.e-14))
+
+    def test_Df_csr(self):
+        Df = self.tendencies[1]
+        jcoo = self.qgtensor.jacobian_tensor.coords.T
+        jval = self.qgtensor.jacobian_tensor.data
+        for x in self.X:
+            xx = np.concatenate((np.full((1,), 1.), x))
+            self.assertTrue(np.allclose(Df(0., x), sparse_mul2(jcoo, jval, xx)[1:, 1:], rtol=1.e-12, atol=1.e-14))
+
+    def test_csr_structure(self):
+        indptr, jk, data = self.qgtensor.tensor_csr
+        self.assertEqual(len(indptr), self.params.ndim + 2)
+        self.assertEqual(indptr[-1], len(data))
+        self.assertTrue(np.all(jk[:, 0] <= jk[:, 1]))
+        self.assertTrue(np.all(data != 0.))
+
+    def test_f_ens(self):
+        f, Df, f_ens, Df_ens = self.tendencies
+        ref = np.array([f(0., x) for x in self.X])
+        self.assertTrue(np.allclose(f_ens(0., self.X), ref, rtol=1.e-12, atol=1.e-14))
+
+    def test_Df_ens(self):
+        f, Df, f_ens, Df_ens = self.tendencies
+        ref = np.array([Df(0., x) for x in self.X])
+        self.assertTrue(np.allclose(Df_ens(0., self.X), ref, rtol=1.e-12, atol=1.e-14))
+
+    def test_f_ens_parallel(self):
+        f, Df, f_ens, Df_ens = create_tendencies(self.params, return_ensemble_tendencies=True,
+                                                 parallel_ensemble=True)
+        ref = np.array([f(0., x) for x in self.X])
+        self.assertTrue(np.allclose(f_ens(0., self.X), ref, rtol=1.e-12, atol=1.e-14))
+
+    def test_linear_part(self):
+        f, Df, f_ens, Df_ens, L, f_nl, f_nl_ens = create_tendencies(self.params, return_ensemble_tendencies=True,
+                                                                   return_linear_part=True)
+        self.assertEqual(L.shape, (self.params.ndim, self.params.ndim))
+        for x in self.X:
+            self.assertTrue(np.allclose(f(0., x), L @ x + f_nl(0., x), rtol=1.e-12, atol=1.e-14))
+        self.assertTrue(np.allclose(L, Df(0., np.zeros(self.params.ndim)), rtol=1.e-12, atol=1.e-14))
+        self.assertTrue(np.allclose(f_nl_ens(0., self.X), f_ens(0., self.X) - self.X @ L.T, rtol=1.e-12, atol=1.e-14))
+
+    def test_jacobian_action(self):
+        f, Df, f_ens, Df_ens, Df_dot, Df_tdot = create_tendencies(self.params, return_ensemble_tendencies=True,
+                                                                  return_jacobian_action=True)
+        V = np.random.RandomState(13).randn(self.n_ens, self.params.ndim, 3)
+        J = Df_ens(0., self.X)
+        self.assertTrue(np.allclose(Df_dot(0., self.X, V), J @ V, rtol=1.e-12, atol=1.e-14))
+        self.assertTrue(np.allclose(Df_tdot(0., self.X, V), np.swapaxes(J, 1, 2) @ V, rtol=1.e-12, atol=1.e-14))
+
+    def test_parametric_tendencies(self):
+        f, Df, p, qgtensor = create_parametric_tendencies(self.params, return_qgtensor=True)
+        for x in self.X:
+            self.assertTrue(np.allclose(f(0., x, p), self.tendencies[0](0., x), rtol=1.e-12, atol=1.e-14))
+
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2)
+        pars.set_oceanic_basin_fourier_modes(2, 4)
+        pars.set_params({'kd': 0.0350, 'kdp': 0.0250, 'n': 1.5, 'r': 2.e-7,
+                         'h': 136.5, 'd': 0.9e-7})
+        pars.atemperature_params.set_params({'eps': 0.76, 'T0': 289.3, 'hlambda': 12.})
+        pars.gotemperature_params.set_params({'gamma': 5.6e8, 'T0': 300.})
+        pars.atemperature_params.set_insolation(100., 0)
+        pars.gotemperature_params.set_insolation(320., 0)
+        f2, Df2 = create_tendencies(pars, cache=False)
+        p2 = qgtensor.parameter_vector(pars)
+        for x in self.X:
+            self.assertTrue(np.allclose(f(0., x, p2), f2(0., x), rtol=1.e-12, atol=1.e-14))
+            self.assertTrue(np.allclose(Df(0., x, p2), Df2(0., x), rtol=1.e-12, atol=1.e-14))
+
+        f, Df, p, tensor_values, f_ens, Df_ens = create_parametric_tendencies(self.params,
+                                                                              return_ensemble_tendencies=True)
+        P = np.repeat(p[np.newaxis], self.n_ens, axis=0)
+        P[1::2] = p2
+        V = tensor_values(P)
+        F = f_ens(0., self.X, V)
+        J = Df_ens(0., self.X, V)
+        for x, pm, fm, Jm in zip(self.X, P, F, J):
+            self.assertTrue(np.allclose(fm, f(0., x, pm), rtol=1.e-12, atol=1.e-14))
+            self.assertTrue(np.allclose(Jm, Df(0., x, pm), rtol=1.e-12, atol=1.e-14))
+
+        qgtensor.reparameterize(pars)
+        ref = create_tendencies(pars, return_qgtensor=True, cache=False)[-1]
+        self.assertTrue(np.allclose(qgtensor.tensor.todense(), ref.tensor.todense(), rtol=1.e-12, atol=1.e-14))
+
+        pars.set_params({'n': 1.6})
+        with self.assertRaises(ValueError):
+            qgtensor.reparameterize(pars)
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = TensorCache(directory)
+            self.assertIsNone(cache.load(self.params))
+            cache.save(self.qgtensor)
+            qgtensor = cache.load(self.params)
+            self.assertIsNotNone(qgtensor)
+            self.assertTrue(np.allclose(qgtensor.tensor.todense(), self.qgtensor.tensor.todense()))
+            self.assertTrue(np.allclose(qgtensor.jacobian_tensor.todense(), self.qgtensor.jacobian_tensor.todense()))
+
+            f, Df = create_tendencies(self.params, cache=cache)
+            for x in self.X:
+                self.assertTrue(np.allclose(f(0., x), self.tendencies[0](0., x), rtol=1.e-12, atol=1.e-14))
+
+            cache.max_size = 0
+            cache.evict()
+            self.assertIsNone(cache.load(self.params))
+
+    def test_cache_key(self):
+        pars = QgParams()
+        pars.set_atmospheric_channel_fourier_modes(2, 2)
+        pars.set_oceanic_basin_fourier_modes(2, 4)
+        self.assertNotEqual(configuration_key(pars), configuration_key(self.params))
+        pars.set_params({'kd': 0.0290, 'kdp': 0.0290, 'n': 1.5, 'r': 1.e-7,
+                         'h': 136.5, 'd': 1.1e-7})
+        pars.atemperature_params.set_params({'eps': 0.7, 'T0': 289.3, 'hlambda': 15.06})
+        pars.gotemperature_params.set_params({'gamma': 5.6e8, 'T0': 301.46})
+        pars.atemperature_params.set_insolation(103.3333, 0)
+        pars.gotemperature_params.set_insolation(310., 0)
+        self.assertEqual(configuration_key(pars), configuration_key(self.params))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,6 +9,7 @@
 
     * :class:`Diagnostic`: General base class.
     * :class:`FieldDiagnostic`: General base class for diagnostics returning model's fields.
+    * :class:`LazyDiagnostic`: Lazy view of the output of a diagnostic, computing its time slices on demand.
 
     Warnings
     --------
@@ -50,6 +51,9 @@ class Diagnostic(ABC):
 
     """
 
+    # whether each time of the output only depends on the data at the same time, such that it can be computed lazily
+    _time_local = True
+
     def __init__(self, model_params, dimensional):
 
         self._model_params = None
@@ -62,6 +66,8 @@ class Diagnostic(ABC):
         self._diagnostic_data = None
         self._diagnostic_data_dimensional = None
         self._time = None
+        self._lazy = False
+        self._chunk_size = None
 
         self.dimensional = dimensional
 
@@ -70,19 +76,37 @@ class Diagnostic(ABC):
 
         self.set_params(model_params)
 
-    def __call__(self, time, data):
-        self.set_data(time, data)
+    def __call__(self, time, data, lazy=False, chunk_size=None):
+        self.set_data(time, data, lazy, chunk_size)
         return self.diagnostic
 
     @property
     def diagnostic(self):
-        """~numpy.ndarray: The output diagnostic."""
+        """~numpy.ndarray or LazyDiagnostic: The output diagnostic. A :class:`LazyDiagnostic` view if the data were
+        provided in lazy mode (see :meth:`set_data`)."""
         diag = self._check_diagnostic(self.dimensional)
         if diag is False:
+            if self._lazy and self._time_local:
+                self._diagnostic_data = LazyDiagnostic(self, self.dimensional, self._chunk_size)
+                self._diagnostic_data_dimensional = self.dimensional
+                return self._diagnostic_data
             return self._get_diagnostic(self.dimensional)
         else:
             return diag
 
+    def _get_diagnostic_slice(self, dimensional, index):
+        # compute the diagnostic at the times selected by index, leaving the state of the object unchanged
+        data, time = self._data, self._time
+        diag, diag_dimensional = self._diagnostic_data, self._diagnostic_data_dimensional
+        try:
+            self._data = np.asarray(data[..., index])
+            if time is not None:
+                self._time = time[index]
+            return self._get_diagnostic(dimensional)
+        finally:
+            self._data, self._time = data, time
+            self._diagnostic_data, self._diagnostic_data_dimensional = diag, diag_dimensional
+
     def _check_diagnostic(self, dimensional):
 
         if self._data is None:
@@ -127,7 +151,7 @@ class Diagnostic(ABC):
         self._heat_exchange = model_params.atemperature_params.C is not None
         self._newton = model_params.atemperature_params.thetas is not None
 
-    def set_data(self, time, data):
+    def set_data(self, time, data, lazy=False, chunk_size=None):
         """Provide the model data to the diagnostic.
 
         Parameters
@@ -138,10 +162,22 @@ class Diagnostic(ABC):
         data: ~numpy.ndarray
             The model output data that the user want to convert using the diagnostic.
             Should be a 2D array of shape (:attr:`~.params.QgParams.ndim`, number_of_timesteps).
+            Can be a memory-mapped array (e.g. a trajectory loaded with :func:`~.integrators.trajectory.load_trajectory`),
+            which is then only read by chunks in lazy mode.
+        lazy: bool, optional
+            If `True`, the output :attr:`diagnostic` is a :class:`LazyDiagnostic` view computing the time slices on
+            demand, and its reductions chunk-by-chunk, instead of the full output array.
+            Only used by the diagnostics whose output at a given time only depends on the data at this time.
+            Default to `False`.
+        chunk_size: None or int, optional
+            The number of timesteps computed at once by the lazy view. If `None`, use :attr:`LazyDiagnostic.default_chunk_size`.
+            Default to `None`.
         """
 
         self._data = data
         self._time = time
+        self._lazy = lazy
+        self._chunk_size = chunk_size
         self._diagnostic_data = None
 
     @abstractmethod
@@ -153,6 +189,172 @@ class Diagnostic(ABC):
         pass
 
 
+class LazyDiagnostic(object):
+    """Lazy view of the output of a diagnostic, computing its time slices on demand.
+
+    Indexing the view (e.g. ``view[time_index]``) computes only the requested times, and the reductions over
+    time (:meth:`mean`, :meth:`var`, :meth:`std`, :meth:`min` and :meth:`max`) are computed chunk-by-chunk,
+    such that the full output is never held in memory. The view is returned by :attr:`Diagnostic.diagnostic` when the
+    data are provided in lazy mode.
+
+    Parameters
+    ----------
+    diagnostic: Diagnostic
+        The diagnostic whose output is viewed.
+    dimensional: bool
+        Indicate if the output is dimensionalized or not.
+    chunk_size: None or int, optional
+        The number of timesteps computed at once. If `None`, use :attr:`default_chunk_size`. Default to `None`.
+
+    Attributes
+    ----------
+    shape: tuple(int)
+        The shape of the output.
+    dtype: ~numpy.dtype
+        The type of the output.
+    chunk_size: int
+        The number of timesteps computed at once.
+    """
+
+    default_chunk_size = 1000
+
+    def __init__(self, diagnostic, dimensional, chunk_size=None):
+
+        self._diagnostic = diagnostic
+        self._dimensional = dimensional
+        if chunk_size is None:
+            chunk_size = self.default_chunk_size
+        self.chunk_size = chunk_size
+
+        n_time = diagnostic._data.shape[-1]
+        first = self._compute(slice(0, 1))
+        self.shape = (n_time,) + first.shape[1:]
+        self.dtype = first.dtype
+
+    def _compute(self, index):
+        return self._diagnostic._get_diagnostic_slice(self._dimensional, index)
+
+    @property
+    def ndim(self):
+        """int: The number of dimensions of the output."""
+        return len(self.shape)
+
+    @property
+    def size(self):
+        """int: The number of elements of the output."""
+        return int(np.prod(self.shape))
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+
+        if not isinstance(index, tuple):
+            index = (index,)
+        time_index, rest = index[0], (slice(None),) + index[1:]
+
+        if isinstance(time_index, (int, np.integer)):
+            n = self.shape[0]
+            if not -n <= time_index < n:
+                raise IndexError('Time index ' + str(time_index) + ' out of range for ' + str(n) + ' timesteps.')
+            time_index = time_index % n
+            return self._compute(slice(time_index, time_index + 1))[rest][0]
+
+        indices = np.arange(self.shape[0])[time_index]
+        chunks = [self._compute(_as_slice(indices[i:i + self.chunk_size]))[rest]
+                  for i in range(0, len(indices), self.chunk_size)]
+        if not chunks:
+            return self._compute(slice(0, 0))[rest]
+        return np.concatenate(chunks)
+
+    def __array__(self, dtype=None, copy=None):
+        res = self[:]
+        if dtype is not None:
+            res = res.astype(dtype)
+        return res
+
+    def chunks(self):
+        """Iterate over the output by chunks of :attr:`chunk_size` timesteps.
+
+        Yields
+        ------
+        slice, ~numpy.ndarray
+            The time slice of the chunk and the corresponding output.
+        """
+        for start in range(0, self.shape[0], self.chunk_size):
+            sl = slice(start, min(start + self.chunk_size, self.shape[0]))
+            yield sl, self._compute(sl)
+
+    @staticmethod
+    def _check_axis(axis):
+        if axis not in (None, 0):
+            raise ValueError('LazyDiagnostic: the reductions are only available over all the axes (axis=None) or '
+                             'over the time (axis=0).')
+
+    def _reduce(self, func, axis):
+        res = None
+        for sl, values in self.chunks():
+            values = func(values, axis=axis)
+            res = values if res is None else func(np.stack((res, values)), axis=0)
+        return res
+
+    @staticmethod
+    def _output(res, out):
+        if out is None:
+            return res
+        out[...] = res
+        return out
+
+    def min(self, axis=None, out=None):
+        """Minimum of the output over all the axes or over the time (`axis=0`)."""
+        self._check_axis(axis)
+        return self._output(self._reduce(np.min, axis), out)
+
+    def max(self, axis=None, out=None):
+        """Maximum of the output over all the axes or over the time (`axis=0`)."""
+        self._check_axis(axis)
+        return self._output(self._reduce(np.max, axis), out)
+
+    def _moments(self, axis):
+        # combine the counts, means and sums of squared deviations of the chunks (Chan et al. parallel algorithm)
+        count, mean, m2 = 0, 0., 0.
+        for sl, values in self.chunks():
+            n = values.size if axis is None else values.shape[0]
+            chunk_mean = values.mean(axis=axis)
+            chunk_m2 = ((values - chunk_mean) ** 2).sum(axis=axis)
+            delta = chunk_mean - mean
+            total = count + n
+            mean = mean + delta * n / total
+            m2 = m2 + chunk_m2 + delta ** 2 * count * n / total
+            count = total
+        return count, mean, m2
+
+    def mean(self, axis=None, dtype=None, out=None):
+        """Mean of the output over all the axes or over the time (`axis=0`)."""
+        self._check_axis(axis)
+        return self._output(self._moments(axis)[1], out)
+
+    def var(self, axis=None, dtype=None, out=None, ddof=0):
+        """Variance of the output over all the axes or over the time (`axis=0`)."""
+        self._check_axis(axis)
+        count, mean, m2 = self._moments(axis)
+        return self._output(m2 / (count - ddof), out)
+
+    def std(self, axis=None, dtype=None, out=None, ddof=0):
+        """Standard deviation of the output over all the axes or over the time (`axis=0`)."""
+        return self._output(np.sqrt(self.var(axis=axis, ddof=ddof)), out)
+
+
+def _as_slice(indices):
+    # regularly spaced increasing indices as a slice, such that memory-mapped data are read by blocks
+    if len(indices) == 1:
+        return slice(indices[0], indices[0] + 1)
+    step = indices[1] - indices[0]
+    if step > 0 and np.all(np.diff(indices) == step):
+        return slice(indices[0], indices[-1] + 1, step)
+    return indices
+
+
 class FieldPointDiagnostic(Diagnostic):
     """General base class to give field values over time at a given point of the domain.
 
@@ -86,6 +86,11 @@ class MiddleAtmosphericEddyHeatFluxDiagnostic(FieldDiagnostic):
 
         self._heat_capacity = heat_capacity
 
+    @property
+    def _time_local(self):
+        # without the mean states, the eddies are relative to the time mean of the data
+        return self._temp_mean_state is not None and self._vwind_mean_state is not None
+
     def _compute_grid(self, delta_x=None, delta_y=None):
         pass
 
@@ -176,6 +181,10 @@ class MiddleAtmosphericEddyHeatFluxProfileDiagnostic(ProfileDiagnostic):
         self._axis_label = r'$y$'
         self._configure()
 
+    @property
+    def _time_local(self):
+        return self._flux._time_local
+
     def _configure(self):
         self._points_coordinates = self._flux._Y[:, 0]
 
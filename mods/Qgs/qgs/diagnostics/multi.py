@@ -50,8 +50,8 @@ class MultiDiagnostic(object):
     def __len__(self):
         return self._geometry[0] * self._geometry[1]
 
-    def __call__(self, time, data):
-        self.set_data(time, data)
+    def __call__(self, time, data, lazy=False, chunk_size=None):
+        self.set_data(time, data, lazy, chunk_size)
 
     @property
     def _diagnostic_min_len(self):
@@ -81,7 +81,7 @@ class MultiDiagnostic(object):
         else:
             return list(self._figures_array.flatten())
 
-    def set_data(self, time, data):
+    def set_data(self, time, data, lazy=False, chunk_size=None):
         """Provide the model data to all the diagnostics.
 
         Parameters
@@ -91,9 +91,14 @@ class MultiDiagnostic(object):
             Its length should match the length of the last axis of the provided `data`.
         data: ~numpy.ndarray
             The model output data that the user want to convert using the diagnostic.
+        lazy: bool, optional
+            If `True`, the diagnostics compute their outputs lazily, see :meth:`~.base.Diagnostic.set_data`.
+            Default to `False`.
+        chunk_size: None or int, optional
+            The number of timesteps computed at once by the diagnostics in lazy mode. Default to `None`.
         """
         for diagnostic in self._diagnostics_list:
-            out = diagnostic(time, data)
+            out = diagnostic(time, data, lazy, chunk_size)
 
     @property
     def diagnostic(self):
@@ -530,8 +535,8 @@ class FieldsDiagnosticsList(object):
         """
         self._diagnostics_list.append(diagnostic)
 
-    def __call__(self, time, data, index=None):
-        self.set_data(time, data, index)
+    def __call__(self, time, data, index=None, lazy=False, chunk_size=None):
+        self.set_data(time, data, index, lazy, chunk_size)
 
     def __len__(self):
         diag_len = list()
@@ -543,7 +548,7 @@ class FieldsDiagnosticsList(object):
         except:
             return 0
 
-    def set_data(self, time, data, index=None):
+    def set_data(self, time, data, index=None, lazy=False, chunk_size=None):
         """Provide the model data to the index-th diagnostic.
 
         Parameters
@@ -556,6 +561,11 @@ class FieldsDiagnosticsList(object):
             Should be a 2D array of shape (:attr:`~.params.QgParams.ndim`, number_of_timesteps).
         index: int or None
             The index of the diagnostic in the list to provide the data to.
+        lazy: bool, optional
+            If `True`, the diagnostic computes its output lazily, see :meth:`~.base.Diagnostic.set_data`.
+            Default to `False`.
+        chunk_size: None or int, optional
+            The number of timesteps computed at once by the diagnostic in lazy mode. Default to `None`.
         """
         if self._diagnostics_list is None:
             warnings.warn('No diagnostics available. Doing nothing.')
@@ -564,7 +574,7 @@ class FieldsDiagnosticsList(object):
         if index is None:
             return None
         else:
-            self._diagnostics_list[index].set_data(time, data)
+            self._diagnostics_list[index].set_data(time, data, lazy, chunk_size)
 
     def plot(self, time_index, style="image", ax=None, figsize=(16, 9),
              contour_labels=True, color_bar=True, show_time=True, plot_kwargs=None, oro_kwargs=None):
@@ -0,0 +1,301 @@
+"""
+    Diagnostic projection module
+    ============================
+
+    Module to project the spectral coefficients of the model onto a grid covering its domain.
+
+    The basis functions evaluated on a grid are stored in a cache shared by all the diagnostics, keyed by the basis
+    and the grid, such that the same basis grid is never computed twice. The least recently used grids are
+    dropped from the cache when its size exceeds :data:`grid_basis_cache_max_size` bytes.
+    The :class:`FieldsProjector` computes several fields of a whole trajectory in a single matrix multiplication.
+
+    Description of the classes and functions
+    ----------------------------------------
+
+    * :func:`grid_basis`: Evaluate (with cache) the functions of a basis on a grid.
+    * :func:`clear_grid_basis_cache`: Empty the cache of the basis functions evaluated on a grid.
+    * :class:`FieldsProjector`: Batched projector of the model's fields.
+
+"""
+
+import hashlib
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+from scipy.integrate import dblquad
+
+#: Maximum size in bytes of the cache of the basis functions evaluated on a grid. Default to 256 MB.
+grid_basis_cache_max_size = 2**28
+
+_grid_basis_cache = OrderedDict()
+
+
+def _grid_key(basis, X, Y, derivative):
+    grid = hashlib.sha1(np.ascontiguousarray(X).tobytes() + np.ascontiguousarray(Y).tobytes()).hexdigest()
+    return repr(basis.functions), repr(getattr(basis, 'substitutions', None)), derivative, X.shape, grid
+
+
+def grid_basis(basis, X, Y, derivative=None):
+    """Evaluate the functions of a basis on a grid of points.
+
+    The result is stored in a cache keyed by the basis functions, their substitutions, the derivative and the grid,
+    and returned directly by the subsequent calls with the same arguments.
+    The least recently used results are dropped when the cache exceeds :data:`grid_basis_cache_max_size` bytes.
+
+    Parameters
+    ----------
+    basis: Basis
+        The basis whose functions must be evaluated.
+    X: ~numpy.ndarray
+        The `x` coordinates of the grid points.
+    Y: ~numpy.ndarray
+        The `y` coordinates of the grid points. Must have the same shape as `X`.
+    derivative: None or str, optional
+        If `'x'` or `'y'`, evaluate the derivative of the functions with respect to this coordinate.
+        Default to `None`.
+
+    Returns
+    -------
+    ~numpy.ndarray
+        The read-only array of shape (`len(basis)`,) + `X.shape` of the functions values on the grid.
+    """
+
+    key = _grid_key(basis, X, Y, derivative)
+    grid = _grid_basis_cache.get(key)
+    if grid is not None:
+        _grid_basis_cache.move_to_end(key)
+        return grid
+
+    if derivative == 'x':
+        basis = basis.x_derivative
+    elif derivative == 'y':
+        basis = basis.y_derivative
+    elif derivative is not None:
+        raise ValueError("grid_basis: derivative must be None, 'x' or 'y'.")
+
+    grid = list()
+    for func in basis.num_functions():
+        values = func(X, Y)
+        # Check for cases where the function is a constant (e.g. a symbolic derivative equal to 0)
+        if not hasattr(values, 'data'):
+            values = np.full_like(X, values)
+        grid.append(values)
+
+    grid = np.array(grid)
+    grid.flags.writeable = False
+    _grid_basis_cache[key] = grid
+
+    # drop the least recently used grids, but the new one
+    size = sum(g.nbytes for g in _grid_basis_cache.values())
+    while size > grid_basis_cache_max_size and len(_grid_basis_cache) > 1:
+        size -= _grid_basis_cache.popitem(last=False)[1].nbytes
+
+    return grid
+
+
+def clear_grid_basis_cache():
+    """Empty the cache of the basis functions evaluated on a grid."""
+    _grid_basis_cache.clear()
+
+
+class FieldsProjector(object):
+    """Batched projector of the model's fields onto a grid covering its domain.
+
+    All the requested fields are computed for a whole trajectory in a single matrix multiplication, with a projection
+    matrix gathering the basis functions of each field evaluated on the grid (see :func:`grid_basis`).
+
+    Available fields:
+
+    * `psi_a`: the middle atmospheric streamfunction :math:`\\psi_{\\rm a}`.
+    * `psi_a1`, `psi_a3`: the upper and lower layer atmospheric streamfunctions :math:`\\psi^1_{\\rm a}` and :math:`\\psi^3_{\\rm a}`.
+    * `geopotential`: the 500hPa geopotential height.
+    * `theta_a`: the middle atmospheric temperature :math:`\\theta_{\\rm a}`.
+    * `u_a`, `v_a`: the middle atmospheric U and V winds.
+    * `u_a1`, `v_a1`, `u_a3`, `v_a3`: the upper and lower layer atmospheric U and V winds.
+    * `psi_o`: the oceanic streamfunction :math:`\\psi_{\\rm o}`.
+    * `T_o`: the oceanic temperature.
+    * `T_g`: the ground temperature.
+
+    They are the same as the ones given by the corresponding diagnostics classes.
+
+    Parameters
+    ----------
+    model_params: QgParams
+        An instance of the model parameters.
+    fields: list(str)
+        The names of the fields to compute.
+    delta_x: float, optional
+        Spatial step in the zonal direction `x` for the gridded representation of the fields.
+        If not provided, take an optimal guess based on the provided model's parameters.
+    delta_y: float, optional
+        Spatial step in the meridional direction `y` for the gridded representation of the fields.
+        If not provided, take an optimal guess based on the provided model's parameters.
+    dimensional: bool, optional
+        Indicate if the output fields must be dimensionalized or not.
+        Default to `True`.
+    conserved: bool, optional
+        Whether to compute the conserved oceanic streamfunction or not. Default to `True`.
+    dtype: ~numpy.dtype, optional
+        The type of the projection matrix and of the output fields, e.g. `numpy.float32` to halve the memory and
+        the computational cost of the projection. Default to `numpy.float64`.
+
+    Attributes
+    ----------
+    fields: list(str)
+        The names of the computed fields.
+    dimensional: bool
+        Indicate if the output fields are dimensionalized or not.
+    dtype: ~numpy.dtype
+        The type of the output fields.
+    projection_matrix: ~numpy.ndarray
+        The projection matrix, of shape (`len(fields)` * number of grid points, :attr:`~.params.QgParams.ndim`).
+    """
+
+    def __init__(self, model_params, fields, delta_x=None, delta_y=None, dimensional=True, conserved=True,
+                 dtype=np.float64):
+
+        self._model_params = model_params
+        self.fields = list(fields)
+        self.dimensional = dimensional
+        self.dtype = np.dtype(dtype)
+        self._conserved = conserved
+
+        self._X = None
+        self._Y = None
+        self._compute_grid(delta_x, delta_y)
+
+        self.projection_matrix = self._compute_projection_matrix()
+
+    @property
+    def grid(self):
+        """(~numpy.ndarray, ~numpy.ndarray): The coordinates `X` and `Y` of the grid points."""
+        return self._X, self._Y
+
+    @property
+    def grid_shape(self):
+        """tuple(int): Return the shape of the grid of points covering the model's domain."""
+        return self._Y.shape
+
+    def _compute_grid(self, delta_x=None, delta_y=None):
+
+        blocks = list()
+        for b in [self._model_params.ablocks, self._model_params.oblocks, self._model_params.gblocks]:
+            if b is not None:
+                blocks.extend(b)
+
+        if (delta_x is None or delta_y is None) and not blocks:
+            raise ValueError("FieldsProjector: Unable to configure the grid automatically. Wavenumbers information not " +
+                             "present in the model's parameters ! Please provide the delta_x and delta_y parameters.")
+
+        if delta_x is None:
+            n_point_x = 4 * max(b[0] for b in blocks) + 2
+        else:
+            n_point_x = int(np.ceil((2 * np.pi / self._model_params.scale_params.n) / delta_x) + 1)
+
+        if delta_y is None:
+            n_point_y = 4 * max(b[1] for b in blocks) + 2
+        else:
+            n_point_y = int(np.ceil(np.pi / delta_y) + 1)
+
+        x = np.linspace(0., 2 * np.pi / self._model_params.scale_params.n, n_point_x)
+        y = np.linspace(0., np.pi, n_point_y)
+        self._X, self._Y = np.meshgrid(x, y)
+
+    def _field_terms(self, field):
+        # list of (first variable index, basis, derivative, factor) of the terms of the field, and its scaling
+        params = self._model_params
+        natm, noc = params.nmod[0], params.nmod[1]
+        abasis = params.atmospheric_basis
+        psi, theta = 0, natm
+
+        if field in ['psi_a', 'psi_a1', 'psi_a3', 'geopotential']:
+            sign = {'psi_a': 0., 'psi_a1': 1., 'psi_a3': -1., 'geopotential': 0.}[field]
+            scaling = params.streamfunction_scaling
+            if field == 'geopotential':
+                scaling *= params.geopotential_scaling
+            terms = [(psi, abasis, None, 1.)]
+            if sign != 0.:
+                terms.append((theta, abasis, None, sign))
+            return terms, scaling
+        elif field == 'theta_a':
+            return [(theta, abasis, None, 1.)], params.temperature_scaling * 2
+        elif field in ['u_a', 'u_a1', 'u_a3', 'v_a', 'v_a1', 'v_a3']:
+            sign = {'': 0., '1': 1., '3': -1.}[field[3:]]
+            if field[0] == 'u':
+                derivative, factor = 'y', -1.
+            else:
+                derivative, factor = 'x', 1.
+            terms = [(psi, abasis, derivative, factor)]
+            if sign != 0.:
+                terms.append((theta, abasis, derivative, factor * sign))
+            return terms, params.streamfunction_scaling / params.scale_params.L
+        elif field in ['psi_o', 'T_o']:
+            if params.oceanic_basis is None:
+                raise ValueError("FieldsProjector: No ocean configuration found in the provided parameters.")
+            if field == 'psi_o':
+                return [(2 * natm, params.oceanic_basis, None, 1.)], params.streamfunction_scaling
+            else:
+                return [(2 * natm + noc, params.oceanic_basis, None, 1.)], params.temperature_scaling
+        elif field == 'T_g':
+            if params.ground_basis is None:
+                raise ValueError("FieldsProjector: No ground configuration found in the provided parameters.")
+            return [(2 * natm, params.ground_basis, None, 1.)], params.temperature_scaling
+        else:
+            raise ValueError("FieldsProjector: Unknown field " + str(field) + ".")
+
+    def _oceanic_fields_average(self):
+        basis = self._model_params.oceanic_basis
+        average = list()
+        for func in basis.num_functions():
+            average.append(dblquad(func, 0, np.pi, 0, 2 * np.pi / self._model_params.scale_params.n)[0])
+        return np.array(average)
+
+    def _compute_projection_matrix(self):
+
+        n_points = self._X.size
+        matrix = np.zeros((len(self.fields), n_points, self._model_params.ndim))
+
+        for i, field in enumerate(self.fields):
+            terms, scaling = self._field_terms(field)
+            if not self.dimensional:
+                scaling = 1.
+            for start, basis, derivative, factor in terms:
+                gb = grid_basis(basis, self._X, self._Y, derivative).reshape(len(basis), n_points)
+                if field == 'psi_o' and self._conserved:
+                    gb = gb - self._oceanic_fields_average()[:, np.newaxis]
+                matrix[i, :, start:start + len(basis)] += factor * scaling * gb.T
+
+        return matrix.reshape((-1, self._model_params.ndim)).astype(self.dtype)
+
+    def project(self, data):
+        """Compute the fields of the provided model data.
+
+        Parameters
+        ----------
+        data: ~numpy.ndarray
+            The model output data. Should be a 2D array of shape (:attr:`~.params.QgParams.ndim`, number_of_timesteps),
+            or a 1D array of shape (:attr:`~.params.QgParams.ndim`,) for a single state.
+
+        Returns
+        -------
+        dict(~numpy.ndarray)
+            The fields, keyed by their names. Each of them is an array of shape (number_of_timesteps,) + `grid_shape`,
+            or of shape `grid_shape` for a single state.
+        """
+
+        data = np.asarray(data)
+        if data.shape[0] != self._model_params.ndim:
+            warnings.warn('Problem with the provided data. Expected array with 0-axis shape of '
+                          + str(self._model_params.ndim) + ' . Got ' + str(data.shape[0]) + ' !')
+        single = data.ndim == 1
+        data = data.reshape((data.shape[0], -1)).astype(self.dtype, copy=False)
+
+        res = (data.T @ self.projection_matrix.T).reshape((data.shape[1], len(self.fields)) + self.grid_shape)
+        if single:
+            res = res[0]
+            return {field: res[i] for i, field in enumerate(self.fields)}
+        return {field: res[:, i] for i, field in enumerate(self.fields)}
+
+    def __call__(self, data):
+        return self.project(data)
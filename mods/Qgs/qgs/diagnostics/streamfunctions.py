@@ -22,6 +22,7 @@ from scipy.integrate import dblquad
 import matplotlib.pyplot as plt
 
 from dapper.mods.Qgs.qgs.diagnostics.base import FieldDiagnostic
+from dapper.mods.Qgs.qgs.diagnostics.projection import grid_basis
 
 
 class AtmosphericStreamfunctionDiagnostic(FieldDiagnostic):
@@ -88,12 +89,7 @@ class AtmosphericStreamfunctionDiagnostic(FieldDiagnostic):
         self._compute_grid(delta_x, delta_y)
         basis = self._model_params.atmospheric_basis
 
-        self._grid_basis = list()
-
-        for func in basis.num_functions():
-            self._grid_basis.append(func(self._X, self._Y))
-
-        self._grid_basis = np.array(self._grid_basis)
+        self._grid_basis = grid_basis(basis, self._X, self._Y)
 
 
 class LowerLayerAtmosphericStreamfunctionDiagnostic(AtmosphericStreamfunctionDiagnostic):
@@ -334,12 +330,7 @@ class OceanicStreamfunctionDiagnostic(FieldDiagnostic):
         self._compute_grid(delta_x, delta_y)
         basis = self._model_params.oceanic_basis
 
-        self._grid_basis = list()
-
-        for func in basis.num_functions():
-            self._grid_basis.append(func(self._X, self._Y))
-
-        self._grid_basis = np.array(self._grid_basis)
+        self._grid_basis = grid_basis(basis, self._X, self._Y)
 
 
 class OceanicLayerStreamfunctionDiagnostic(OceanicStreamfunctionDiagnostic):
@@ -20,6 +20,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 
 from dapper.mods.Qgs.qgs.diagnostics.base import FieldDiagnostic
+from dapper.mods.Qgs.qgs.diagnostics.projection import grid_basis
 
 
 class AtmosphericTemperatureDiagnostic(FieldDiagnostic):
@@ -85,12 +86,7 @@ class AtmosphericTemperatureDiagnostic(FieldDiagnostic):
         self._compute_grid(delta_x, delta_y)
         basis = self._model_params.atmospheric_basis
 
-        self._grid_basis = list()
-
-        for func in basis.num_functions():
-            self._grid_basis.append(func(self._X, self._Y))
-
-        self._grid_basis = np.array(self._grid_basis)
+        self._grid_basis = grid_basis(basis, self._X, self._Y)
 
 
 class MiddleAtmosphericTemperatureDiagnostic(AtmosphericTemperatureDiagnostic):
@@ -211,12 +207,7 @@ class OceanicTemperatureDiagnostic(FieldDiagnostic):
         self._compute_grid(delta_x, delta_y)
         basis = self._model_params.oceanic_basis
 
-        self._grid_basis = list()
-
-        for func in basis.num_functions():
-            self._grid_basis.append(func(self._X, self._Y))
-
-        self._grid_basis = np.array(self._grid_basis)
+        self._grid_basis = grid_basis(basis, self._X, self._Y)
 
 
 class OceanicLayerTemperatureDiagnostic(OceanicTemperatureDiagnostic):
@@ -346,12 +337,7 @@ class GroundTemperatureDiagnostic(FieldDiagnostic):
         self._compute_grid(delta_x, delta_y)
         basis = self._model_params.ground_basis
 
-        self._grid_basis = list()
-
-        for func in basis.num_functions():
-            self._grid_basis.append(func(self._X, self._Y))
-
-        self._grid_basis = np.array(self._grid_basis)
+        self._grid_basis = grid_basis(basis, self._X, self._Y)
 
     def _get_diagnostic(self, dimensional):
 
@@ -45,6 +45,9 @@ class VariablesDiagnostic(Diagnostic):
 
     """
 
+    # the time is on the last axis of the output, which cannot be viewed lazily by a LazyDiagnostic
+    _time_local = False
+
     def __init__(self, variable_list, model_params, dimensional):
 
         Diagnostic.__init__(self, model_params, dimensional)
@@ -26,6 +26,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from dapper.mods.Qgs.qgs.diagnostics.base import FieldDiagnostic
+from dapper.mods.Qgs.qgs.diagnostics.projection import grid_basis
 
 
 class AtmosphericWindDiagnostic(FieldDiagnostic):
@@ -97,31 +98,9 @@ class AtmosphericWindDiagnostic(FieldDiagnostic):
         self._compute_grid(delta_x, delta_y)
 
         if self.type == "V":
-            dx_basis = self._model_params.atmospheric_basis.x_derivative
-            grid_dx_basis = list()
-
-            for func in dx_basis.num_functions():
-                grid_dx_basis.append(func(self._X, self._Y))
-
-            # Check for cases where the symbolic derivative is the 0 function
-            for i in range(len(grid_dx_basis)):
-                if not hasattr(grid_dx_basis[i], 'data'):
-                    grid_dx_basis[i] = np.full_like(self._X, grid_dx_basis[i])
-
-            self._grid_basis = np.array(grid_dx_basis)
+            self._grid_basis = grid_basis(self._model_params.atmospheric_basis, self._X, self._Y, derivative='x')
         elif self.type == "U":
-            dy_basis = self._model_params.atmospheric_basis.y_derivative
-            grid_dy_basis = list()
-
-            for func in dy_basis.num_functions():
-                grid_dy_basis.append(func(self._X, self._Y))
-
-            # Check for cases where the symbolic derivative is the 0 function
-            for i in range(len(grid_dy_basis)):
-                if not hasattr(grid_dy_basis[i], 'data'):
-                    grid_dy_basis[i] = np.full_like(self._X, grid_dy_basis[i])
-
-            self._grid_basis = np.array(grid_dy_basis)
+            self._grid_basis = grid_basis(self._model_params.atmospheric_basis, self._X, self._Y, derivative='y')
         elif self.type is None:
             warnings.warn("AtmosphericWindDiagnostic: Basis type note specified." +
                           " Unable to configure the diagnostic properly.")
@@ -7,10 +7,10 @@
 
 """
 import numpy as np
-from numba import njit
+from numba import njit, prange
 
 
-@njit
+@njit(cache=True)
 def sparse_mul3(coo, value, vec_a, vec_b):
     """Sparse multiplication of a tensor with two vectors:
     :math:`v_i = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_j \, b_k`
@@ -46,7 +46,7 @@ def sparse_mul3(coo, value, vec_a, vec_b):
     return res
 
 
-@njit
+@njit(cache=True)
 def sparse_mul2(coo, value, vec):
     """Sparse multiplication of a tensor with one vector:
     :math:`A_{i,j} = {\displaystyle \sum_{k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_k`
@@ -80,3 +80,583 @@ def sparse_mul2(coo, value, vec):
 
     return res
 
+
+
+@njit(cache=True)
+def sparse_mul3_ens(coo, value, vec_a, vec_b):
+    """Sparse multiplication of a tensor with two ensembles of vectors:
+    :math:`v_{i,n} = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_{j,n} \, b_{k,n}`
+
+    The tensor entries are traversed only once, the contraction being performed for all
+    the members :math:`n` of the ensembles at each entry.
+
+    Warnings
+    --------
+    It is a Numba-jitted function, so it cannot take a :class:`sparse.COO` sparse tensor directly.
+    The tensor coordinates list and values must be provided separately by the user.
+
+    Parameters
+    ----------
+    coo: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 3), a list of n_elems tensor coordinates corresponding to each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec_a: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{j,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vec_b: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`b_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The ensemble of vectors :math:`v_{i,n}`, of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens).
+    """
+    res = np.zeros_like(vec_a)
+    n_elems = coo.shape[0]
+    n_ens = vec_a.shape[1]
+    for n in range(n_elems):
+        i = coo[n, 0]
+        j = coo[n, 1]
+        k = coo[n, 2]
+        v = value[n]
+        for m in range(n_ens):
+            res[i, m] += vec_a[j, m] * vec_b[k, m] * v
+    res[0, :] = 1.
+    return res
+
+
+@njit(parallel=True, cache=True)
+def sparse_mul3_ens_parallel(coo, value, vec_a, vec_b):
+    """Sparse multiplication of a tensor with two ensembles of vectors:
+    :math:`v_{i,n} = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_{j,n} \, b_{k,n}`
+
+    Same as :func:`sparse_mul3_ens`, but the members :math:`n` of the ensembles are distributed over the
+    available threads.
+
+    Warnings
+    --------
+    It is a Numba-jitted function, so it cannot take a :class:`sparse.COO` sparse tensor directly.
+    The tensor coordinates list and values must be provided separately by the user.
+
+    Parameters
+    ----------
+    coo: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 3), a list of n_elems tensor coordinates corresponding to each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec_a: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{j,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vec_b: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`b_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The ensemble of vectors :math:`v_{i,n}`, of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens).
+    """
+    res = np.zeros_like(vec_a)
+    n_elems = coo.shape[0]
+    n_ens = vec_a.shape[1]
+    for m in prange(n_ens):
+        for n in range(n_elems):
+            res[coo[n, 0], m] += vec_a[coo[n, 1], m] * vec_b[coo[n, 2], m] * value[n]
+        res[0, m] = 1.
+    return res
+
+
+@njit(cache=True)
+def sparse_mul2_ens(coo, value, vec):
+    """Sparse multiplication of a tensor with an ensemble of vectors:
+    :math:`A_{n,i,j} = {\displaystyle \sum_{k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_{k,n}`
+
+    Warnings
+    --------
+    It is a Numba-jitted function, so it cannot take a :class:`sparse.COO` sparse tensor directly.
+    The tensor coordinates list and values must be provided separately by the user.
+
+    Parameters
+    ----------
+    coo: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 3), a list of n_elems tensor coordinates corresponding to each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The matrices :math:`A_{n,i,j}`, of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, :attr:`~.params.QgParams.ndim` + 1).
+    """
+    n_ens = vec.shape[1]
+    res = np.zeros((n_ens, vec.shape[0], vec.shape[0]))
+
+    for n in range(coo.shape[0]):
+        i = coo[n, 0]
+        j = coo[n, 1]
+        k = coo[n, 2]
+        v = value[n]
+        for m in range(n_ens):
+            res[m, i, j] += vec[k, m] * v
+
+    return res
+
+
+@njit(cache=True)
+def sparse_mul3_csr(indptr, jk, value, vec_a, vec_b):
+    """Sparse multiplication of a tensor stored in compressed rows with two vectors:
+    :math:`v_i = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_j \, b_k`
+
+    Each component :math:`v_i` is accumulated in a local variable over the entries of the row :math:`i`
+    of the tensor, and written only once.
+
+    Warnings
+    --------
+    It is a Numba-jitted function, so it cannot take a :class:`sparse.COO` sparse tensor directly.
+    The compressed representation must be provided by the user, see :meth:`~.tensors.qgtensor.QgsTensor.tensor_csr`.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec_a: ~numpy.ndarray(float)
+        The vector :math:`a_j` to contract the tensor with. Must be of shape (:attr:`~.params.QgParams.ndim` + 1,).
+    vec_b: ~numpy.ndarray(float)
+        The vector :math:`b_k` to contract the tensor with. Must be of shape (:attr:`~.params.QgParams.ndim` + 1,).
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The vector :math:`v_i`, of shape (:attr:`~.params.QgParams.ndim` + 1,).
+    """
+    n_rows = len(indptr) - 1
+    res = np.empty_like(vec_a)
+    for i in range(n_rows):
+        acc = 0.
+        for n in range(indptr[i], indptr[i + 1]):
+            acc += vec_a[jk[n, 0]] * vec_b[jk[n, 1]] * value[n]
+        res[i] = acc
+    res[0] = 1.
+    return res
+
+
+@njit(cache=True)
+def sparse_mul2_csr_sym(indptr, jk, value, vec):
+    """Sparse multiplication of the symmetrized version of a tensor stored in compressed rows with one vector:
+    :math:`A_{i,j} = {\displaystyle \sum_{k=0}^{\mathrm{ndim}}} \, (\mathcal{T}_{i,j,k} + \mathcal{T}_{i,k,j}) \, a_k`
+
+    This is the Jacobian matrix of the contraction computed by :func:`sparse_mul3_csr`, obtained without
+    storing the symmetrized (jacobian) tensor.
+
+    Warnings
+    --------
+    It is a Numba-jitted function, so it cannot take a :class:`sparse.COO` sparse tensor directly.
+    The compressed representation must be provided by the user, see :meth:`~.tensors.qgtensor.QgsTensor.tensor_csr`.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec: ~numpy.ndarray(float)
+        The vector :math:`a_k` to contract the tensor with. Must be of shape (:attr:`~.params.QgParams.ndim` + 1,).
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The matrix :math:`A_{i,j}`, of shape (:attr:`~.params.QgParams.ndim` + 1, :attr:`~.params.QgParams.ndim` + 1).
+    """
+    n_rows = len(indptr) - 1
+    res = np.zeros((n_rows, len(vec)))
+    for i in range(n_rows):
+        for n in range(indptr[i], indptr[i + 1]):
+            j = jk[n, 0]
+            k = jk[n, 1]
+            res[i, j] += vec[k] * value[n]
+            res[i, k] += vec[j] * value[n]
+    return res
+
+
+@njit(cache=True)
+def sparse_mul3_ens_csr(indptr, jk, value, vec_a, vec_b):
+    """Sparse multiplication of a tensor stored in compressed rows with two ensembles of vectors:
+    :math:`v_{i,n} = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_{j,n} \, b_{k,n}`
+
+    Compressed rows version of :func:`sparse_mul3_ens`.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec_a: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{j,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vec_b: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`b_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The ensemble of vectors :math:`v_{i,n}`, of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec_a.shape[1]
+    res = np.zeros_like(vec_a)
+    for i in range(n_rows):
+        for n in range(indptr[i], indptr[i + 1]):
+            j = jk[n, 0]
+            k = jk[n, 1]
+            v = value[n]
+            for m in range(n_ens):
+                res[i, m] += vec_a[j, m] * vec_b[k, m] * v
+    res[0, :] = 1.
+    return res
+
+
+@njit(cache=True)
+def sparse_mul2_ens_csr_sym(indptr, jk, value, vec):
+    """Sparse multiplication of the symmetrized version of a tensor stored in compressed rows
+    with an ensemble of vectors:
+    :math:`A_{n,i,j} = {\displaystyle \sum_{k=0}^{\mathrm{ndim}}} \, (\mathcal{T}_{i,j,k} + \mathcal{T}_{i,k,j}) \, a_{k,n}`
+
+    Ensemble version of :func:`sparse_mul2_csr_sym`.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The matrices :math:`A_{n,i,j}`, of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, :attr:`~.params.QgParams.ndim` + 1).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec.shape[1]
+    res = np.zeros((n_ens, n_rows, vec.shape[0]))
+    for i in range(n_rows):
+        for n in range(indptr[i], indptr[i + 1]):
+            j = jk[n, 0]
+            k = jk[n, 1]
+            v = value[n]
+            for m in range(n_ens):
+                res[m, i, j] += vec[k, m] * v
+                res[m, i, k] += vec[j, m] * v
+    return res
+
+
+@njit(cache=True)
+def sparse_mul2_csr_sym_dot(indptr, jk, value, vec, vecs):
+    """Matrix-free product of the symmetrized version of a tensor stored in compressed rows, contracted
+    with an ensemble of vectors, with batches of vectors:
+    :math:`w_{n,i,p} = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, (\mathcal{T}_{i,j,k} + \mathcal{T}_{i,k,j}) \, a_{k,n} \, v_{n,j,p}`
+
+    This is the product of the matrices :math:`A_{n,i,j}` computed by :func:`sparse_mul2_ens_csr_sym` with the
+    vectors :math:`v_{n,j,p}`, i.e. the action of the Jacobian matrices, obtained without storing the matrices.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vecs: ~numpy.ndarray(float)
+        The batches of vectors :math:`v_{n,j,p}` to multiply, one batch per member of the ensemble.
+        Must be of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, n_vec).
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The batches of vectors :math:`w_{n,i,p}`, of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, n_vec).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec.shape[1]
+    n_vec = vecs.shape[2]
+    res = np.zeros((n_ens, n_rows, n_vec))
+    for i in range(n_rows):
+        for n in range(indptr[i], indptr[i + 1]):
+            j = jk[n, 0]
+            k = jk[n, 1]
+            v = value[n]
+            for m in range(n_ens):
+                vj = vec[j, m] * v
+                vk = vec[k, m] * v
+                for p in range(n_vec):
+                    res[m, i, p] += vk * vecs[m, j, p] + vj * vecs[m, k, p]
+    return res
+
+
+@njit(cache=True)
+def sparse_mul2_csr_sym_tdot(indptr, jk, value, vec, vecs):
+    """Matrix-free product of the transpose of the symmetrized version of a tensor stored in compressed rows,
+    contracted with an ensemble of vectors, with batches of vectors:
+    :math:`w_{n,j,p} = {\displaystyle \sum_{i,k=0}^{\mathrm{ndim}}} \, (\mathcal{T}_{i,j,k} + \mathcal{T}_{i,k,j}) \, a_{k,n} \, v_{n,i,p}`
+
+    This is the action of the transposed Jacobian matrices (adjoint model), see :func:`sparse_mul2_csr_sym_dot`.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vecs: ~numpy.ndarray(float)
+        The batches of vectors :math:`v_{n,i,p}` to multiply, one batch per member of the ensemble.
+        Must be of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, n_vec).
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The batches of vectors :math:`w_{n,j,p}`, of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, n_vec).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec.shape[1]
+    n_vec = vecs.shape[2]
+    res = np.zeros((n_ens, vec.shape[0], n_vec))
+    for i in range(n_rows):
+        for n in range(indptr[i], indptr[i + 1]):
+            j = jk[n, 0]
+            k = jk[n, 1]
+            v = value[n]
+            for m in range(n_ens):
+                vj = vec[j, m] * v
+                vk = vec[k, m] * v
+                for p in range(n_vec):
+                    w = vecs[m, i, p]
+                    res[m, j, p] += vk * w
+                    res[m, k, p] += vj * w
+    return res
+
+
+@njit(parallel=True, cache=True)
+def sparse_mul3_ens_csr_parallel(indptr, jk, value, vec_a, vec_b):
+    """Sparse multiplication of a tensor stored in compressed rows with two ensembles of vectors:
+    :math:`v_{i,n} = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}_{i,j,k} \, a_{j,n} \, b_{k,n}`
+
+    Same as :func:`sparse_mul3_ens_csr`, but the members :math:`n` of the ensembles are distributed over the
+    available threads.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensor are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `value` arrays.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    value: ~numpy.ndarray(float)
+        A 1D array of shape (n_elems,), a list of value in the tensor
+    vec_a: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{j,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vec_b: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`b_{k,n}` to contract the tensor with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The ensemble of vectors :math:`v_{i,n}`, of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec_a.shape[1]
+    res = np.empty_like(vec_a)
+    for m in prange(n_ens):
+        for i in range(n_rows):
+            acc = 0.
+            for n in range(indptr[i], indptr[i + 1]):
+                acc += vec_a[jk[n, 0], m] * vec_b[jk[n, 1], m] * value[n]
+            res[i, m] = acc
+        res[0, m] = 1.
+    return res
+
+
+@njit(cache=True)
+def sparse_mul_affine_csr(coeff_indptr, coeff_param, coeff_value, params):
+    """Values of the entries of a parameter-affine tensor stored in compressed rows, for a given parameters vector:
+    :math:`v_n = {\displaystyle \sum_m} \, \mathcal{B}_{m,n} \, p_m`
+
+    where :math:`n` runs over the entries :math:`(i, j, k)` of the tensor.
+
+    Warnings
+    --------
+    It is a Numba-jitted function, so it cannot take a :class:`sparse.COO` sparse tensor directly.
+    The compressed representation must be provided by the user, see :meth:`~.tensors.qgtensor.QgsTensor.affine_csr`.
+
+    Parameters
+    ----------
+    coeff_indptr: ~numpy.ndarray(int)
+        A 1D array of shape (n_elems + 1,). The coefficients of the entry :math:`n` are stored at the positions
+        `coeff_indptr[n]` to `coeff_indptr[n+1]` of the `coeff_param` and `coeff_value` arrays.
+    coeff_param: ~numpy.ndarray(int)
+        A 1D array of shape (n_coeffs,), the index :math:`m` of the parameter of each coefficient.
+    coeff_value: ~numpy.ndarray(float)
+        A 1D array of shape (n_coeffs,), the values of the coefficients.
+    params: ~numpy.ndarray(float)
+        The parameters vector :math:`p_m`.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The values :math:`v_n` of the entries, of shape (n_elems,), to be used with the other compressed rows
+        functions of this module.
+    """
+    n_elems = len(coeff_indptr) - 1
+    res = np.empty(n_elems)
+    for n in range(n_elems):
+        acc = 0.
+        for q in range(coeff_indptr[n], coeff_indptr[n + 1]):
+            acc += coeff_value[q] * params[coeff_param[q]]
+        res[n] = acc
+    return res
+
+
+@njit(cache=True)
+def sparse_mul_affine_ens_csr(coeff_indptr, coeff_param, coeff_value, params):
+    """Values of the entries of a parameter-affine tensor stored in compressed rows, for an ensemble of
+    parameters vectors:
+    :math:`v_{m,n} = {\displaystyle \sum_l} \, \mathcal{B}_{l,n} \, p_{m,l}`
+
+    Ensemble version of :func:`sparse_mul_affine_csr`.
+
+    Parameters
+    ----------
+    coeff_indptr: ~numpy.ndarray(int)
+        A 1D array of shape (n_elems + 1,). The coefficients of the entry :math:`n` are stored at the positions
+        `coeff_indptr[n]` to `coeff_indptr[n+1]` of the `coeff_param` and `coeff_value` arrays.
+    coeff_param: ~numpy.ndarray(int)
+        A 1D array of shape (n_coeffs,), the index :math:`l` of the parameter of each coefficient.
+    coeff_value: ~numpy.ndarray(float)
+        A 1D array of shape (n_coeffs,), the values of the coefficients.
+    params: ~numpy.ndarray(float)
+        The ensemble of parameters vectors :math:`p_{m,l}`, of shape (n_ens, n_params), i.e. one member per row.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The values :math:`v_{m,n}` of the entries of the tensor of each member, of shape (n_ens, n_elems).
+    """
+    n_ens = params.shape[0]
+    res = np.empty((n_ens, len(coeff_indptr) - 1))
+    for m in range(n_ens):
+        res[m] = sparse_mul_affine_csr(coeff_indptr, coeff_param, coeff_value, params[m])
+    return res
+
+
+@njit(cache=True)
+def sparse_mul3_ens_csr_members(indptr, jk, values, vec_a, vec_b):
+    """Sparse multiplication of an ensemble of tensors stored in compressed rows with two ensembles of vectors,
+    each member having its own tensor:
+    :math:`v_{i,n} = {\displaystyle \sum_{j,k=0}^{\mathrm{ndim}}} \, \mathcal{T}^{(n)}_{i,j,k} \, a_{j,n} \, b_{k,n}`
+
+    The tensors share the same compressed rows structure, only their values differ.
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensors are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` array and of the rows of the `values` array.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    values: ~numpy.ndarray(float)
+        A 2D array of shape (n_ens, n_elems), the values of the tensor of each member.
+    vec_a: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{j,n}` to contract the tensors with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+    vec_b: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`b_{k,n}` to contract the tensors with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The ensemble of vectors :math:`v_{i,n}`, of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec_a.shape[1]
+    res = np.empty_like(vec_a)
+    for m in range(n_ens):
+        for i in range(n_rows):
+            acc = 0.
+            for n in range(indptr[i], indptr[i + 1]):
+                acc += vec_a[jk[n, 0], m] * vec_b[jk[n, 1], m] * values[m, n]
+            res[i, m] = acc
+        res[0, m] = 1.
+    return res
+
+
+@njit(cache=True)
+def sparse_mul2_ens_csr_sym_members(indptr, jk, values, vec):
+    """Sparse multiplication of the symmetrized version of an ensemble of tensors stored in compressed rows
+    with an ensemble of vectors, each member having its own tensor:
+    :math:`A_{n,i,j} = {\displaystyle \sum_{k=0}^{\mathrm{ndim}}} \, (\mathcal{T}^{(n)}_{i,j,k} + \mathcal{T}^{(n)}_{i,k,j}) \, a_{k,n}`
+
+    Parameters
+    ----------
+    indptr: ~numpy.ndarray(int)
+        A 1D array of shape (:attr:`~.params.QgParams.ndim` + 2,). The entries of the row :math:`i` of the tensors are
+        stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` array and of the rows of the `values` array.
+    jk: ~numpy.ndarray(int)
+        A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each value provided.
+    values: ~numpy.ndarray(float)
+        A 2D array of shape (n_ens, n_elems), the values of the tensor of each member.
+    vec: ~numpy.ndarray(float)
+        The ensemble of vectors :math:`a_{k,n}` to contract the tensors with.
+        Must be of shape (:attr:`~.params.QgParams.ndim` + 1, n_ens), i.e. one member per column.
+
+    Returns
+    -------
+    ~numpy.ndarray(float)
+        The matrices :math:`A_{n,i,j}`, of shape (n_ens, :attr:`~.params.QgParams.ndim` + 1, :attr:`~.params.QgParams.ndim` + 1).
+    """
+    n_rows = len(indptr) - 1
+    n_ens = vec.shape[1]
+    res = np.zeros((n_ens, n_rows, vec.shape[0]))
+    for m in range(n_ens):
+        for i in range(n_rows):
+            for n in range(indptr[i], indptr[i + 1]):
+                j = jk[n, 0]
+                k = jk[n, 1]
+                v = values[m, n]
+                res[m, i, j] += vec[k, m] * v
+                res[m, i, k] += vec[j, m] * v
+    return res
@@ -13,10 +13,17 @@ from numba import njit
 from dapper.mods.Qgs.qgs.inner_products.analytic import AtmosphericAnalyticInnerProducts, OceanicAnalyticInnerProducts, GroundAnalyticInnerProducts
 from dapper.mods.Qgs.qgs.inner_products.symbolic import AtmosphericSymbolicInnerProducts, OceanicSymbolicInnerProducts, GroundSymbolicInnerProducts
 from dapper.mods.Qgs.qgs.tensors.qgtensor import QgsTensor
-from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul3, sparse_mul2
+from dapper.mods.Qgs.qgs.tensors.cache import TensorCache
+from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul3_csr, sparse_mul2_csr_sym
+from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul3_ens_csr, sparse_mul3_ens_csr_parallel, sparse_mul2_ens_csr_sym
+from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul2_csr_sym_dot, sparse_mul2_csr_sym_tdot
+from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul_affine_csr, sparse_mul_affine_ens_csr
+from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul3_ens_csr_members, sparse_mul2_ens_csr_sym_members
 
 
-def create_tendencies(params, return_inner_products=False, return_qgtensor=False):
+def create_tendencies(params, return_inner_products=False, return_qgtensor=False,
+                      return_ensemble_tendencies=False, parallel_ensemble=False, return_linear_part=False,
+                      return_jacobian_action=False, cache=True):
     """Function to handle the inner products and tendencies tensors construction.
     Returns the tendencies function :math:`\\boldsymbol{f}` determining the model's ordinary differential
     equations:
@@ -39,20 +46,315 @@ def create_tendencies(params, return_inner_products=False, return_qgtensor=False
         If True, return the inner products of the model. Default to False.
     return_qgtensor: bool
         If True, return the tendencies tensor of the model. Default to False.
+    return_ensemble_tendencies: bool
+        If True, return also the ensemble versions `f_ens` and `Df_ens` of the tendencies and linearized tendencies,
+        evaluating a whole ensemble of states in a single pass over the tensor. Default to False.
+    parallel_ensemble: bool
+        If True, the ensemble tendencies `f_ens` distribute the ensemble members over the available threads
+        instead of performing a single pass over the tensor. Only used if `return_ensemble_tendencies` is True.
+        Default to False.
+    return_linear_part: bool
+        If True, return also the splitting of the tendencies into their linear part :math:`\\boldsymbol{\\mathrm{L}}`
+        and the remainder :math:`\\boldsymbol{n}`, gathering the constant forcing and the quadratic terms:
 
+        .. math:: \\boldsymbol{f}(\\boldsymbol{x}) = \\boldsymbol{\\mathrm{L}} \\cdot \\boldsymbol{x} + \\boldsymbol{n}(\\boldsymbol{x})
+
+        to be used by the exponential integrators (see :func:`~.integrators.integrate.integrate_etdrk4`).
+        Default to False.
+    return_jacobian_action: bool
+        If True, return also the matrix-free actions `Df_dot` and `Df_tdot` of the linearized tendencies and of their
+        transpose (adjoint) on batches of vectors, computed directly from the tensor without forming the
+        Jacobian matrices. Default to False.
+    cache: bool or TensorCache
+        The persistent cache where the tendencies tensor is looked up before being computed, and stored after.
+        If True, use the default :class:`~.tensors.cache.TensorCache`, located in the DAPPER data folder.
+        If False, the tensor is always computed. Default to True.
 
     Returns
     -------
     f: callable
-        The numba-jitted tendencies function.
+        The numba-jitted tendencies function. Its attribute `tensor_csr` holds the tendencies tensor in compressed rows
+        form (see :meth:`~.tensors.qgtensor.QgsTensor.tensor_csr`), with which the integrators call kernels compiled
+        once and cached on disk, instead of compiling the function in every process.
     Df: callable
         The numba-jitted linearized tendencies function.
+    f_ens: callable
+        If `return_ensemble_tendencies` is True, the numba-jitted ensemble tendencies function.
+        Has the signature ``f_ens(t, X)`` where ``X`` is an array of shape (`n_ens`, :attr:`~.params.QgParams.ndim`)
+        and returns an array of the same shape. Has also the attribute `tensor_csr` if `parallel_ensemble` is False.
+    Df_ens: callable
+        If `return_ensemble_tendencies` is True, the numba-jitted ensemble linearized tendencies function.
+        Has the signature ``Df_ens(t, X)`` where ``X`` is an array of shape (`n_ens`, :attr:`~.params.QgParams.ndim`)
+        and returns an array of shape (`n_ens`, :attr:`~.params.QgParams.ndim`, :attr:`~.params.QgParams.ndim`).
+    L: ~numpy.ndarray
+        If `return_linear_part` is True, the linear part of the tendencies, as a dense array of shape
+        (:attr:`~.params.QgParams.ndim`, :attr:`~.params.QgParams.ndim`).
+    f_nl: callable
+        If `return_linear_part` is True, the numba-jitted nonlinear part of the tendencies :math:`\\boldsymbol{n}`.
+    f_nl_ens: callable
+        If `return_linear_part` and `return_ensemble_tendencies` are True, the numba-jitted ensemble version of
+        the nonlinear part of the tendencies, with the same signature as `f_ens`.
+    Df_dot: callable
+        If `return_jacobian_action` is True, the numba-jitted action of the linearized tendencies.
+        Has the signature ``Df_dot(t, X, V)`` where ``X`` is an array of shape (`n_ens`, :attr:`~.params.QgParams.ndim`)
+        and ``V`` an array of shape (`n_ens`, :attr:`~.params.QgParams.ndim`, `n_vec`), and returns the array of the same
+        shape as ``V`` whose element `n` is :math:`\\boldsymbol{\\mathrm{J}}(\\boldsymbol{x}_n) \\cdot \\boldsymbol{V}_n`.
+    Df_tdot: callable
+        If `return_jacobian_action` is True, the numba-jitted action of the transposed linearized tendencies,
+        with the same signature as `Df_dot` and returning :math:`\\boldsymbol{\\mathrm{J}}^T(\\boldsymbol{x}_n) \\cdot \\boldsymbol{V}_n`.
     inner_products: (AtmosphericInnerProducts, OceanicInnerProducts)
         If `return_inner_products` is True, the inner products of the system.
     qgtensor: QgsTensor
         If `return_qgtensor` is True, the tendencies tensor of the system.
     """
 
+    if cache is True:
+        cache = TensorCache()
+
+    agotensor = None
+    if cache and not return_inner_products:
+        agotensor = cache.load(params)
+
+    if agotensor is None:
+        agotensor = _compute_tensor(params)
+        if cache:
+            cache.save(agotensor)
+
+    indptr, jk, val = agotensor.tensor_csr
+
+    @njit
+    def f(t, x):
+        xx = np.concatenate((np.full((1,), 1.), x))
+        xr = sparse_mul3_csr(indptr, jk, val, xx, xx)
+
+        return xr[1:]
+
+    @njit
+    def Df(t, x):
+        xx = np.concatenate((np.full((1,), 1.), x))
+        mul_jac = sparse_mul2_csr_sym(indptr, jk, val, xx)
+        return mul_jac[1:, 1:]
+
+    if parallel_ensemble:
+        ens_mul3 = sparse_mul3_ens_csr_parallel
+    else:
+        ens_mul3 = sparse_mul3_ens_csr
+
+    @njit
+    def f_ens(t, X):
+        xx = np.ones((X.shape[1] + 1, X.shape[0]))
+        xx[1:] = X.T
+        xr = ens_mul3(indptr, jk, val, xx, xx)
+        return xr[1:].T.copy()
+
+    @njit
+    def Df_ens(t, X):
+        xx = np.ones((X.shape[1] + 1, X.shape[0]))
+        xx[1:] = X.T
+        mul_jac = sparse_mul2_ens_csr_sym(indptr, jk, val, xx)
+        return mul_jac[:, 1:, 1:].copy()
+
+    # the integrators use the tensor to call their kernels cached on disk instead of compiling the closures
+    f.tensor_csr = agotensor.tensor_csr
+    if not parallel_ensemble:
+        f_ens.tensor_csr = agotensor.tensor_csr
+
+    ret = list()
+    ret.append(f)
+    ret.append(Df)
+    if return_ensemble_tendencies:
+        ret.append(f_ens)
+        ret.append(Df_ens)
+    if return_linear_part:
+        L, (nl_indptr, nl_jk, nl_val) = split_linear_part(agotensor.tensor_csr)
+
+        @njit
+        def f_nl(t, x):
+            xx = np.concatenate((np.full((1,), 1.), x))
+            xr = sparse_mul3_csr(nl_indptr, nl_jk, nl_val, xx, xx)
+            return xr[1:]
+
+        @njit
+        def f_nl_ens(t, X):
+            xx = np.ones((X.shape[1] + 1, X.shape[0]))
+            xx[1:] = X.T
+            xr = ens_mul3(nl_indptr, nl_jk, nl_val, xx, xx)
+            return xr[1:].T.copy()
+
+        ret.append(L)
+        ret.append(f_nl)
+        if return_ensemble_tendencies:
+            ret.append(f_nl_ens)
+    if return_jacobian_action:
+
+        @njit
+        def Df_dot(t, X, V):
+            xx = np.ones((X.shape[1] + 1, X.shape[0]))
+            xx[1:] = X.T
+            vv = np.zeros((V.shape[0], V.shape[1] + 1, V.shape[2]))
+            vv[:, 1:] = V
+            res = sparse_mul2_csr_sym_dot(indptr, jk, val, xx, vv)
+            return res[:, 1:].copy()
+
+        @njit
+        def Df_tdot(t, X, V):
+            xx = np.ones((X.shape[1] + 1, X.shape[0]))
+            xx[1:] = X.T
+            vv = np.zeros((V.shape[0], V.shape[1] + 1, V.shape[2]))
+            vv[:, 1:] = V
+            res = sparse_mul2_csr_sym_tdot(indptr, jk, val, xx, vv)
+            return res[:, 1:].copy()
+
+        ret.append(Df_dot)
+        ret.append(Df_tdot)
+    if return_inner_products:
+        ret.append((agotensor.atmospheric_inner_products, agotensor.oceanic_inner_products,
+                    agotensor.ground_inner_products))
+    if return_qgtensor:
+        ret.append(agotensor)
+    return ret
+
+
+def create_parametric_tendencies(params, return_ensemble_tendencies=False, return_inner_products=False,
+                                 return_qgtensor=False):
+    """Function to handle the inner products and parameter-affine tendencies tensor construction.
+    Returns the tendencies function :math:`\\boldsymbol{f}` of the model and its linearization, taking the
+    parameters vector :math:`\\boldsymbol{p}` as argument:
+
+    .. math:: \\dot{\\boldsymbol{x}} = \\boldsymbol{f}(\\boldsymbol{x}, \\boldsymbol{p})
+
+    such that the model can be integrated for other values of the parameters without rebuilding its tensor,
+    e.g. in parameter sweeps or augmented-state parameter estimation.
+    See :meth:`~.tensors.qgtensor.QgsTensor.reparameterize` for the parameters which cannot be changed this way.
+
+    Parameters
+    ----------
+    params: QgParams
+        The parameters fully specifying the model configuration.
+    return_ensemble_tendencies: bool
+        If True, return also the ensemble versions `f_ens` and `Df_ens` of the tendencies and linearized tendencies,
+        in which each member has its own parameters, and the function `tensor_values` computing the values of the
+        tensor of each member from their parameters. Default to False.
+    return_inner_products: bool
+        If True, return the inner products of the model. Default to False.
+    return_qgtensor: bool
+        If True, return the parameter-affine tendencies tensor of the model. Default to False.
+
+    Returns
+    -------
+    f: callable
+        The numba-jitted tendencies function, with the signature ``f(t, x, p)``.
+    Df: callable
+        The numba-jitted linearized tendencies function, with the signature ``Df(t, x, p)``.
+    p: ~numpy.ndarray
+        The parameters vector corresponding to `params`. The names of its components are given by the attribute
+        :attr:`~.tensors.qgtensor.QgsTensor.affine_parameters` of the tensor, and the vector corresponding to
+        other parameters values by its method :meth:`~.tensors.qgtensor.QgsTensor.parameter_vector`.
+    tensor_values: callable
+        If `return_ensemble_tendencies` is True, the numba-jitted function computing the values of the tensors of an
+        ensemble of members. Has the signature ``tensor_values(P)`` where ``P`` is an array of shape (`n_ens`, `len(p)`)
+        of parameters vectors, and returns an array of shape (`n_ens`, n_elems).
+    f_ens: callable
+        If `return_ensemble_tendencies` is True, the numba-jitted ensemble tendencies function.
+        Has the signature ``f_ens(t, X, V)`` where ``X`` is an array of shape (`n_ens`, :attr:`~.params.QgParams.ndim`)
+        and ``V`` the values of the tensors of the members returned by `tensor_values`, and returns an array of the
+        same shape as ``X``. All the members are evaluated in a single pass.
+    Df_ens: callable
+        If `return_ensemble_tendencies` is True, the numba-jitted ensemble linearized tendencies function,
+        with the signature ``Df_ens(t, X, V)``, returning an array of shape
+        (`n_ens`, :attr:`~.params.QgParams.ndim`, :attr:`~.params.QgParams.ndim`).
+    inner_products: (AtmosphericInnerProducts, OceanicInnerProducts)
+        If `return_inner_products` is True, the inner products of the system.
+    qgtensor: QgsTensor
+        If `return_qgtensor` is True, the parameter-affine tendencies tensor of the system.
+    """
+
+    agotensor = _compute_tensor(params, affine=True)
+    indptr, jk, coeff_indptr, coeff_param, coeff_value = agotensor.affine_csr
+
+    @njit
+    def f(t, x, p):
+        val = sparse_mul_affine_csr(coeff_indptr, coeff_param, coeff_value, p)
+        xx = np.concatenate((np.full((1,), 1.), x))
+        xr = sparse_mul3_csr(indptr, jk, val, xx, xx)
+        return xr[1:]
+
+    @njit
+    def Df(t, x, p):
+        val = sparse_mul_affine_csr(coeff_indptr, coeff_param, coeff_value, p)
+        xx = np.concatenate((np.full((1,), 1.), x))
+        mul_jac = sparse_mul2_csr_sym(indptr, jk, val, xx)
+        return mul_jac[1:, 1:]
+
+    @njit
+    def tensor_values(P):
+        return sparse_mul_affine_ens_csr(coeff_indptr, coeff_param, coeff_value, P)
+
+    @njit
+    def f_ens(t, X, V):
+        xx = np.ones((X.shape[1] + 1, X.shape[0]))
+        xx[1:] = X.T
+        xr = sparse_mul3_ens_csr_members(indptr, jk, V, xx, xx)
+        return xr[1:].T.copy()
+
+    @njit
+    def Df_ens(t, X, V):
+        xx = np.ones((X.shape[1] + 1, X.shape[0]))
+        xx[1:] = X.T
+        mul_jac = sparse_mul2_ens_csr_sym_members(indptr, jk, V, xx)
+        return mul_jac[:, 1:, 1:].copy()
+
+    ret = list()
+    ret.append(f)
+    ret.append(Df)
+    ret.append(agotensor.parameter_vector())
+    if return_ensemble_tendencies:
+        ret.append(tensor_values)
+        ret.append(f_ens)
+        ret.append(Df_ens)
+    if return_inner_products:
+        ret.append((agotensor.atmospheric_inner_products, agotensor.oceanic_inner_products,
+                    agotensor.ground_inner_products))
+    if return_qgtensor:
+        ret.append(agotensor)
+    return ret
+
+
+def split_linear_part(tensor_csr):
+    """Split a tendencies tensor in compressed rows form into its linear part and the remaining terms.
+
+    The linear terms are the entries :math:`\\mathcal{T}_{i,0,k}` with :math:`k > 0`, since the state is
+    augmented with a leading 1. The constant terms :math:`\\mathcal{T}_{i,0,0}` are kept with the quadratic ones.
+
+    Parameters
+    ----------
+    tensor_csr: tuple(~numpy.ndarray)
+        The tensor in compressed rows form `(indptr, jk, data)`, see :meth:`~.tensors.qgtensor.QgsTensor.compress_rows`.
+
+    Returns
+    -------
+    L: ~numpy.ndarray
+        The linear part, as a dense array of shape (`n_rows` - 1, `n_rows` - 1).
+    nonlinear_csr: tuple(~numpy.ndarray)
+        The remaining constant and quadratic terms, in the same compressed rows form.
+    """
+    indptr, jk, data = tensor_csr
+    n_rows = len(indptr) - 1
+    rows = np.repeat(np.arange(n_rows), np.diff(indptr))
+    linear = (jk[:, 0] == 0) & (jk[:, 1] > 0)
+
+    L = np.zeros((n_rows - 1, n_rows - 1))
+    np.add.at(L, (rows[linear] - 1, jk[linear, 1] - 1), data[linear])
+
+    nonlinear = ~linear
+    nl_indptr = np.zeros_like(indptr)
+    nl_indptr[1:] = np.cumsum(np.bincount(rows[nonlinear], minlength=n_rows))
+    return L, (nl_indptr, np.ascontiguousarray(jk[nonlinear]), data[nonlinear].copy())
+
+
+def _compute_tensor(params, affine=False):
+    """Compute the inner products and the tendencies tensor of a model configuration."""
+
     if params.ablocks is not None:
         aip = AtmosphericAnalyticInnerProducts(params)
     elif params.atmospheric_basis is not None:
@@ -81,35 +383,7 @@ def create_tendencies(params, return_inner_products=False, return_qgtensor=False
         if not aip.connected_to_ground:
             aip.connect_to_ground(gip)
 
-    agotensor = QgsTensor(params, aip, oip, gip)
-
-    coo = agotensor.tensor.coords.T
-    val = agotensor.tensor.data
-
-    @njit
-    def f(t, x):
-        xx = np.concatenate((np.full((1,), 1.), x))
-        xr = sparse_mul3(coo, val, xx, xx)
-
-        return xr[1:]
-
-    jcoo = agotensor.jacobian_tensor.coords.T
-    jval = agotensor.jacobian_tensor.data
-
-    @njit
-    def Df(t, x):
-        xx = np.concatenate((np.full((1,), 1.), x))
-        mul_jac = sparse_mul2(jcoo, jval, xx)
-        return mul_jac[1:, 1:]
-
-    ret = list()
-    ret.append(f)
-    ret.append(Df)
-    if return_inner_products:
-        ret.append((aip, oip, gip))
-    if return_qgtensor:
-        ret.append(agotensor)
-    return ret
+    return QgsTensor(params, aip, oip, gip, affine=affine)
 
 
 if __name__ == '__main__':
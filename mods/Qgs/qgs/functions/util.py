@@ -11,7 +11,7 @@ import numpy as np
 from numba import njit
 
 
-@njit
+@njit(cache=True)
 def reverse(a):
     """Numba-jitted function to reverse a 1D array.
 
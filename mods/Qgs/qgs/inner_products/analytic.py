@@ -58,6 +58,10 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         If `None`, an empty object is initialized.
     stored: bool, optional
         Indicate if the inner products must be computed and stored at the initialization. Default to `True`.
+    vectorized: bool, optional
+        Indicate if the stored inner products must be computed with the vectorized (NumPy broadcasting) versions
+        of the analytic formula. If `False`, they are computed element by element, which is slower but
+        kept as a reference. Default to `True`.
 
     Attributes
     ----------
@@ -73,11 +77,13 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         Indicate if the atmosphere is connected to the ground.
     stored: bool
         Indicate if the inner products are stored in the object.
+    vectorized: bool
+        Indicate if the stored inner products are computed with the vectorized analytic formula.
     atmospheric_wavenumbers: ~numpy.ndarray(WaveNumber)
         An array of shape (:attr:`~.params.QgParams.nmod` [0], ) of the wavenumber object of each mode.
     """
 
-    def __init__(self, params=None, stored=True):
+    def __init__(self, params=None, stored=True, vectorized=True):
 
         AtmosphericInnerProducts.__init__(self)
 
@@ -104,9 +110,12 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         # Atmospheric wavenumbers definition
         if ams is not None:
             self.atmospheric_wavenumbers = channel_wavenumbers(ams)
+            self._wavenumbers_table = _wavenumbers_table(self.atmospheric_wavenumbers)
         else:
             self.atmospheric_wavenumbers = None
+            self._wavenumbers_table = None
 
+        self.vectorized = vectorized
         self.stored = stored
         if stored:
             self.compute_inner_products()
@@ -125,7 +134,11 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         self.ocean_inner_products = ocean_inner_products
         self.connected_to_ocean = True
 
-        if self.stored:
+        if self.stored and self.vectorized:
+            i, j = np.indices((self.natm, ocean_inner_products.noc))
+            self._s = _to_coo(self._s_vec(i, j))
+            self._d = _to_coo(self._d_vec(i, j))
+        elif self.stored:
             noc = ocean_inner_products.noc
             self._s = sp.zeros((self.natm, noc), dtype=float, format='dok')
             self._d = sp.zeros((self.natm, noc), dtype=float, format='dok')
@@ -162,7 +175,10 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         self.ground_inner_products = ground_inner_products
         self.connected_to_ground = True
 
-        if self.stored:
+        if self.stored and self.vectorized:
+            i, j = np.indices((self.natm, ground_inner_products.ngr))
+            self._s = _to_coo(self._s_vec(i, j))
+        elif self.stored:
             ngr = ground_inner_products.ngr
             self._s = sp.zeros((self.natm, ngr), dtype=float, format='dok')
             args_list = [(i, j) for i in range(self.natm) for j in range(ngr)]
@@ -183,6 +199,15 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
     def compute_inner_products(self):
         """Function computing and storing all the inner products at once."""
 
+        if self.vectorized:
+            i, j = np.indices((self.natm, self.natm))
+            self._a = _to_coo(self._a_vec(i, j))
+            self._u = _to_coo(self._u_vec(i, j))
+            self._c = _to_coo(self._c_vec(i, j))
+            self._g = _to_coo_by_rows(self._g_vec, (self.natm, self.natm, self.natm))
+            self._b = _to_coo_by_rows(self._b_vec, (self.natm, self.natm, self.natm))
+            return
+
         self._a = sp.zeros((self.natm, self.natm), dtype=float, format='dok')
         self._u = sp.zeros((self.natm, self.natm), dtype=float, format='dok')
         self._c = sp.zeros((self.natm, self.natm), dtype=float, format='dok')
@@ -238,6 +263,10 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         else:
             return 0
 
+    def _a_vec(self, i, j):
+        T = self._wavenumbers_table
+        return np.where(i == j, - (self.n ** 2) * T.nx[i] ** 2 - T.ny[i] ** 2, 0.)
+
     def u(self, i, j):
         """Function to compute the matrix of inner product: :math:`u_{i, j} = (F_i, F_j)`."""
         if self.stored and self._u is not None:
@@ -248,6 +277,9 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
     def _u_comp(self, i, j):
         return _delta(i - j)
 
+    def _u_vec(self, i, j):
+        return _delta_vec(i - j)
+
     def b(self, i, j, k):
         """Function to compute the tensors holding the Jacobian inner products: :math:`b_{i, j, k} = (F_i, J(F_j, \\nabla^2 F_k))`."""
         if self.stored and self._b is not None:
@@ -258,6 +290,9 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
     def _b_comp(self, i, j, k):
         return self._a_comp(k, k) * self._g_comp(i, j, k)
 
+    def _b_vec(self, i, j, k):
+        return self._a_vec(k, k) * self._g_vec(i, j, k)
+
     def c(self, i, j):
         """Function to compute the matrix of beta terms for the atmosphere: :math:`c_{i,j} = (F_i, \partial_x F_j)`."""
         if self.stored and self._c is not None:
@@ -281,6 +316,17 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
 
         return val
 
+    def _c_vec(self, i, j):
+        n = self.n
+        T = self._wavenumbers_table
+        Ti = T[i]
+        Tj = T[j]
+
+        val = np.where((Ti.type == 1) & (Tj.type == 2), n * Ti.M * _delta_vec(Ti.M - Tj.H) * _delta_vec(Ti.P - Tj.P), 0.)
+        val += np.where((Ti.type == 2) & (Tj.type == 1), - n * Tj.M * _delta_vec(Tj.M - Ti.H) * _delta_vec(Tj.P - Ti.P), 0.)
+
+        return val
+
     def g(self, i, j, k):
         """Function to compute tensors holding the Jacobian inner products: :math:`g_{i,j,k} = (F_i, J(F_j, F_k))`."""
         if self.stored and self._g is not None:
@@ -375,6 +421,69 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
 
         return val * n * par
 
+    def _g_vec(self, i, j, k):
+
+        sq2 = np.sqrt(2.)
+        pi = np.pi
+        n = self.n
+        T = self._wavenumbers_table
+
+        i, j, k = np.broadcast_arrays(i, j, k)
+        shape = i.shape
+        indices = np.stack((i.ravel(), j.ravel(), k.ravel()))
+        s = T.type[indices]
+        ss = np.sort(s, axis=0)
+
+        val = np.zeros(indices.shape[1])
+
+        # L, L, L
+        w = np.all(s == 2, axis=0)
+        if np.any(w):
+            perm, par = _piksort_vec(indices[:, w])
+            a = np.take_along_axis(indices[:, w], perm, axis=0)
+            Ti, Tj, Tk = T[a[0]], T[a[1]], T[a[2]]
+            val[w] = par * _jacobian_LLL(Ti, Tj, Tk)
+
+        # A, K, L
+        w = (ss[0] == 0) & (ss[1] == 1) & (ss[2] == 2)
+        if np.any(w):
+            perm, par = _piksort_vec(s[:, w])
+            a = np.take_along_axis(indices[:, w], perm, axis=0)
+            Ti, Tj, Tk = T[a[0]], T[a[1]], T[a[2]]
+
+            vb1 = (Tk.P + Tj.P) / Ti.P
+            vb2 = (Tk.P - Tj.P) / Ti.P
+            v = -2 * (sq2 / pi) * Tj.M * _delta_vec(Tj.M - Tk.H) * _flambda_vec(Ti.P + Tj.P + Tk.P)
+            nz = v != 0
+            v[nz] *= ((vb1[nz] ** 2) / (vb1[nz] ** 2 - 1)) - ((vb2[nz] ** 2) / (vb2[nz] ** 2 - 1))
+            val[w] = par * v
+
+        # K, K, L
+        w = (ss[0] == 1) & (ss[1] == 1) & (ss[2] == 2)
+        if np.any(w):
+            perm, par = _piksort_vec(s[:, w])
+            a = np.take_along_axis(indices[:, w], perm, axis=0)
+            Ti, Tj, Tk = T[a[0]], T[a[1]], T[a[2]]
+
+            vs1 = _S1(Tj.P, Tk.P, Tj.M, Tk.H)
+            vs2 = _S2(Tj.P, Tk.P, Tj.M, Tk.H)
+            v = vs1 * (_delta_vec(Ti.M - Tk.H - Tj.M)
+                       * _delta_vec(Ti.P - Tk.P + Tj.P)
+                       - _delta_vec(Ti.M - Tk.H - Tj.M)
+                       * _delta_vec(Ti.P + Tk.P - Tj.P)
+                       + (_delta_vec(Tk.H - Tj.M + Ti.M)
+                          + _delta_vec(Tk.H - Tj.M - Ti.M))
+                       * _delta_vec(Tk.P + Tj.P - Ti.P)) \
+                + vs2 * (_delta_vec(Ti.M - Tk.H - Tj.M)
+                         * _delta_vec(Ti.P - Tk.P - Tj.P)
+                         + (_delta_vec(Tk.H - Tj.M - Ti.M)
+                            + _delta_vec(Ti.M + Tk.H - Tj.M))
+                         * (_delta_vec(Ti.P - Tk.P + Tj.P)
+                            - _delta_vec(Tk.P - Tj.P + Ti.P)))
+            val[w] = par * v
+
+        return (val * n).reshape(shape)
+
     def s(self, i, j):
         """Function to compute the forcing (thermal) of the ocean on the atmosphere: :math:`s_{i,j} = (F_i, \phi_j)`."""
         if self.stored and self._s is not None:
@@ -415,6 +524,40 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
             val = 0
         return val
 
+    def _s_vec(self, i, j):
+        i, j = np.broadcast_arrays(i, j)
+        if self.connected_to_ocean:
+            sq2 = np.sqrt(2.)
+            pi = np.pi
+
+            Ti = self._wavenumbers_table[i]
+            Dj = self.ocean_inner_products._wavenumbers_table[j]
+
+            val = np.zeros(i.shape)
+
+            w = Ti.type == 0
+            v = _flambda_vec(Dj.H[w]) * _flambda_vec(Dj.P[w] + Ti.P[w])
+            nz = v != 0.
+            P, Pt, H = Dj.P[w][nz], Ti.P[w][nz], Dj.H[w][nz]
+            v[nz] *= 8 * sq2 * P / (pi ** 2 * (P ** 2 - Pt ** 2) * H)
+            val[w] = v
+
+            w = Ti.type == 1
+            v = _flambda_vec(2 * Ti.M[w] + Dj.H[w]) * _delta_vec(Dj.P[w] - Ti.P[w])
+            nz = v != 0.
+            M, H = Ti.M[w][nz], Dj.H[w][nz]
+            v[nz] *= 4 * H / (pi * (-4 * M ** 2 + H ** 2))
+            val[w] = v
+
+            w = Ti.type == 2
+            val[w] = _delta_vec(Dj.P[w] - Ti.P[w]) * _delta_vec(2 * Ti.H[w] - Dj.H[w])
+
+        elif self.connected_to_ground:
+            val = _delta_vec(i - j)
+        else:
+            val = np.zeros(i.shape)
+        return val
+
     def d(self, i, j):
         """Function to compute the forcing of the ocean on the atmosphere: :math:`d_{i,j} = (F_i, \\nabla^2 \phi_j)`."""
         if self.stored and self._d is not None:
@@ -428,6 +571,12 @@ class AtmosphericAnalyticInnerProducts(AtmosphericInnerProducts):
         else:
             return 0
 
+    def _d_vec(self, i, j):
+        if self.connected_to_ocean:
+            return self._s_vec(i, j) * self.ocean_inner_products._M_vec(j, j)
+        else:
+            return np.zeros(np.broadcast(i, j).shape)
+
 
 class OceanicAnalyticInnerProducts(OceanicInnerProducts):
     """Class which contains all the oceanic inner products coefficients needed for the tendencies
@@ -443,6 +592,10 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         If `None`, an empty object is initialized.
     stored: bool, optional
         Indicate if the inner products must be computed and stored at the initialization. Default to `True`.
+    vectorized: bool, optional
+        Indicate if the stored inner products must be computed with the vectorized (NumPy broadcasting) versions
+        of the analytic formula. If `False`, they are computed element by element, which is slower but
+        kept as a reference. Default to `True`.
 
     Attributes
     ----------
@@ -454,12 +607,14 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         Indicate if the ocean is connected to an atmosphere.
     stored: bool
         Indicate if the inner products are stored in the object.
+    vectorized: bool
+        Indicate if the stored inner products are computed with the vectorized analytic formula.
     oceanic_wavenumbers: ~numpy.ndarray(WaveNumber)
         An array of shape (:attr:`~.params.QgParams.nmod` [1], ) of the wavenumber object of each mode.
 
     """
 
-    def __init__(self, params=None, stored=True):
+    def __init__(self, params=None, stored=True, vectorized=True):
 
         OceanicInnerProducts.__init__(self)
 
@@ -483,9 +638,12 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         # Oceanic wavenumbers definition
         if oms is not None:
             self.oceanic_wavenumbers = basin_wavenumbers(oms)
+            self._wavenumbers_table = _wavenumbers_table(self.oceanic_wavenumbers)
         else:
             self.oceanic_wavenumbers = None
+            self._wavenumbers_table = None
 
+        self.vectorized = vectorized
         self.stored = stored
         if stored:
             self.compute_inner_products()
@@ -502,7 +660,14 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         self.atmosphere_inner_products = atmosphere_inner_products
         self.connected_to_atmosphere = True
 
-        if self.stored:
+        if self.stored and self.vectorized:
+            i, j = np.indices((self.noc, atmosphere_inner_products.natm))
+            self._K = _to_coo(self._K_vec(i, j))
+            self._W = _to_coo(self._W_vec(i, j))
+
+            self.atmosphere_inner_products = None
+
+        elif self.stored:
             natm = atmosphere_inner_products.natm
             self._K = sp.zeros((self.noc, natm), dtype=float, format='dok')
             self._W = sp.zeros((self.noc, natm), dtype=float, format='dok')
@@ -523,6 +688,15 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
     def compute_inner_products(self):
         """Function computing and storing all the inner products at once."""
 
+        if self.vectorized:
+            i, j = np.indices((self.noc, self.noc))
+            self._M = _to_coo(self._M_vec(i, j))
+            self._U = _to_coo(self._U_vec(i, j))
+            self._N = _to_coo(self._N_vec(i, j))
+            self._O = _to_coo_by_rows(self._O_vec, (self.noc, self.noc, self.noc))
+            self._C = _to_coo_by_rows(self._C_vec, (self.noc, self.noc, self.noc))
+            return
+
         self._M = sp.zeros((self.noc, self.noc), dtype=float, format='dok')
         self._U = sp.zeros((self.noc, self.noc), dtype=float, format='dok')
         self._N = sp.zeros((self.noc, self.noc), dtype=float, format='dok')
@@ -576,6 +750,12 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         else:
             return 0
 
+    def _K_vec(self, i, j):
+        if self.connected_to_atmosphere:
+            return self.atmosphere_inner_products._s_vec(j, i) * self.atmosphere_inner_products._a_vec(j, j)
+        else:
+            return np.zeros(np.broadcast(i, j).shape)
+
     def M(self, i, j):
         """Forcing of the ocean fields on the ocean: :math:`M_{i,j} = (\phi_i, \\nabla^2 \phi_j)`."""
         if self.stored and self._M is not None:
@@ -591,6 +771,10 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         else:
             return 0
 
+    def _M_vec(self, i, j):
+        D = self._wavenumbers_table
+        return np.where(i == j, - (self.n ** 2) * D.nx[i] ** 2 - D.ny[i] ** 2, 0.)
+
     def U(self, i, j):
         """Function to compute the inner products: :math:`U_{i,j} = (\phi_i, \phi_j)`."""
         if self.stored and self._U is not None:
@@ -601,6 +785,9 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
     def _U_comp(self, i, j):
         return _delta(i - j)
 
+    def _U_vec(self, i, j):
+        return _delta_vec(i - j)
+
     def N(self, i, j):
         """Function computing the beta term for the ocean: :math:`N_{i,j} = (\phi_i, \partial_x \phi_j)`."""
         if self.stored and self._N is not None:
@@ -621,6 +808,21 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
 
         return val
 
+    def _N_vec(self, i, j):
+        n = self.n
+        pi = np.pi
+
+        i, j = np.broadcast_arrays(i, j)
+        Di = self._wavenumbers_table[i]
+        Dj = self._wavenumbers_table[j]
+        val = _delta_vec(Di.P - Dj.P) * _flambda_vec(Di.H + Dj.H)
+
+        nz = val != 0
+        Hi, Hj = Di.H[nz], Dj.H[nz]
+        val[nz] *= (-2) * Hj * Hi * n / ((Hj ** 2 - Hi ** 2) * pi)
+
+        return val
+
     def O(self, i, j, k):
         """Function to compute the temperature advection term (passive scalar): :math:`O_{i,j,k} = (\phi_i, J(\phi_j, \phi_k))`"""
         if self.stored and self._O is not None:
@@ -657,6 +859,20 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
 
         return par * val * n / 2
 
+    def _O_vec(self, i, j, k):
+        n = self.n
+        D = self._wavenumbers_table
+
+        i, j, k = np.broadcast_arrays(i, j, k)
+        shape = i.shape
+        indices = np.stack((i.ravel(), j.ravel(), k.ravel()))
+        perm, par = _piksort_vec(indices)
+        a = np.take_along_axis(indices, perm, axis=0)
+
+        val = _jacobian_LLL(D[a[0]], D[a[1]], D[a[2]])
+
+        return (par * val * n / 2).reshape(shape)
+
     def C(self, i, j, k):
         """Function to compute the tensors holding the Jacobian inner products: :math:`C_{i,j,k} = (\phi_i, J(\phi_j,\\nabla^2 \phi_k))`."""
         if self.stored and self._C is not None:
@@ -667,6 +883,9 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
     def _C_comp(self, i, j, k):
         return self._M_comp(k, k) * self._O_comp(i, j, k)
 
+    def _C_vec(self, i, j, k):
+        return self._M_vec(k, k) * self._O_vec(i, j, k)
+
     def W(self, i, j):
         """Function to compute the short-wave radiative forcing of the ocean: :math:`W_{i,j} = (\phi_i, F_j)`."""
         if self.stored and self._W is not None:
@@ -680,6 +899,12 @@ class OceanicAnalyticInnerProducts(OceanicInnerProducts):
         else:
             return 0
 
+    def _W_vec(self, i, j):
+        if self.connected_to_atmosphere:
+            return self.atmosphere_inner_products._s_vec(j, i)
+        else:
+            return np.zeros(np.broadcast(i, j).shape)
+
 
 class GroundAnalyticInnerProducts(GroundInnerProducts):
     """Class which contains all the ground inner products coefficients needed for the tendencies
@@ -695,6 +920,10 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
         If `None`, an empty object is initialized.
     stored: bool, optional
         Indicate if the inner products must be computed and stored at the initialization. Default to `True`.
+    vectorized: bool, optional
+        Indicate if the stored inner products must be computed with the vectorized (NumPy broadcasting) versions
+        of the analytic formula. If `False`, they are computed element by element, which is slower but
+        kept as a reference. Default to `True`.
 
     Attributes
     ----------
@@ -706,12 +935,14 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
         Indicate if the ocean is connected to an atmosphere.
     stored: bool
         Indicate if the inner products are stored in the object.
+    vectorized: bool
+        Indicate if the stored inner products are computed with the vectorized analytic formula.
     ground_wavenumbers: ~numpy.ndarray(WaveNumber)
         An array of shape (:attr:`~.params.QgParams.nmod` [1], ) of the wavenumber object of each mode.
 
     """
 
-    def __init__(self, params=None, stored=True):
+    def __init__(self, params=None, stored=True, vectorized=True):
 
         GroundInnerProducts.__init__(self)
 
@@ -738,6 +969,7 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
         else:
             self.ground_wavenumbers = None
 
+        self.vectorized = vectorized
         self.stored = stored
 
         if stored:
@@ -745,6 +977,11 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
 
     def compute_inner_products(self):
         """Function computing and storing all the inner products at once."""
+        if self.vectorized:
+            i, j = np.indices((self.ngr, self.ngr))
+            self._U = _to_coo(self._U_vec(i, j))
+            return
+
         self._U = sp.zeros((self.ngr, self.ngr), dtype=float, format='dok')
 
         args_list = [(i, j) for i in range(self.ngr) for j in range(self.ngr)]
@@ -767,7 +1004,13 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
         self.atmosphere_inner_products = atmosphere_inner_products
         self.connected_to_atmosphere = True
 
-        if self.stored:
+        if self.stored and self.vectorized:
+            i, j = np.indices((self.ngr, atmosphere_inner_products.natm))
+            self._W = _to_coo(self._W_vec(i, j))
+
+            self.atmosphere_inner_products = None
+
+        elif self.stored:
             natm = atmosphere_inner_products.natm
             self._W = sp.zeros((self.ngr, natm), dtype=float, format='dok')
 
@@ -817,6 +1060,9 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
     def _U_comp(self, i, j):
         return _delta(i - j)
 
+    def _U_vec(self, i, j):
+        return _delta_vec(i - j)
+
     def N(self, i, j):
         """:math:`N_{i,j} = (\phi_i, \partial_x \phi_j)`
 
@@ -857,6 +1103,12 @@ class GroundAnalyticInnerProducts(GroundInnerProducts):
         else:
             return 0
 
+    def _W_vec(self, i, j):
+        if self.connected_to_atmosphere:
+            return self.atmosphere_inner_products._s_vec(j, i)
+        else:
+            return np.zeros(np.broadcast(i, j).shape)
+
 
 def _piksort(arr):
     k = len(arr)
@@ -878,6 +1130,43 @@ def _piksort(arr):
     return arro, par
 
 
+def _piksort_vec(arr):
+    # vectorized version of _piksort on arrays of shape (3, N): return the sorting permutation and its parity
+    perm = np.argsort(arr, axis=0, kind='stable')
+    inversions = (arr[0] > arr[1]).astype(int) + (arr[0] > arr[2]) + (arr[1] > arr[2])
+    return perm, 1 - 2 * (inversions % 2)
+
+
+def _wavenumbers_table(wavenumbers):
+    # record array of the wavenumbers attributes, for the vectorized inner products
+    types = {'A': 0, 'K': 1, 'L': 2}
+    return np.rec.fromarrays([np.array([types[w.type] for w in wavenumbers], dtype=int),
+                              np.array([w.P for w in wavenumbers], dtype=int),
+                              np.array([w.M for w in wavenumbers], dtype=int),
+                              np.array([w.H for w in wavenumbers], dtype=int),
+                              np.array([w.nx for w in wavenumbers], dtype=float),
+                              np.array([w.ny for w in wavenumbers], dtype=float)],
+                             names='type,P,M,H,nx,ny')
+
+
+def _to_coo(arr):
+    return sp.COO.from_numpy(np.asarray(arr, dtype=float))
+
+
+def _to_coo_by_rows(func, shape):
+    # build a 3D sparse tensor from a vectorized function computing its entries, one row at a time
+    j, k = np.indices(shape[1:])
+    coords = list()
+    data = list()
+    for i in range(shape[0]):
+        val = func(i, j, k)
+        nz = np.nonzero(val)
+        coords.append(np.stack((np.full(len(nz[0]), i), nz[0], nz[1])))
+        data.append(val[nz])
+    return sp.COO(np.concatenate(coords, axis=1), np.concatenate(data).astype(float), shape=shape,
+                  has_duplicates=False, sorted=True)
+
+
 #  !-----------------------------------------------------!
 #  !                                                     !
 #  ! Definition of the Helper functions from Cehelsky    !
@@ -902,6 +1191,10 @@ def _delta(r):
         return 0.
 
 
+def _delta_vec(r):
+    return np.where(r == 0, 1., 0.)
+
+
 def _flambda(r):
     if r % 2 == 0:
         return 0.
@@ -910,6 +1203,10 @@ def _flambda(r):
         return 1.
 
 
+def _flambda_vec(r):
+    return np.where(r % 2 == 0, 0., 1.)
+
+
 def _S1(Pj, Pk, Mj, Hk):
     return -(Pk * Mj + Pj * Hk) / 2.
 
@@ -926,6 +1223,24 @@ def _S4(Pj, Pk, Hj, Hk):
     return (Pk * Hj - Pj * Hk) / 2.
 
 
+def _jacobian_LLL(Ti, Tj, Tk):
+    # Jacobian inner product of three 'L' functions with sorted indices, as in _g_comp and _O_comp
+    vs3 = _S3(Tj.P, Tk.P, Tj.H, Tk.H)
+    vs4 = _S4(Tj.P, Tk.P, Tj.H, Tk.H)
+    return vs3 * ((_delta_vec(Tk.H - Tj.H - Ti.H)
+                   - _delta_vec(Tk.H - Tj.H + Ti.H))
+                  * _delta_vec(Tk.P + Tj.P - Ti.P)
+                  + _delta_vec(Tk.H + Tj.H - Ti.H)
+                  * (_delta_vec(Tk.P - Tj.P + Ti.P)
+                     - _delta_vec(Tk.P - Tj.P - Ti.P))) \
+        + vs4 * ((_delta_vec(Tk.H + Tj.H - Ti.H)
+                  * _delta_vec(Tk.P - Tj.P - Ti.P))
+                 + (_delta_vec(Tk.H - Tj.H + Ti.H)
+                    - _delta_vec(Tk.H - Tj.H - Ti.H))
+                 * (_delta_vec(Tk.P - Tj.P - Ti.P)
+                    - _delta_vec(Tk.P - Tj.P + Ti.P)))
+
+
 if __name__ == '__main__':
     from qgs.params.params import QgParams
 
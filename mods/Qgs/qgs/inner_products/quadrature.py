@@ -0,0 +1,217 @@
+"""
+    Quadrature inner products module
+    ================================
+
+    Batched numerical computation of the inner products of symbolic basis functions.
+
+    The basis functions (and their derivatives) are lambdified once and evaluated on a tensor grid of
+    Gauss-Legendre nodes covering the domain of the inner product. All the inner products between the functions
+    are then obtained as dense array contractions over the grid nodes, instead of one numerical integration per
+    inner product.
+
+    Notes
+    -----
+
+    The batched computation assumes that the inner product is the weighted integral of the product of the functions
+    over a rectangular domain, and that the Jacobian and the Laplacian are the ones of the
+    :class:`~.inner_products.definition.StandardSymbolicInnerProductDefinition`.
+
+    Description of the classes
+    --------------------------
+
+    * :class:`GaussLegendreQuadrature`
+
+"""
+
+import numpy as np
+from sympy import diff, lambdify, sympify, Integer
+
+
+class GaussLegendreQuadrature(object):
+    """Class to compute batches of inner products between symbolic functions with a Gauss-Legendre quadrature.
+
+    Parameters
+    ----------
+    inner_product_definition: SymbolicInnerProductDefinition
+        The definition of the inner product being used. Provides the weight of the integral and the domain.
+    subs: list(tuple)
+        List of 2-tuples containing the substitutions to be made in the functions and in the inner product
+        definition before the numerical evaluation.
+    num_points: int or tuple(int), optional
+        Number of Gauss-Legendre nodes in each direction of the domain. If an int is provided, use the same number of
+        nodes in both directions. Default to 100.
+    rtol: float, optional
+        The inner products smaller than `rtol` times the largest inner product of the same batch are considered
+        to be zero. Default to 1e-12.
+
+    Attributes
+    ----------
+    ip: SymbolicInnerProductDefinition
+        The definition of the inner product being used.
+    subs: list(tuple)
+        List of 2-tuples containing the substitutions to be made before the numerical evaluation.
+    points: tuple(~numpy.ndarray)
+        The :math:`x` and :math:`y` coordinates of the grid nodes, as two 1D arrays.
+    weights: ~numpy.ndarray
+        The quadrature weight of each grid node, including the weight of the inner product definition.
+    rtol: float
+        Relative threshold below which the inner products are considered to be zero.
+    """
+
+    def __init__(self, inner_product_definition, subs, num_points=100, rtol=1.e-12):
+
+        self.ip = inner_product_definition
+        self.subs = subs
+        self.rtol = rtol
+
+        weight, (x, x0, x1), (y, y0, y1) = self.ip.symbolic_inner_product(Integer(1), Integer(1), integrand=True)
+        self._x = x
+        self._y = y
+
+        if isinstance(num_points, int):
+            num_points = (num_points, num_points)
+
+        nodes = list()
+        weights = list()
+        for n, a, b in zip(num_points, (x0, y0), (x1, y1)):
+            a = float(sympify(a).subs(subs))
+            b = float(sympify(b).subs(subs))
+            t, w = np.polynomial.legendre.leggauss(n)
+            nodes.append((b - a) / 2 * t + (b + a) / 2)
+            weights.append((b - a) / 2 * w)
+
+        X, Y = np.meshgrid(*nodes, indexing='ij')
+        self.points = (X.ravel(), Y.ravel())
+        self.weights = np.outer(*weights).ravel() * self._evaluate(weight)
+
+        self._fields_cache = dict()
+
+    def _evaluate(self, expr):
+        expr = sympify(expr).subs(self.subs)
+        func = lambdify((self._x, self._y), expr, 'numpy')
+        val = np.asarray(func(*self.points), dtype=np.float64)
+        return np.broadcast_to(val, self.points[0].shape)
+
+    def _fields(self, functions, operator):
+        # values of the functions (transformed by an operator) on the grid, as an array of shape (n_functions, n_points)
+        key = (operator, tuple(functions))
+        if key not in self._fields_cache:
+            if operator == 'dx':
+                exprs = [diff(f, self._x) for f in functions]
+            elif operator == 'dy':
+                exprs = [diff(f, self._y) for f in functions]
+            elif operator == 'lap':
+                exprs = [self.ip.laplacian(f) for f in functions]
+            elif operator == 'lap_dx':
+                exprs = [diff(self.ip.laplacian(f), self._x) for f in functions]
+            elif operator == 'lap_dy':
+                exprs = [diff(self.ip.laplacian(f), self._y) for f in functions]
+            else:
+                exprs = functions
+            self._fields_cache[key] = np.array([self._evaluate(expr) for expr in exprs]).reshape(len(functions), -1)
+        return self._fields_cache[key]
+
+    def _clean(self, arr):
+        arr[np.abs(arr) <= self.rtol * np.max(np.abs(arr), initial=0.)] = 0.
+        return arr
+
+    def _product(self, S, G):
+        return self._clean((self._fields(S, 'id') * self.weights) @ G.T)
+
+    def _jacobian_product(self, S, Gx, Gy, Hx, Hy):
+        Sw = self._fields(S, 'id') * self.weights
+        res = np.zeros((Sw.shape[0], Gx.shape[0], Hx.shape[0]))
+        for i in range(Sw.shape[0]):
+            res[i] = (Gx * Sw[i]) @ Hy.T - (Gy * Sw[i]) @ Hx.T
+        return self._clean(res)
+
+    def inner_product(self, S, G):
+        """Compute the inner products :math:`(S_i, G_j)` between two lists of functions.
+
+        Parameters
+        ----------
+        S: list(Sympy expression)
+            Left-hand side functions of the product.
+        G: list(Sympy expression)
+            Right-hand side functions of the product.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            The inner products, as an array of shape (`len(S)`, `len(G)`).
+        """
+        return self._product(S, self._fields(G, 'id'))
+
+    def ip_lap(self, S, G):
+        """Compute the inner products :math:`(S_i, \\nabla^2 G_j)` between two lists of functions.
+
+        Parameters
+        ----------
+        S: list(Sympy expression)
+            Left-hand side functions of the product.
+        G: list(Sympy expression)
+            Right-hand side functions of the product.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            The inner products, as an array of shape (`len(S)`, `len(G)`).
+        """
+        return self._product(S, self._fields(G, 'lap'))
+
+    def ip_diff_x(self, S, G):
+        """Compute the inner products :math:`(S_i, \\partial_x G_j)` between two lists of functions.
+
+        Parameters
+        ----------
+        S: list(Sympy expression)
+            Left-hand side functions of the product.
+        G: list(Sympy expression)
+            Right-hand side functions of the product.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            The inner products, as an array of shape (`len(S)`, `len(G)`).
+        """
+        return self._product(S, self._fields(G, 'dx'))
+
+    def ip_jac(self, S, G, H):
+        """Compute the inner products :math:`(S_i, J(G_j, H_k))` between three lists of functions.
+
+        Parameters
+        ----------
+        S: list(Sympy expression)
+            Left-hand side functions of the product.
+        G: list(Sympy expression)
+            First argument of the Jacobian.
+        H: list(Sympy expression)
+            Second argument of the Jacobian.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            The inner products, as an array of shape (`len(S)`, `len(G)`, `len(H)`).
+        """
+        return self._jacobian_product(S, self._fields(G, 'dx'), self._fields(G, 'dy'),
+                                      self._fields(H, 'dx'), self._fields(H, 'dy'))
+
+    def ip_jac_lap(self, S, G, H):
+        """Compute the inner products :math:`(S_i, J(G_j, \\nabla^2 H_k))` between three lists of functions.
+
+        Parameters
+        ----------
+        S: list(Sympy expression)
+            Left-hand side functions of the product.
+        G: list(Sympy expression)
+            First argument of the Jacobian.
+        H: list(Sympy expression)
+            Functions whose Laplacian is the second argument of the Jacobian.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            The inner products, as an array of shape (`len(S)`, `len(G)`, `len(H)`).
+        """
+        return self._jacobian_product(S, self._fields(G, 'dx'), self._fields(G, 'dy'),
+                                      self._fields(H, 'lap_dx'), self._fields(H, 'lap_dy'))
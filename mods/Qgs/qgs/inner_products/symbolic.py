@@ -22,6 +22,7 @@
     .. _Sympy: https://www.sympy.org/
 """
 
+import numpy as np
 import sparse as sp
 from pebble import ProcessPool as Pool
 from concurrent.futures import TimeoutError
@@ -30,8 +31,10 @@ from multiprocessing import cpu_count
 from dapper.mods.Qgs.qgs.params.params import QgParams
 from dapper.mods.Qgs.qgs.inner_products.base import AtmosphericInnerProducts, OceanicInnerProducts, GroundInnerProducts
 from dapper.mods.Qgs.qgs.inner_products.definition import StandardSymbolicInnerProductDefinition
+from dapper.mods.Qgs.qgs.inner_products.quadrature import GaussLegendreQuadrature
 from sympy import lambdify
 from scipy.integrate import dblquad
+from functools import lru_cache
 
 # TODO: - Add warnings if trying to connect analytic and symbolic inner products together
 #       - Switch to numerical integration of the inner products if the symbolic one is to long (to be done when NumericBasis is ready)
@@ -69,6 +72,9 @@ class AtmosphericSymbolicInnerProducts(AtmosphericInnerProducts):
         The timeout for the computation of each inner product. After the timeout, compute the inner product with a quadrature instead of symbolic integration.
         If `None` or `False`, no timeout occurs.
         Default to `None`.
+    quadrature_points: int or tuple(int), optional
+        Number of Gauss-Legendre nodes in each direction of the domain used by the quadrature. See :class:`~.inner_products.quadrature.GaussLegendreQuadrature`.
+        Default to 100.
 
     Attributes
     ----------
@@ -89,10 +95,12 @@ class AtmosphericSymbolicInnerProducts(AtmosphericInnerProducts):
     subs: list(tuple)
         List of 2-tuples containing the substitutions to be made with the functions after the inner products
         symbolic computation.
+    quadrature_points: int or tuple(int)
+        Number of Gauss-Legendre nodes in each direction of the domain used by the quadrature.
     """
 
     def __init__(self, params=None, stored=True, inner_product_definition=None, interaction_inner_product_definition=None,
-                 num_threads=None, quadrature=True, timeout=None):
+                 num_threads=None, quadrature=True, timeout=None, quadrature_points=100):
 
         AtmosphericInnerProducts.__init__(self)
 
@@ -148,6 +156,7 @@ class AtmosphericSymbolicInnerProducts(AtmosphericInnerProducts):
         else:
             self.iip = interaction_inner_product_definition
 
+        self.quadrature_points = quadrature_points
         self.stored = stored
         if stored:
             self.compute_inner_products(num_threads, timeout)
@@ -208,13 +217,13 @@ class AtmosphericSymbolicInnerProducts(AtmosphericInnerProducts):
                 args_list = [[(i, j), self.iip.ip_lap, (self._F(i), self._phi(j))] for i in range(self.natm)
                              for j in range(noc)]
 
-                _parallel_compute(pool, args_list, subs, self._d, timeout)
+                _parallel_compute(pool, args_list, subs, self._d, timeout, self.quadrature_points)
 
                 # s inner products
                 args_list = [[(i, j), self.iip.symbolic_inner_product, (self._F(i), self._phi(j))] for i in range(self.natm)
                              for j in range(noc)]
 
-                _parallel_compute(pool, args_list, subs, self._s, timeout)
+                _parallel_compute(pool, args_list, subs, self._s, timeout, self.quadrature_points)
 
             self._s = self._s.to_coo()
             self._d = self._d.to_coo()
@@ -268,13 +277,13 @@ class AtmosphericSymbolicInnerProducts(AtmosphericInnerProducts):
                 args_list = [[(i, j), self.iip.symbolic_inner_product, (self._F(i), self._phi(j))] for i in range(self.natm)
                              for j in range(ngr)]
 
-                _parallel_compute(pool, args_list, subs, self._s, timeout)
+                _parallel_compute(pool, args_list, subs, self._s, timeout, self.quadrature_points)
 
                 # gh inner products
                 args_list = [[(i, j, k), self.iip.ip_jac, (self._F(i), self._F(j), self._phi(k))] for i in range(self.natm)
                              for j in range(self.natm) for k in range(ngr)]
 
-                _parallel_compute(pool, args_list, subs, self._gh, timeout)
+                _parallel_compute(pool, args_list, subs, self._gh, timeout, self.quadrature_points)
 
             self._s = self._s.to_coo()
             if self._gh is not None:
@@ -313,31 +322,31 @@ class AtmosphericSymbolicInnerProducts(AtmosphericInnerProducts):
                 args_list = [[(i, j), self.ip.ip_lap, (self._F(i), self._F(j))] for i in range(self.natm)
                              for j in range(self.natm)]
 
-                _parallel_compute(pool, args_list, subs, self._a, timeout)
+                _parallel_compute(pool, args_list, subs, self._a, timeout, self.quadrature_points)
 
                 # u inner products
                 args_list = [[(i, j), self.ip.symbolic_inner_product, (self._F(i), self._F(j))] for i in range(self.natm)
                              for j in range(self.natm)]
 
-                _parallel_compute(pool, args_list, subs, self._u, timeout)
+                _parallel_compute(pool, args_list, subs, self._u, timeout, self.quadrature_points)
 
                 # c inner products
                 args_list = [[(i, j), self.ip.ip_diff_x, (self._F(i), self._F(j))] for i in range(self.natm)
                              for j in range(self.natm)]
 
-                _parallel_compute(pool, args_list, subs, self._c, timeout)
+                _parallel_compute(pool, args_list, subs, self._c, timeout, self.quadrature_points)
 
                 # b inner products
                 args_list = [[(i, j, k), self.ip.ip_jac_lap, (self._F(i), self._F(j), self._F(k))] for i in range(self.natm)
                              for j in range(self.natm) for k in range(self.natm)]
 
-                _parallel_compute(pool, args_list, subs, self._b, timeout)
+                _parallel_compute(pool, args_list, subs, self._b, timeout, self.quadrature_points)
 
                 # g inner products
                 args_list = [[(i, j, k), self.ip.ip_jac, (self._F(i), self._F(j), self._F(k))] for i in range(self.natm)
                              for j in range(self.natm) for k in range(self.natm)]
 
-                _parallel_compute(pool, args_list, subs, self._g, timeout)
+                _parallel_compute(pool, args_list, subs, self._g, timeout, self.quadrature_points)
 
             self._a = self._a.to_coo()
             self._u = self._u.to_coo()
@@ -481,6 +490,9 @@ class OceanicSymbolicInnerProducts(OceanicInnerProducts):
         The timeout for the computation of each inner product. After the timeout, compute the inner product with a quadrature instead of symbolic integration.
         If `None` or `False`, no timeout occurs.
         Default to `None`.
+    quadrature_points: int or tuple(int), optional
+        Number of Gauss-Legendre nodes in each direction of the domain used by the quadrature. See :class:`~.inner_products.quadrature.GaussLegendreQuadrature`.
+        Default to 100.
 
     Attributes
     ----------
@@ -501,9 +513,11 @@ class OceanicSymbolicInnerProducts(OceanicInnerProducts):
     subs: list(tuple)
         List of 2-tuples containing the substitutions to be made with the functions after the inner products
         symbolic computation.
+    quadrature_points: int or tuple(int)
+        Number of Gauss-Legendre nodes in each direction of the domain used by the quadrature.
     """
     def __init__(self, params=None, stored=True, inner_product_definition=None, interaction_inner_product_definition=None,
-                 num_threads=None, quadrature=True, timeout=None):
+                 num_threads=None, quadrature=True, timeout=None, quadrature_points=100):
 
         OceanicInnerProducts.__init__(self)
 
@@ -540,6 +554,7 @@ class OceanicSymbolicInnerProducts(OceanicInnerProducts):
         else:
             self.iip = interaction_inner_product_definition
 
+        self.quadrature_points = quadrature_points
         self.stored = stored
         if stored:
             self.compute_inner_products(num_threads, timeout)
@@ -593,13 +608,13 @@ class OceanicSymbolicInnerProducts(OceanicInnerProducts):
                 args_list = [[(i, j), self.iip.ip_lap, (self._phi(i), self._F(j))] for i in range(self.noc)
                      for j in range(natm)]
 
-                _parallel_compute(pool, args_list, subs, self._K, timeout)
+                _parallel_compute(pool, args_list, subs, self._K, timeout, self.quadrature_points)
 
                 # W inner products
                 args_list = [[(i, j), self.iip.symbolic_inner_product, (self._phi(i), self._F(j))] for i in range(self.noc)
                      for j in range(natm)]
 
-                _parallel_compute(pool, args_list, subs, self._W, timeout)
+                _parallel_compute(pool, args_list, subs, self._W, timeout, self.quadrature_points)
 
             self._K = self._K.to_coo()
             self._W = self._W.to_coo()
@@ -636,29 +651,29 @@ class OceanicSymbolicInnerProducts(OceanicInnerProducts):
                 # N inner products
                 args_list = [[(i, j), self.ip.ip_diff_x, (self._phi(i), self._phi(j))] for i in range(self.noc) for j in range(self.noc)]
 
-                _parallel_compute(pool, args_list, subs, self._N, timeout)
+                _parallel_compute(pool, args_list, subs, self._N, timeout, self.quadrature_points)
 
                 # M inner products
                 args_list = [[(i, j), self.ip.ip_lap, (self._phi(i), self._phi(j))] for i in range(self.noc) for j in range(self.noc)]
 
-                _parallel_compute(pool, args_list, subs, self._M, timeout)
+                _parallel_compute(pool, args_list, subs, self._M, timeout, self.quadrature_points)
 
                 # U inner products
                 args_list = [[(i, j), self.ip.symbolic_inner_product, (self._phi(i), self._phi(j))] for i in range(self.noc) for j in range(self.noc)]
 
-                _parallel_compute(pool, args_list, subs, self._U, timeout)
+                _parallel_compute(pool, args_list, subs, self._U, timeout, self.quadrature_points)
 
                 # O inner products
                 args_list = [[(i, j, k), self.ip.ip_jac, (self._phi(i), self._phi(j), self._phi(k))] for i in range(self.noc)
                              for j in range(self.noc) for k in range(self.noc)]
 
-                _parallel_compute(pool, args_list, subs, self._O, timeout)
+                _parallel_compute(pool, args_list, subs, self._O, timeout, self.quadrature_points)
 
                 # C inner products
                 args_list = [[(i, j, k), self.ip.ip_jac_lap, (self._phi(i), self._phi(j), self._phi(k))] for i in range(self.noc)
                              for j in range(self.noc) for k in range(self.noc)]
 
-                _parallel_compute(pool, args_list, subs, self._C, timeout)
+                _parallel_compute(pool, args_list, subs, self._C, timeout, self.quadrature_points)
 
             self._M = self._M.to_coo()
             self._U = self._U.to_coo()
@@ -769,6 +784,9 @@ class GroundSymbolicInnerProducts(GroundInnerProducts):
         The timeout for the computation of each inner product. After the timeout, compute the inner product with a quadrature instead of symbolic integration.
         If `None` or `False`, no timeout occurs.
         Default to `None`.
+    quadrature_points: int or tuple(int), optional
+        Number of Gauss-Legendre nodes in each direction of the domain used by the quadrature. See :class:`~.inner_products.quadrature.GaussLegendreQuadrature`.
+        Default to 100.
 
     Attributes
     ----------
@@ -789,9 +807,11 @@ class GroundSymbolicInnerProducts(GroundInnerProducts):
     subs: list(tuple)
         List of 2-tuples containing the substitutions to be made with the functions after the inner products
         symbolic computation.
+    quadrature_points: int or tuple(int)
+        Number of Gauss-Legendre nodes in each direction of the domain used by the quadrature.
     """
     def __init__(self, params=None, stored=True, inner_product_definition=None, interaction_inner_product_definition=None,
-                 num_threads=None, quadrature=True, timeout=None):
+                 num_threads=None, quadrature=True, timeout=None, quadrature_points=100):
 
         GroundInnerProducts.__init__(self)
 
@@ -827,6 +847,7 @@ class GroundSymbolicInnerProducts(GroundInnerProducts):
             self.iip = self.ip
         else:
             self.iip = interaction_inner_product_definition
+        self.quadrature_points = quadrature_points
         self.stored = stored
 
         if stored:
@@ -878,7 +899,7 @@ class GroundSymbolicInnerProducts(GroundInnerProducts):
                 # W inner products
                 args_list = [[(i, j), self.iip.symbolic_inner_product, (self._phi(i), self._F(j))] for i in range(self.ngr)
                              for j in range(natm)]
-                _parallel_compute(pool, args_list, subs, self._W, timeout)
+                _parallel_compute(pool, args_list, subs, self._W, timeout, self.quadrature_points)
 
             self._W = self._W.to_coo()
 
@@ -908,7 +929,7 @@ class GroundSymbolicInnerProducts(GroundInnerProducts):
 
                 # U inner products
                 args_list = [[(i, j), self.ip.symbolic_inner_product, (self._phi(i), self._phi(j))] for i in range(self.ngr) for j in range(self.ngr)]
-                _parallel_compute(pool, args_list, subs, self._U, timeout)
+                _parallel_compute(pool, args_list, subs, self._U, timeout, self.quadrature_points)
 
             self._U = self._U.to_coo()
 
@@ -1028,11 +1049,50 @@ def _num_apply(ls):
         return ls[0], res[0]
 
 
-def _parallel_compute(pool, args_list, subs, destination, timeout):
+@lru_cache(maxsize=8)
+def _quadrature_engine(inner_product_definition, subs, quadrature_points):
+    return GaussLegendreQuadrature(inner_product_definition, list(subs), quadrature_points)
+
+
+def _num_compute(args_list, subs, quadrature_points):
+    # batched quadrature of all the inner products of args_list, as a dense array
+    # returns None if the inner product definition is not supported by the batched quadrature
+    func = args_list[0][1]
+    ip = getattr(func, '__self__', None)
+    if not isinstance(ip, StandardSymbolicInnerProductDefinition):
+        return None
+
+    # list of the functions at each position of the inner products
+    functions = [dict() for _ in args_list[0][0]]
+    for args in args_list:
+        for pos, f in enumerate(args[2]):
+            functions[pos][args[0][pos]] = f
+    functions = [[f[i] for i in range(len(f))] for f in functions]
+
+    if isinstance(quadrature_points, list):
+        quadrature_points = tuple(quadrature_points)
+    engine = _quadrature_engine(ip, tuple(subs), quadrature_points)
+    if func.__name__ == 'symbolic_inner_product':
+        return engine.inner_product(*functions)
+    else:
+        return getattr(engine, func.__name__)(*functions)
+
+
+def _parallel_compute(pool, args_list, subs, destination, timeout, quadrature_points=100):
+
+    if not args_list:
+        return
 
     if timeout is False:
         timeout = None
 
+    if timeout is True:
+        values = _num_compute(args_list, subs, quadrature_points)
+        if values is not None:
+            for idx in zip(*np.nonzero(values)):
+                destination[idx] = values[idx]
+            return
+
     if timeout is not True:
         future = pool.map(_apply, args_list, timeout=timeout)
         results = future.result()
@@ -1050,6 +1110,15 @@ def _parallel_compute(pool, args_list, subs, destination, timeout):
     else:
         num_args_list = [args + [subs] for args in args_list]
 
+    if not num_args_list:
+        return
+
+    values = _num_compute(args_list, subs, quadrature_points)
+    if values is not None:
+        for args in num_args_list:
+            destination[args[0]] = values[args[0]]
+        return
+
     future = pool.map(_num_apply, num_args_list)
     results = future.result()
     while True:
@@ -0,0 +1,267 @@
+"""
+    Checkpoint module
+    =================
+
+    Module to persist and restore the state of long time integrations, and to cache the states
+    obtained after the transient time needed to reach the attractor of a model (spin-up).
+
+    A checkpoint stores the time and the state(s) reached by an integration, such that an interrupted
+    integration can be restarted from there. The spin-up cache stores the post-transient states keyed by
+    the model configuration, the timestep, the transient time, the random seed and the integration scheme
+    (see :func:`spin_up_key`), such that the same attractor point is never computed twice.
+
+    Description of the module classes and functions
+    -----------------------------------------------
+
+    * :func:`save_checkpoint`
+    * :func:`load_checkpoint`
+    * :func:`spin_up_key`
+    * :class:`SpinUpCache`
+    * :func:`spin_up`
+
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from dapper.dpr_config import rc
+from dapper.mods.Qgs.qgs.tensors.cache import configuration_key
+
+
+def _save_atomic(filename, **arrays):
+    # write then rename, such that an interrupted run never leaves a partial file
+    filename = Path(filename)
+    directory = filename.parent
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".npz", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, filename)
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def save_checkpoint(filename, t, x):
+    """Save a checkpoint of an integration.
+
+    Parameters
+    ----------
+    filename: str or ~pathlib.Path
+        The checkpoint file. Overwritten if it exists.
+    t: float
+        The time reached by the integration.
+    x: ~numpy.ndarray
+        The state(s) reached by the integration.
+    """
+    _save_atomic(filename, t=np.array(t), x=np.asarray(x))
+
+
+def load_checkpoint(filename):
+    """Load a checkpoint of an integration.
+
+    Parameters
+    ----------
+    filename: str or ~pathlib.Path
+        The checkpoint file.
+
+    Returns
+    -------
+    t, x: float, ~numpy.ndarray
+        The time and the state(s) reached by the integration.
+    """
+    with np.load(filename) as data:
+        return float(data['t']), data['x']
+
+
+def spin_up_key(params, dt, transient_time, seed=None, b=None, c=None, a=None):
+    """Compute the key identifying a post-transient state in the spin-up cache.
+
+    Parameters
+    ----------
+    params: QgParams
+        The parameters fully specifying the model configuration.
+    dt: float
+        Timestep of the transient integration.
+    transient_time: float
+        Transient time needed to converge to the attractor.
+    seed: None or int, optional
+        The random seed used to draw the initial condition, if any. Default to `None`.
+    b: None or ~numpy.ndarray, optional
+        Vector of coefficients :math:`b_i` of the Runge-Kutta method used. Default to `None`.
+    c: None or ~numpy.ndarray, optional
+        Matrix of coefficients :math:`c_{i,j}` of the Runge-Kutta method used. Default to `None`.
+    a: None or ~numpy.ndarray, optional
+        Vector of coefficients :math:`a_i` of the Runge-Kutta method used. Default to `None`.
+
+    Returns
+    -------
+    str
+        The hexadecimal key.
+    """
+    s = "qgs spin-up\n" + configuration_key(params) + "\n"
+    s += repr((float(dt), float(transient_time), seed)) + "\n"
+    for coeffs in [b, c, a]:
+        if coeffs is not None:
+            s += str(np.asarray(coeffs).tolist()) + "\n"
+        else:
+            s += "None\n"
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
+class SpinUpCache(object):
+    """Persistent on-disk cache of the post-transient states of the models.
+
+    Parameters
+    ----------
+    directory: None or str or ~pathlib.Path, optional
+        The folder where to store the states. If `None`, use the `qgs_spinup` subfolder of the DAPPER data folder.
+        Default to `None`.
+
+    Attributes
+    ----------
+    directory: ~pathlib.Path
+        The folder where the states are stored.
+    """
+
+    def __init__(self, directory=None):
+
+        if directory is None:
+            directory = rc.dirs.data / "qgs_spinup"
+        self.directory = Path(directory)
+
+    def filename(self, key):
+        """Return the file where the state with key `key` is stored."""
+        return self.directory / (key + ".npz")
+
+    def checkpoint(self, key):
+        """Return the checkpoint file of the spin-up of the state with key `key`."""
+        return self.directory / (key + "_checkpoint.npz")
+
+    def load(self, key):
+        """Load a post-transient state, if it is available in the cache.
+
+        Parameters
+        ----------
+        key: str
+            The key of the state, see :func:`spin_up_key`.
+
+        Returns
+        -------
+        None or ~numpy.ndarray
+            The state. `None` if not in the cache.
+        """
+        try:
+            return load_checkpoint(self.filename(key))[1]
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, key, x, t=0.):
+        """Store a post-transient state in the cache.
+
+        Parameters
+        ----------
+        key: str
+            The key of the state, see :func:`spin_up_key`.
+        x: ~numpy.ndarray
+            The state to store.
+        t: float, optional
+            The transient time after which the state was obtained. Default to 0.
+        """
+        try:
+            save_checkpoint(self.filename(key), t, x)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Remove all the states from the cache."""
+        for f in self.directory.glob("*.npz"):
+            try:
+                f.unlink()
+            except OSError:
+                pass
+
+
+def spin_up(model, transient_time, dt, ic, segment_time=None, checkpoint=None, cache=None, key=None):
+    """Integrate a model over a transient time to obtain a state on its attractor.
+
+    The integration is performed by segments, after each of which a checkpoint can be saved. If the checkpoint
+    file already exists, the integration restarts from it. The final state can also be stored in a spin-up cache,
+    and is then directly returned by the subsequent calls with the same key. In that case, the checkpoint file
+    is removed once the state is cached.
+
+    Parameters
+    ----------
+    model: RungeKuttaIntegrator or callable
+        The integrator to use, or a DAPPER model function with the signature ``model(x, t, dt)`` returning the
+        state(s) `x` advanced from `t` to `t + dt`.
+    transient_time: float
+        Transient time needed to converge to the attractor.
+    dt: float
+        Timestep of the integration. Only used if `model` is an integrator.
+    ic: ~numpy.ndarray
+        Initial condition(s) of the transient integration.
+    segment_time: None or float, optional
+        Time integrated between two checkpoints. If `None`, use 10000 timesteps `dt`. Default to `None`.
+    checkpoint: None or bool or str or ~pathlib.Path, optional
+        The checkpoint file. If `True`, use the checkpoint file of the spin-up cache for `key`
+        (see :meth:`SpinUpCache.checkpoint`), or of the default cache if no cache is used.
+        If `None` or `False`, no checkpoint is saved. Default to `None`.
+    cache: None or bool or SpinUpCache, optional
+        The spin-up cache to use. If `True`, use the default :class:`SpinUpCache`. If `None` or `False`,
+        do not use a cache. Default to `None`.
+    key: None or str, optional
+        The key of the post-transient state in the cache, see :func:`spin_up_key`. Required if a cache is used.
+
+    Returns
+    -------
+    ~numpy.ndarray
+        The state(s) obtained after the transient time.
+    """
+
+    if cache is True:
+        cache = SpinUpCache()
+
+    if checkpoint is True:
+        if key is None:
+            raise ValueError("The key of the state is required to use the checkpoint file of the spin-up cache.")
+        checkpoint = (cache or SpinUpCache()).checkpoint(key)
+    elif checkpoint is False:
+        checkpoint = None
+
+    if cache and key is not None:
+        x = cache.load(key)
+        if x is not None:
+            return x
+
+    if segment_time is None:
+        segment_time = 10000 * dt
+
+    total_time = 0.
+    y = np.asarray(ic)
+    if checkpoint is not None and os.path.exists(checkpoint):
+        total_time, y = load_checkpoint(checkpoint)
+
+    while total_time < transient_time:
+        if hasattr(model, 'integrate'):
+            model.integrate(0., segment_time, dt, ic=y, write_steps=0)
+            t, y = model.get_trajectories()
+        else:
+            y = model(y, total_time, segment_time)
+            t = segment_time
+        total_time += t
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, total_time, y)
+
+    if cache and key is not None:
+        cache.save(key, y, total_time)
+        # the cached state supersedes the checkpoint
+        if checkpoint is not None and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+
+    return y
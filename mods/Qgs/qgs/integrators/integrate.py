@@ -11,10 +11,16 @@
     Description of the module functions
     -----------------------------------
 
-    Two main functions:
+    Three main functions:
 
     * :obj:`integrate_runge_kutta`
     * :obj:`integrate_runge_kutta_tgls`
+    * :obj:`integrate_runge_kutta_tgls_batch`
+    * :obj:`integrate_runge_kutta_members`
+    * :obj:`integrate_dormand_prince`
+    * :obj:`integrate_etdrk4`
+
+    and the function :obj:`warm_up` precompiling the integration kernels cached on disk.
 
 """
 
@@ -23,7 +29,29 @@
 
 from numba import njit
 import numpy as np
+from scipy.linalg import expm
 from dapper.mods.Qgs.qgs.functions.util import reverse
+from dapper.mods.Qgs.qgs.functions.sparse_mul import sparse_mul3_ens_csr
+
+# Dormand-Prince 5(4) embedded pair coefficients, with the last stage evaluated at the new state (FSAL)
+_dp_c = np.array([0., 1./5, 3./10, 4./5, 8./9, 1., 1.])
+_dp_a = np.array([[0., 0., 0., 0., 0., 0.],
+                  [1./5, 0., 0., 0., 0., 0.],
+                  [3./40, 9./40, 0., 0., 0., 0.],
+                  [44./45, -56./15, 32./9, 0., 0., 0.],
+                  [19372./6561, -25360./2187, 64448./6561, -212./729, 0., 0.],
+                  [9017./3168, -355./33, 46732./5247, 49./176, -5103./18656, 0.]])
+_dp_b = np.array([35./384, 0., 500./1113, 125./192, -2187./6784, 11./84])
+# difference between the 5th and 4th order solutions weights
+_dp_e = np.array([-71./57600, 0., 71./16695, -71./1920, 17253./339200, -22./525, 1./40])
+# coefficients of the 4th order dense output polynomials (Hairer et al.)
+_dp_p = np.array([[1., -8048581381./2820520608, 8663915743./2820520608, -12715105075./11282082432],
+                  [0., 0., 0., 0.],
+                  [0., 131558114200./32700410799, -68118460800./10900136933, 87487479700./32700410799],
+                  [0., -1754552775./470086768, 14199869525./1410260304, -10690763975./1880347072],
+                  [0., 127303824393./49829197408, -318862633887./49829197408, 701980252875./199316789632],
+                  [0., -282668133./205662961, 2019193451./616988883, -1453857185./822651844],
+                  [0., 40617522./29380423, -110615467./29380423, 69997945./29380423]])
 
 
 def integrate_runge_kutta(f, t0, t, dt, ic=None, forward=True, write_steps=1, b=None, c=None, a=None):
@@ -44,6 +72,9 @@ def integrate_runge_kutta(f, t0, t, dt, ic=None, forward=True, write_steps=1, b=
     f: callable
         The `Numba`_-jitted function :math:`\\boldsymbol{f}`.
         Should have the signature``f(t, x)`` where ``x`` is the state value and ``t`` is the time.
+        If `f` has a `tensor_csr` attribute, like the tendencies returned by
+        :func:`~.functions.tendencies.create_tendencies`, the integration is performed by a kernel computing the
+        tendencies directly from this tensor, which is compiled once and cached on disk.
     t0: float
         Initial time of the time integration. Corresponds to the initial condition.
         Important if the ODEs are non-autonomous.
@@ -142,45 +173,572 @@ def integrate_runge_kutta(f, t0, t, dt, ic=None, forward=True, write_steps=1, b=
         i = len(f(0., ic))
         ic = np.zeros(i)
 
-    if len(ic.shape) == 1:
-        ic = ic.reshape((1, -1))
+    if len(ic.shape) == 1:
+        ic = ic.reshape((1, -1))
+
+    # Default is RK4
+    if a is None and b is None and c is None:
+        c = np.array([0., 0.5, 0.5, 1.])
+        b = np.array([1./6, 1./3, 1./3, 1./6])
+        a = np.zeros((len(c), len(b)))
+        a[1, 0] = 0.5
+        a[2, 1] = 0.5
+        a[3, 2] = 1.
+
+    if forward:
+        time_direction = 1
+    else:
+        time_direction = -1
+
+    time = np.concatenate((np.arange(t0, t, dt), np.full((1,), t)))
+
+    tensor_csr = getattr(f, 'tensor_csr', None)
+    if tensor_csr is not None:
+        recorded_traj = _integrate_runge_kutta_csr_jit(*tensor_csr, time, ic, time_direction, write_steps, b, c, a)
+    else:
+        recorded_traj = _integrate_runge_kutta_jit(f, time, ic, time_direction, write_steps, b, c, a)
+
+    if write_steps > 0:
+        if forward:
+            if time[::write_steps][-1] == time[-1]:
+                return time[::write_steps], np.squeeze(recorded_traj)
+            else:
+                return np.concatenate((time[::write_steps], np.full((1,), t))), np.squeeze(recorded_traj)
+        else:
+            rtime = reverse(time[::-write_steps])
+            if rtime[0] == time[0]:
+                return rtime, np.squeeze(recorded_traj)
+            else:
+                return np.concatenate((np.full((1,), t0), rtime)), np.squeeze(recorded_traj)
+    else:
+        return time[-1], np.squeeze(recorded_traj)
+
+
+def integrate_runge_kutta_members(f_ens, t0, t, dt, ic, values, forward=True, write_steps=1, b=None, c=None, a=None):
+    """Integrate the ordinary differential equations (ODEs)
+
+    .. math:: \\dot{\\boldsymbol{x}}_n = \\boldsymbol{f}(t, \\boldsymbol{x}_n, \\boldsymbol{v}_n)
+
+    of an ensemble of trajectories, each member :math:`n` having its own model :math:`\\boldsymbol{v}_n`
+    (e.g. its own parameters), with a specified `Runge-Kutta method`_.
+
+    All the trajectories are advanced together, each stage evaluating the ensemble tendencies
+    ``f_ens(t, X, V)`` once for all the members.
+
+    .. _Runge-Kutta method: https://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+    .. _Numba: https://numba.pydata.org/
+
+    Parameters
+    ----------
+    f_ens: callable
+        The `Numba`_-jitted ensemble version of the function :math:`\\boldsymbol{f}`, for instance the function `f_ens`
+        returned by :func:`~.functions.tendencies.create_parametric_tendencies`.
+        Should have the signature ``f_ens(t, X, V)`` where ``X`` is an array of shape (`n_traj`, `n_dim`) and ``V``
+        the array `values`.
+    t0: float
+        Initial time of the time integration. Corresponds to the initial conditions.
+    t: float
+        Final time of the time integration. Corresponds to the final conditions.
+    dt: float
+        Timestep of the integration.
+    ic: ~numpy.ndarray(float)
+        Initial (or final) conditions of the ODEs. A 2D array of shape (`n_traj`, `n_dim`).
+        If the `forward` argument is `False`, it specifies final conditions.
+    values: ~numpy.ndarray(float)
+        The models of the members, passed to `f_ens`. A 2D array with one row per member, for instance the values of
+        the tensor of each member returned by the function `tensor_values` of
+        :func:`~.functions.tendencies.create_parametric_tendencies`.
+    forward: bool, optional
+        Whether to integrate the ODEs forward or backward in time. Default to forward integration.
+    write_steps: int, optional
+        Save the state of the integration in memory every `write_steps` steps. The other intermediary
+        steps are lost. It determines the size of the returned objects. Default is 1.
+        Set to 0 to return only the final state.
+    b: None or ~numpy.ndarray, optional
+        Vector of coefficients :math:`b_i` of the `Runge-Kutta method`_ .
+        If `None`, use the classic RK4 method coefficients. Default to `None`.
+    c: None or ~numpy.ndarray, optional
+        Matrix of coefficients :math:`c_{i,j}` of the `Runge-Kutta method`_ .
+        If `None`, use the classic RK4 method coefficients. Default to `None`.
+    a: None or ~numpy.ndarray, optional
+        Vector of coefficients :math:`a_i` of the `Runge-Kutta method`_ .
+        If `None`, use the classic RK4 method coefficients. Default to `None`.
+
+    Returns
+    -------
+    time, traj: ~numpy.ndarray
+        The result of the integration:
+
+        * **time:** Time at which the state of the system was saved. Array of shape (`n_step`,).
+        * **traj:** Saved dynamical system states. 3D array of shape (`n_traj`, `n_dim`, `n_steps`).
+    """
+
+    # Default is RK4
+    if a is None and b is None and c is None:
+        c = np.array([0., 0.5, 0.5, 1.])
+        b = np.array([1./6, 1./3, 1./3, 1./6])
+        a = np.zeros((len(c), len(b)))
+        a[1, 0] = 0.5
+        a[2, 1] = 0.5
+        a[3, 2] = 1.
+
+    if forward:
+        time_direction = 1
+    else:
+        time_direction = -1
+
+    time = np.concatenate((np.arange(t0, t, dt), np.full((1,), t)))
+
+    recorded_traj = _integrate_runge_kutta_ens_members_jit(f_ens, time, np.ascontiguousarray(ic, dtype=np.float64),
+                                                           values, time_direction, write_steps, b, c, a)
+
+    if write_steps > 0:
+        if forward:
+            if time[::write_steps][-1] == time[-1]:
+                return time[::write_steps], recorded_traj
+            else:
+                return np.concatenate((time[::write_steps], np.full((1,), t))), recorded_traj
+        else:
+            rtime = reverse(time[::-write_steps])
+            if rtime[0] == time[0]:
+                return rtime, recorded_traj
+            else:
+                return np.concatenate((np.full((1,), t0), rtime)), recorded_traj
+    else:
+        return time[-1], recorded_traj[:, :, 0]
+
+
+def integrate_dormand_prince(f, t0, t, dt, ic=None, forward=True, write_steps=1, rtol=1.e-6, atol=1.e-8, max_dt=None):
+    """
+    Integrate the ordinary differential equations (ODEs)
+
+    .. math:: \\dot{\\boldsymbol{x}} = \\boldsymbol{f}(t, \\boldsymbol{x})
+
+    with the adaptive timestep `Dormand-Prince method`_, an embedded Runge-Kutta pair of order 5(4).
+    The timestep is adapted to keep the local error estimate below the tolerances, and the states at the
+    output times are obtained with the 4th order dense output of the method. The function :math:`\\boldsymbol{f}`
+    should be a `Numba`_ jitted function. This function must have a signature ``f(t, x)`` where ``x`` is
+    the state value and ``t`` is the time.
+
+    .. _Dormand-Prince method: https://en.wikipedia.org/wiki/Dormand%E2%80%93Prince_method
+    .. _Numba: https://numba.pydata.org/
+
+    Parameters
+    ----------
+    f: callable
+        The `Numba`_-jitted function :math:`\\boldsymbol{f}`.
+        Should have the signature``f(t, x)`` where ``x`` is the state value and ``t`` is the time.
+    t0: float
+        Initial time of the time integration. Corresponds to the initial condition.
+        Important if the ODEs are non-autonomous.
+    t: float
+        Final time of the time integration. Corresponds to the final condition.
+        Important if the ODEs are non-autonomous.
+    dt: float
+        Output timestep. The states are available at the times `t0 + n dt`, like for the fixed timestep
+        integration of :func:`integrate_runge_kutta`. Also used as the first trial timestep.
+    ic: None or ~numpy.ndarray(float), optional
+        Initial (or final) conditions of the system. Can be a 1D or a 2D array:
+
+        * 1D: Provide a single initial condition.
+          Should be of shape (`n_dim`,) where `n_dim` = :math:`\\mathrm{dim}(\\boldsymbol{x})`.
+        * 2D: Provide an ensemble of initial condition.
+          Should be of shape (`n_traj`, `n_dim`) where `n_dim` = :math:`\\mathrm{dim}(\\boldsymbol{x})`,
+          and where `n_traj` is the number of initial conditions.
+
+        If `None`, use a zero initial condition. Default to `None`.
+        If the `forward` argument is `False`, it specifies final conditions.
+    forward: bool, optional
+        Whether to integrate the ODEs forward or backward in time. In case of backward integration, the
+        initial condition `ic` becomes a final condition. Default to forward integration.
+    write_steps: int, optional
+        Save the state of the integration in memory every `write_steps` output timesteps `dt`.
+        It determines the size of the returned objects. Default is 1.
+        Set to 0 to return only the final state.
+    rtol: float, optional
+        Relative tolerance of the local error. Default to 1e-6.
+    atol: float, optional
+        Absolute tolerance of the local error. Default to 1e-8.
+    max_dt: None or float, optional
+        Maximum timestep allowed. If `None`, the timestep is not bounded. Default to `None`.
+
+    Returns
+    -------
+    time, traj: ~numpy.ndarray
+        The result of the integration:
+
+        * **time:** Time at which the state of the system was saved. Array of shape (`n_step`,) where
+          `n_step` is the number of saved states of the integration.
+        * **traj:** Saved dynamical system states. 3D array of shape (`n_traj`, `n_dim`, `n_steps`). If `n_traj` = 1,
+          a 2D array of shape (`n_dim`, `n_steps`) is returned instead.
+    """
+
+    if ic is None:
+        i = 1
+        while True:
+            ic = np.zeros(i)
+            try:
+                x = f(0., ic)
+            except:
+                i += 1
+            else:
+                break
+
+        i = len(f(0., ic))
+        ic = np.zeros(i)
+
+    if len(ic.shape) == 1:
+        ic = ic.reshape((1, -1))
+
+    if max_dt is None:
+        max_dt = np.inf
+
+    if forward:
+        time_direction = 1
+    else:
+        time_direction = -1
+
+    time = np.concatenate((np.arange(t0, t, dt), np.full((1,), t)))
+
+    recorded_traj = _integrate_dormand_prince_jit(f, time, ic, time_direction, write_steps, rtol, atol, max_dt)
+
+    if write_steps > 0:
+        if forward:
+            if time[::write_steps][-1] == time[-1]:
+                return time[::write_steps], np.squeeze(recorded_traj)
+            else:
+                return np.concatenate((time[::write_steps], np.full((1,), t))), np.squeeze(recorded_traj)
+        else:
+            rtime = reverse(time[::-write_steps])
+            if rtime[0] == time[0]:
+                return rtime, np.squeeze(recorded_traj)
+            else:
+                return np.concatenate((np.full((1,), t0), rtime)), np.squeeze(recorded_traj)
+    else:
+        return time[-1], np.squeeze(recorded_traj)
+
+
+def etdrk4_coefficients(L, dt):
+    """Compute the coefficients of the exponential time differencing Runge-Kutta 4 (ETDRK4) scheme of
+    Cox and Matthews for a linear operator :math:`\\boldsymbol{\\mathrm{L}}` and a timestep :math:`h`.
+
+    The :math:`\\varphi`-functions of the matrix :math:`h \\boldsymbol{\\mathrm{L}}` are obtained exactly from the
+    exponential of an augmented matrix, such that the linear part does not need to be diagonal nor
+    diagonalizable (as opposed to the contour integrals used for the diagonal operator of the
+    Kuramoto-Sivashinsky model).
+
+    Parameters
+    ----------
+    L: ~numpy.ndarray
+        The linear operator, as a 2D array of shape (`n_dim`, `n_dim`).
+    dt: float
+        Timestep :math:`h` of the integration.
+
+    Returns
+    -------
+    ~numpy.ndarray
+        The coefficients, as a 3D array of shape (6, `n_dim`, `n_dim`) containing, in this order,
+        :math:`e^{h L}`, :math:`e^{h L/2}`, :math:`\\frac{h}{2} \\varphi_1(h L/2)`,
+        :math:`h (\\varphi_1 - 3 \\varphi_2 + 4 \\varphi_3)(h L)`, :math:`h (\\varphi_2 - 2 \\varphi_3)(h L)` and
+        :math:`h (4 \\varphi_3 - \\varphi_2)(h L)`. They are transposed, i.e. to be applied on the right of the states.
+    """
+    L = np.asarray(L, dtype=np.float64)
+    n = L.shape[0]
+    eye = np.eye(n)
+
+    # the first block row of the exponential is (e^A, phi_1(A), phi_2(A), phi_3(A))
+    aug = np.zeros((4 * n, 4 * n))
+    aug[:n, :n] = dt * L
+    for i in range(3):
+        aug[i * n:(i + 1) * n, (i + 1) * n:(i + 2) * n] = eye
+    ex = expm(aug)[:n]
+    e, phi1, phi2, phi3 = ex[:, :n], ex[:, n:2 * n], ex[:, 2 * n:3 * n], ex[:, 3 * n:]
+
+    aug = np.zeros((2 * n, 2 * n))
+    aug[:n, :n] = dt * L / 2
+    aug[:n, n:] = eye
+    ex = expm(aug)[:n]
+    e2, phi1_2 = ex[:, :n], ex[:, n:]
+
+    coeffs = np.array([e, e2, dt / 2 * phi1_2, dt * (phi1 - 3 * phi2 + 4 * phi3), dt * (phi2 - 2 * phi3),
+                       dt * (4 * phi3 - phi2)])
+    return np.ascontiguousarray(coeffs.transpose((0, 2, 1)))
+
+
+def integrate_etdrk4(f_nl, L, t0, t, dt, ic=None, write_steps=1, f_nl_ens=None):
+    """
+    Integrate the ordinary differential equations (ODEs)
+
+    .. math:: \\dot{\\boldsymbol{x}} = \\boldsymbol{\\mathrm{L}} \\cdot \\boldsymbol{x} + \\boldsymbol{n}(t, \\boldsymbol{x})
+
+    with the `exponential time differencing`_ Runge-Kutta 4 (ETDRK4) method of Cox and Matthews.
+    The linear part :math:`\\boldsymbol{\\mathrm{L}}` is integrated exactly, which allows for timesteps larger than
+    the ones permitted by its fastest modes with the explicit Runge-Kutta methods. The function :math:`\\boldsymbol{n}`
+    should be a `Numba`_ jitted function, for instance the nonlinear part of the tendencies returned by
+    :func:`~.functions.tendencies.create_tendencies` with `return_linear_part` set to `True`.
+    Only forward integrations are possible.
+
+    .. _exponential time differencing: https://doi.org/10.1006/jcph.2002.6995
+    .. _Numba: https://numba.pydata.org/
+
+    Parameters
+    ----------
+    f_nl: callable
+        The `Numba`_-jitted function :math:`\\boldsymbol{n}`.
+        Should have the signature``f_nl(t, x)`` where ``x`` is the state value and ``t`` is the time.
+    L: ~numpy.ndarray
+        The linear operator, as a 2D array of shape (`n_dim`, `n_dim`).
+    t0: float
+        Initial time of the time integration. Corresponds to the initial condition.
+        Important if the ODEs are non-autonomous.
+    t: float
+        Final time of the time integration. Corresponds to the final condition.
+        Important if the ODEs are non-autonomous.
+    dt: float
+        Timestep of the integration.
+    ic: None or ~numpy.ndarray(float), optional
+        Initial conditions of the system. Can be a 1D or a 2D array:
+
+        * 1D: Provide a single initial condition.
+          Should be of shape (`n_dim`,) where `n_dim` = :math:`\\mathrm{dim}(\\boldsymbol{x})`.
+        * 2D: Provide an ensemble of initial condition.
+          Should be of shape (`n_traj`, `n_dim`) where `n_dim` = :math:`\\mathrm{dim}(\\boldsymbol{x})`,
+          and where `n_traj` is the number of initial conditions.
+
+        If `None`, use a zero initial condition. Default to `None`.
+    write_steps: int, optional
+        Save the state of the integration in memory every `write_steps` steps. The other intermediary
+        steps are lost. It determines the size of the returned objects. Default is 1.
+        Set to 0 to return only the final state.
+    f_nl_ens: None or callable, optional
+        The `Numba`_-jitted ensemble version of :math:`\\boldsymbol{n}`, with the signature ``f_nl_ens(t, X)``
+        where ``X`` is an array of shape (`n_traj`, `n_dim`). If provided, each stage evaluates all the
+        trajectories at once. Default to `None`.
+
+    Returns
+    -------
+    time, traj: ~numpy.ndarray
+        The result of the integration:
+
+        * **time:** Time at which the state of the system was saved. Array of shape (`n_step`,) where
+          `n_step` is the number of saved states of the integration.
+        * **traj:** Saved dynamical system states. 3D array of shape (`n_traj`, `n_dim`, `n_steps`). If `n_traj` = 1,
+          a 2D array of shape (`n_dim`, `n_steps`) is returned instead.
+    """
+
+    if ic is None:
+        ic = np.zeros(L.shape[0])
+
+    if len(ic.shape) == 1:
+        ic = ic.reshape((1, -1))
+
+    time = np.concatenate((np.arange(t0, t, dt), np.full((1,), t)))
+    coeffs = _etdrk4_time_coefficients(L, time, dt)
+
+    if f_nl_ens is not None:
+        recorded_traj = _integrate_etdrk4_ens_jit(f_nl_ens, time, ic, write_steps, coeffs)
+    else:
+        recorded_traj = _integrate_etdrk4_jit(f_nl, time, ic, write_steps, coeffs)
+
+    if write_steps > 0:
+        if time[::write_steps][-1] == time[-1]:
+            return time[::write_steps], np.squeeze(recorded_traj)
+        else:
+            return np.concatenate((time[::write_steps], np.full((1,), t))), np.squeeze(recorded_traj)
+    else:
+        return time[-1], np.squeeze(recorded_traj)
+
+
+def _etdrk4_time_coefficients(L, time, dt):
+    """Coefficients of the ETDRK4 scheme for the regular steps and for the last step of a time array,
+    which can be shorter. Array of shape (2, 6, `n_dim`, `n_dim`)."""
+    coeffs = etdrk4_coefficients(L, dt)
+    last_dt = time[-1] - time[-2] if len(time) > 1 else dt
+    if np.isclose(last_dt, dt, rtol=1.e-12, atol=0.):
+        last_coeffs = coeffs
+    else:
+        last_coeffs = etdrk4_coefficients(L, last_dt)
+    return np.array([coeffs, last_coeffs])
+
+
+@njit(nogil=True)
+def _integrate_runge_kutta_jit(f, time, ic, time_direction, write_steps, b, c, a):
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+
+    s = len(b)
+
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
+
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    if time_direction == -1:
+        directed_time = reverse(time)
+    else:
+        directed_time = time
+
+    for i_traj in range(n_traj):
+        y = ic[i_traj].copy()
+        k = np.zeros((s, n_dim))
+        iw = 0
+        for ti, (tt, dt) in enumerate(zip(directed_time[:-1], np.diff(directed_time))):
+
+            if write_steps > 0 and np.mod(ti, write_steps) == 0:
+                recorded_traj[i_traj, :, iw] = y
+                iw += 1
+
+            k.fill(0.)
+            for i in range(s):
+                y_s = y + dt * a[i] @ k
+                k[i] = f(tt + c[i] * dt, y_s)
+            y_new = y + dt * b @ k
+            y = y_new
+
+        recorded_traj[i_traj, :, -1] = y
+
+    return recorded_traj[:, :, ::time_direction]
+
+
+@njit(nogil=True)
+def _integrate_runge_kutta_ens_jit(f_ens, time, ic, time_direction, write_steps, b, c, a):
+    """Ensemble version of :func:`_integrate_runge_kutta_jit`.
+
+    All the trajectories are advanced together, each Runge-Kutta stage evaluating the ensemble tendencies
+    function ``f_ens(t, X)`` once for the whole array ``X`` of shape (`n_traj`, `n_dim`).
+    """
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+
+    s = len(b)
+
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
+
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    if time_direction == -1:
+        directed_time = reverse(time)
+    else:
+        directed_time = time
+
+    y = ic.copy()
+    k = np.zeros((s, n_traj, n_dim))
+    iw = 0
+    for ti, (tt, dt) in enumerate(zip(directed_time[:-1], np.diff(directed_time))):
+
+        if write_steps > 0 and np.mod(ti, write_steps) == 0:
+            recorded_traj[:, :, iw] = y
+            iw += 1
+
+        k.fill(0.)
+        for i in range(s):
+            y_s = y.copy()
+            for j in range(i):
+                if a[i, j] != 0.:
+                    y_s += dt * a[i, j] * k[j]
+            k[i] = f_ens(tt + c[i] * dt, y_s)
+        for j in range(s):
+            y += dt * b[j] * k[j]
+
+    recorded_traj[:, :, -1] = y
+
+    return recorded_traj[:, :, ::time_direction]
+
+
+@njit(nogil=True, cache=True)
+def _integrate_runge_kutta_csr_jit(indptr, jk, val, time, ic, time_direction, write_steps, b, c, a):
+    """Version of :func:`_integrate_runge_kutta_ens_jit` with the tendencies computed directly from the tensor.
+
+    The tendencies tensor is passed in compressed rows form `(indptr, jk, val)`
+    (see :meth:`~.tensors.qgtensor.QgsTensor.tensor_csr`) instead of being captured by a jitted closure,
+    such that the compiled kernel does not depend on the model and is cached on disk by `Numba`_.
+    It is thus compiled only once, and not again in every process integrating a model.
+
+    .. _Numba: https://numba.pydata.org/
+    """
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+
+    s = len(b)
 
-    # Default is RK4
-    if a is None and b is None and c is None:
-        c = np.array([0., 0.5, 0.5, 1.])
-        b = np.array([1./6, 1./3, 1./3, 1./6])
-        a = np.zeros((len(c), len(b)))
-        a[1, 0] = 0.5
-        a[2, 1] = 0.5
-        a[3, 2] = 1.
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
 
-    if forward:
-        time_direction = 1
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    if time_direction == -1:
+        directed_time = reverse(time)
     else:
-        time_direction = -1
+        directed_time = time
 
-    time = np.concatenate((np.arange(t0, t, dt), np.full((1,), t)))
+    y = ic.copy()
+    k = np.zeros((s, n_traj, n_dim))
+    xx = np.ones((n_dim + 1, n_traj))
+    iw = 0
+    for ti, (tt, dt) in enumerate(zip(directed_time[:-1], np.diff(directed_time))):
+
+        if write_steps > 0 and np.mod(ti, write_steps) == 0:
+            recorded_traj[:, :, iw] = y
+            iw += 1
+
+        k.fill(0.)
+        for i in range(s):
+            y_s = y.copy()
+            for j in range(i):
+                if a[i, j] != 0.:
+                    y_s += dt * a[i, j] * k[j]
+            xx[1:] = y_s.T
+            k[i] = sparse_mul3_ens_csr(indptr, jk, val, xx, xx)[1:].T
+        for j in range(s):
+            y += dt * b[j] * k[j]
+
+    recorded_traj[:, :, -1] = y
 
-    recorded_traj = _integrate_runge_kutta_jit(f, time, ic, time_direction, write_steps, b, c, a)
+    return recorded_traj[:, :, ::time_direction]
 
-    if write_steps > 0:
-        if forward:
-            if time[::write_steps][-1] == time[-1]:
-                return time[::write_steps], np.squeeze(recorded_traj)
-            else:
-                return np.concatenate((time[::write_steps], np.full((1,), t))), np.squeeze(recorded_traj)
-        else:
-            rtime = reverse(time[::-write_steps])
-            if rtime[0] == time[0]:
-                return rtime, np.squeeze(recorded_traj)
-            else:
-                return np.concatenate((np.full((1,), t0), rtime)), np.squeeze(recorded_traj)
-    else:
-        return time[-1], np.squeeze(recorded_traj)
 
+def warm_up():
+    """Compile the cached integration kernels, or load them from the `Numba`_ cache, ahead of their first use.
 
-@njit
-def _integrate_runge_kutta_jit(f, time, ic, time_direction, write_steps, b, c, a):
+    Calling this function once, e.g. before starting worker processes, avoids that each worker compiles the
+    kernels on its own. The kernels are compiled for the arrays types used by the integrators
+    (`float64` states and `int64` tensor indices).
+
+    .. _Numba: https://numba.pydata.org/
+    """
+    indptr = np.array([0, 0, 1], dtype=np.int64)
+    jk = np.zeros((1, 2), dtype=np.int64)
+    val = np.zeros(1)
+    c = np.array([0., 0.5, 0.5, 1.])
+    b = np.array([1./6, 1./3, 1./3, 1./6])
+    a = np.zeros((len(c), len(b)))
+    a[1, 0] = 0.5
+    a[2, 1] = 0.5
+    a[3, 2] = 1.
+    _integrate_runge_kutta_csr_jit(indptr, jk, val, np.array([0., 1.]), np.zeros((1, 1)), 1, 1, b, c, a)
+
+
+@njit(nogil=True)
+def _integrate_runge_kutta_ens_members_jit(f_ens, time, ic, values, time_direction, write_steps, b, c, a):
+    """Version of :func:`_integrate_runge_kutta_ens_jit` where each member has its own model, the ensemble
+    tendencies function ``f_ens(t, X, V)`` receiving the array ``V`` of the models of the members.
+    """
 
     n_traj = ic.shape[0]
     n_dim = ic.shape[1]
@@ -201,26 +759,209 @@ def _integrate_runge_kutta_jit(f, time, ic, time_direction, write_steps, b, c, a
     else:
         directed_time = time
 
+    y = ic.copy()
+    k = np.zeros((s, n_traj, n_dim))
+    iw = 0
+    for ti, (tt, dt) in enumerate(zip(directed_time[:-1], np.diff(directed_time))):
+
+        if write_steps > 0 and np.mod(ti, write_steps) == 0:
+            recorded_traj[:, :, iw] = y
+            iw += 1
+
+        k.fill(0.)
+        for i in range(s):
+            y_s = y.copy()
+            for j in range(i):
+                if a[i, j] != 0.:
+                    y_s += dt * a[i, j] * k[j]
+            k[i] = f_ens(tt + c[i] * dt, y_s, values)
+        for j in range(s):
+            y += dt * b[j] * k[j]
+
+    recorded_traj[:, :, -1] = y
+
+    return recorded_traj[:, :, ::time_direction]
+
+
+@njit(nogil=True)
+def _integrate_dormand_prince_jit(f, time, ic, time_direction, write_steps, rtol, atol, max_dt):
+    """Adaptive timestep version of :func:`_integrate_runge_kutta_jit` with the Dormand-Prince 5(4) pair.
+
+    The timesteps are chosen freely by the error control, the array `time` only defines the output times
+    (recorded like the states of the fixed timestep integration), which are interpolated with the dense output.
+    """
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
+
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    if time_direction == -1:
+        directed_time = reverse(time)
+    else:
+        directed_time = time
+
+    if write_steps == 0:
+        out_time = directed_time[-1:]
+    else:
+        out_time = np.concatenate((directed_time[:-1:write_steps], directed_time[-1:]))
+
+    t_end = directed_time[-1]
+    if len(directed_time) > 1:
+        h0 = min(abs(directed_time[1] - directed_time[0]), max_dt)
+    else:
+        h0 = 0.
+
     for i_traj in range(n_traj):
         y = ic[i_traj].copy()
-        k = np.zeros((s, n_dim))
+        tt = directed_time[0]
+        k = np.zeros((7, n_dim))
+        k[0] = f(tt, y)
+        h = h0
         iw = 0
-        for ti, (tt, dt) in enumerate(zip(directed_time[:-1], np.diff(directed_time))):
+        while iw < n_records and (out_time[iw] - tt) * time_direction <= 0.:
+            recorded_traj[i_traj, :, iw] = y
+            iw += 1
+
+        while iw < n_records:
+
+            last = (tt + time_direction * h - t_end) * time_direction >= 0.
+            if last:
+                h = abs(t_end - tt)
+            dt = time_direction * h
+
+            for i in range(1, 6):
+                y_s = y + dt * (_dp_a[i, :i] @ k[:i])
+                k[i] = f(tt + _dp_c[i] * dt, y_s)
+            y_new = y + dt * (_dp_b @ k[:6])
+            if last:
+                t_new = t_end
+            else:
+                t_new = tt + dt
+            k[6] = f(t_new, y_new)
+
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            err = np.sqrt(np.mean((dt * (_dp_e @ k) / scale) ** 2))
+
+            if err <= 1.:
+                if iw < n_records and (out_time[iw] - t_new) * time_direction <= 0.:
+                    q = _dp_p.T @ k
+                    while iw < n_records and (out_time[iw] - t_new) * time_direction <= 0.:
+                        if out_time[iw] == t_new:
+                            recorded_traj[i_traj, :, iw] = y_new
+                        else:
+                            theta = (out_time[iw] - tt) / dt
+                            recorded_traj[i_traj, :, iw] = y + dt * (np.array([theta, theta ** 2, theta ** 3,
+                                                                                theta ** 4]) @ q)
+                        iw += 1
+                tt = t_new
+                y = y_new
+                k[0] = k[6]
+                if err == 0.:
+                    factor = 10.
+                else:
+                    factor = min(10., max(0.2, 0.9 * err ** -0.2))
+            else:
+                factor = max(0.2, 0.9 * err ** -0.2)
+
+            h = min(h * factor, max_dt)
+            if h <= 1.e-14 * max(abs(tt), 1.):
+                raise RuntimeError("Dormand-Prince integration: timestep too small, the tolerances cannot be met.")
+
+    return recorded_traj[:, :, ::time_direction]
+
+
+@njit(nogil=True)
+def _integrate_etdrk4_jit(f_nl, time, ic, write_steps, coeffs):
+    """ETDRK4 integration of the trajectories one after the other. The coefficients `coeffs` are the ones of
+    the regular steps (`coeffs[0]`) and of the last step (`coeffs[1]`), see :func:`_etdrk4_time_coefficients`."""
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
+
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    n_steps = len(time) - 1
+
+    for i_traj in range(n_traj):
+        y = ic[i_traj].copy()
+        iw = 0
+        for ti in range(n_steps):
 
             if write_steps > 0 and np.mod(ti, write_steps) == 0:
                 recorded_traj[i_traj, :, iw] = y
                 iw += 1
 
-            k.fill(0.)
-            for i in range(s):
-                y_s = y + dt * a[i] @ k
-                k[i] = f(tt + c[i] * dt, y_s)
-            y_new = y + dt * b @ k
-            y = y_new
+            y = _etdrk4_step(f_nl, time[ti], time[ti + 1] - time[ti], y, coeffs[int(ti == n_steps - 1)])
 
         recorded_traj[i_traj, :, -1] = y
 
-    return recorded_traj[:, :, ::time_direction]
+    return recorded_traj
+
+
+@njit(nogil=True)
+def _integrate_etdrk4_ens_jit(f_nl_ens, time, ic, write_steps, coeffs):
+    """Ensemble version of :func:`_integrate_etdrk4_jit`.
+
+    All the trajectories are advanced together, each stage evaluating the ensemble nonlinear tendencies
+    ``f_nl_ens(t, X)`` once for the whole array ``X`` of shape (`n_traj`, `n_dim`).
+    """
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
+
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    n_steps = len(time) - 1
+
+    y = ic.copy()
+    iw = 0
+    for ti in range(n_steps):
+
+        if write_steps > 0 and np.mod(ti, write_steps) == 0:
+            recorded_traj[:, :, iw] = y
+            iw += 1
+
+        y = _etdrk4_step(f_nl_ens, time[ti], time[ti + 1] - time[ti], y, coeffs[int(ti == n_steps - 1)])
+
+    recorded_traj[:, :, -1] = y
+
+    return recorded_traj
+
+
+@njit(nogil=True)
+def _etdrk4_step(f_nl, tt, dt, y, coeffs):
+    # y is a state or an array of states stacked along the first axis, the coefficients being transposed
+    n1 = f_nl(tt, y)
+    ye2 = y @ coeffs[1]
+    y1 = ye2 + n1 @ coeffs[2]
+    n2a = f_nl(tt + dt / 2, y1)
+    y2a = ye2 + n2a @ coeffs[2]
+    n2b = f_nl(tt + dt / 2, y2a)
+    y2b = y1 @ coeffs[1] + (2. * n2b - n1) @ coeffs[2]
+    n3 = f_nl(tt + dt, y2b)
+    return y @ coeffs[0] + n1 @ coeffs[3] + 2. * (n2a + n2b) @ coeffs[4] + n3 @ coeffs[5]
 
 
 @njit
@@ -552,7 +1293,139 @@ def integrate_runge_kutta_tgls(f, fjac, t0, t, dt, ic=None, tg_ic=None,
         return time[-1], np.squeeze(recorded_traj), np.squeeze(recorded_fmatrix)
 
 
-@njit
+def integrate_runge_kutta_tgls_batch(f_ens, fjac_dot, t0, t, dt, ic, tg_ic=None, forward=True, inverse=False,
+                                     write_steps=1, b=None, c=None, a=None):
+    """Integrate simultaneously the ordinary differential equations (ODEs)
+
+    .. math:: \\dot{\\boldsymbol{x}} = \\boldsymbol{f}(t, \\boldsymbol{x})
+
+    and its tangent linear (or adjoint) model for a batch of trajectories and of tangent vectors, with a specified
+    `Runge-Kutta method`_.
+
+    Batched and matrix-free version of :func:`integrate_runge_kutta_tgls`: all the trajectories and all their tangent
+    vectors are advanced together, each stage evaluating the ensemble tendencies ``f_ens(t, X)`` and the action of
+    the Jacobian matrices ``fjac_dot(t, X, V)`` once. The Jacobian matrices are never formed, such that the memory
+    needed by a stage scales with the number of tangent vectors instead of the square of the dimension.
+
+    .. _Runge-Kutta method: https://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+    .. _Numba: https://numba.pydata.org/
+
+    Parameters
+    ----------
+    f_ens: callable
+        The `Numba`_-jitted ensemble version of the function :math:`\\boldsymbol{f}`.
+        Should have the signature ``f_ens(t, X)`` where ``X`` is an array of shape (`n_traj`, `n_dim`).
+    fjac_dot: callable
+        The `Numba`_-jitted action of the Jacobian matrices :math:`\\boldsymbol{\\mathrm{J}}`,
+        for instance the function `Df_dot` returned by :func:`~.functions.tendencies.create_tendencies`.
+        Should have the signature ``fjac_dot(t, X, V)`` where ``V`` is an array of shape (`n_traj`, `n_dim`, `n_vec`),
+        and return the array of the same shape whose element `n` is :math:`\\boldsymbol{\\mathrm{J}}(t, \\boldsymbol{x}_n) \\cdot \\boldsymbol{V}_n`.
+        Provide the action of the transposed Jacobian matrices (e.g. `Df_tdot`) to integrate the adjoint model.
+    t0: float
+        Initial time of the time integration. Corresponds to the initial conditions.
+    t: float
+        Final time of the time integration. Corresponds to the final conditions.
+    dt: float
+        Timestep of the integration.
+    ic: ~numpy.ndarray(float)
+        Initial (or final) conditions of the ODEs. A 1D array of shape (`n_dim`,) or a 2D array of shape
+        (`n_traj`, `n_dim`).
+        If the `forward` argument is `False`, it specifies final conditions.
+    tg_ic: None or ~numpy.ndarray(float), optional
+        Initial (or final) conditions of the linear ODEs. Can be a 2D or a 3D array:
+
+        * 2D: An array of shape (`n_dim`, `n_vec`) of `n_vec` tangent vectors (stored in columns),
+          used for each initial condition `ic`.
+        * 3D: An array of shape (`n_traj`, `n_dim`, `n_vec`) of tangent vectors specific to each initial condition.
+
+        If `None`, use the identity matrix as initial condition, returning the fundamental matrix of solutions of the
+        linear ODEs. Default to `None`.
+    forward: bool, optional
+        Whether to integrate the ODEs forward or backward in time. Default to forward integration.
+    inverse: bool, optional
+        Same as in :func:`integrate_runge_kutta_tgls`. `False` by default.
+    write_steps: int, optional
+        Save the state of the integration in memory every `write_steps` steps. The other intermediary
+        steps are lost. It determines the size of the returned objects. Default is 1.
+        Set to 0 to return only the final state.
+    b: None or ~numpy.ndarray, optional
+        Vector of coefficients :math:`b_i` of the `Runge-Kutta method`_ .
+        If `None`, use the classic RK4 method coefficients. Default to `None`.
+    c: None or ~numpy.ndarray, optional
+        Matrix of coefficients :math:`c_{i,j}` of the `Runge-Kutta method`_ .
+        If `None`, use the classic RK4 method coefficients. Default to `None`.
+    a: None or ~numpy.ndarray, optional
+        Vector of coefficients :math:`a_i` of the `Runge-Kutta method`_ .
+        If `None`, use the classic RK4 method coefficients. Default to `None`.
+
+    Returns
+    -------
+    time, traj, tg_traj: ~numpy.ndarray
+        The result of the integration:
+
+        * **time:** Time at which the state of the system was saved. Array of shape (`n_step`,).
+        * **traj:** Saved states of the ODEs. 3D array of shape (`n_traj`, `n_dim`, `n_steps`).
+        * **tg_traj:** Saved tangent vectors. 4D array of shape (`n_traj`, `n_dim`, `n_vec`, `n_steps`).
+
+        The dimensions of length 1 are squeezed.
+    """
+
+    if len(ic.shape) == 1:
+        ic = ic.reshape((1, -1))
+
+    n_traj, n_dim = ic.shape
+
+    if tg_ic is None:
+        tg_ic = np.eye(n_dim)
+
+    if len(tg_ic.shape) == 2:
+        tg_ic = np.repeat(tg_ic[np.newaxis], n_traj, axis=0)
+    tg_ic = np.ascontiguousarray(tg_ic, dtype=np.float64)
+
+    # Default is RK4
+    if a is None and b is None and c is None:
+        c = np.array([0., 0.5, 0.5, 1.])
+        b = np.array([1./6, 1./3, 1./3, 1./6])
+        a = np.zeros((len(c), len(b)))
+        a[1, 0] = 0.5
+        a[2, 1] = 0.5
+        a[3, 2] = 1.
+
+    if forward:
+        time_direction = 1
+    else:
+        time_direction = -1
+
+    time = np.concatenate((np.arange(t0, t, dt), np.full((1,), t)))
+
+    inv = 1.
+    if inverse:
+        inv *= -1.
+
+    recorded_traj, recorded_fmatrix = _integrate_runge_kutta_tgls_batch_jit(f_ens, fjac_dot, time, ic, tg_ic,
+                                                                            time_direction, write_steps,
+                                                                            b, c, a, inv)
+
+    if write_steps > 0:
+        if forward:
+            if time[::write_steps][-1] == time[-1]:
+                return time[::write_steps], np.squeeze(recorded_traj), np.squeeze(recorded_fmatrix)
+            else:
+                return np.concatenate((time[::write_steps], np.full((1,), t))), np.squeeze(recorded_traj),\
+                       np.squeeze(recorded_fmatrix)
+        else:
+            rtime = reverse(time[::-write_steps])
+            if rtime[0] == time[0]:
+                return rtime, np.squeeze(recorded_traj), np.squeeze(recorded_fmatrix)
+            else:
+                return np.concatenate((np.full((1,), t0), rtime)), np.squeeze(recorded_traj),\
+                       np.squeeze(recorded_fmatrix)
+
+    else:
+        return time[-1], np.squeeze(recorded_traj), np.squeeze(recorded_fmatrix)
+
+
+@njit(nogil=True)
 def _integrate_runge_kutta_tgls_jit(f, fjac, time, ic, tg_ic, time_direction, write_steps, b, c, a,
                                     adjoint, inverse, boundary):
 
@@ -614,6 +1487,68 @@ def _integrate_runge_kutta_tgls_jit(f, fjac, time, ic, tg_ic, time_direction, wr
     return recorded_traj[:, :, ::time_direction], recorded_fmatrix[:, :, :, ::time_direction]
 
 
+@njit(nogil=True)
+def _integrate_runge_kutta_tgls_batch_jit(f_ens, fjac_dot, time, ic, tg_ic, time_direction, write_steps, b, c, a,
+                                          inverse):
+    """Batched version of :func:`_integrate_runge_kutta_tgls_jit`.
+
+    All the trajectories and their tangent vectors are advanced together, each Runge-Kutta stage evaluating
+    ``f_ens(t, X)`` and the matrix-free action ``fjac_dot(t, X, V)`` once for the whole batch.
+    """
+
+    n_traj = ic.shape[0]
+    n_dim = ic.shape[1]
+    n_vec = tg_ic.shape[2]
+
+    s = len(b)
+
+    if write_steps == 0:
+        n_records = 1
+    else:
+        tot = time[::write_steps]
+        n_records = len(tot)
+        if tot[-1] != time[-1]:
+            n_records += 1
+    recorded_traj = np.zeros((n_traj, n_dim, n_records))
+    recorded_fmatrix = np.zeros((n_traj, n_dim, n_vec, n_records))
+    if time_direction == -1:
+        directed_time = reverse(time)
+    else:
+        directed_time = time
+
+    y = ic.copy()
+    fm = tg_ic.copy()
+    k = np.zeros((s, n_traj, n_dim))
+    km = np.zeros((s, n_traj, n_dim, n_vec))
+    iw = 0
+    for ti, (tt, dt) in enumerate(zip(directed_time[:-1], np.diff(directed_time))):
+
+        if write_steps > 0 and np.mod(ti, write_steps) == 0:
+            recorded_traj[:, :, iw] = y
+            recorded_fmatrix[:, :, :, iw] = fm
+            iw += 1
+
+        k.fill(0.)
+        km.fill(0.)
+        for i in range(s):
+            y_s = y.copy()
+            km_s = fm.copy()
+            for j in range(i):
+                if a[i, j] != 0.:
+                    y_s += dt * a[i, j] * k[j]
+                    km_s += dt * a[i, j] * km[j]
+            k[i] = f_ens(tt + c[i] * dt, y_s)
+            km[i] = inverse * fjac_dot(tt + c[i] * dt, y_s, km_s)
+        for j in range(s):
+            y += dt * b[j] * k[j]
+            fm += dt * b[j] * km[j]
+
+    recorded_traj[:, :, -1] = y
+    recorded_fmatrix[:, :, :, -1] = fm
+
+    return recorded_traj[:, :, ::time_direction], recorded_fmatrix[:, :, :, ::time_direction]
+
+
 if __name__ == "__main__":
     import matplotlib.pyplot as plt
     from scipy.integrate import odeint
@@ -14,13 +14,19 @@
     --------------
 
     * :class:`RungeKuttaIntegrator`
+    * :class:`DormandPrinceIntegrator`
     * :class:`RungeKuttaTglsIntegrator`
 
 """
 import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from numba import njit
 from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_runge_kutta_jit, _integrate_runge_kutta_tgls_jit, _zeros_func
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_dormand_prince_jit, _dp_a, _dp_b, _dp_c
+from dapper.mods.Qgs.qgs.integrators.integrate import _integrate_runge_kutta_csr_jit, warm_up
+from dapper.mods.Qgs.qgs.integrators import checkpoint
 from dapper.mods.Qgs.qgs.functions.util import reverse
 
 
@@ -50,11 +56,32 @@ class RungeKuttaIntegrator(object):
     number_of_dimensions: None or int, optional
         Allow to hardcode the dynamical system dimension. If `None`, evaluate the dimension from the
         callable :attr:`func`. Default to `None`.
+    shared_memory: bool, optional
+        If `True`, the initial conditions and the recorded trajectories are stored in shared memory buffers
+        allocated once per integration, and the workers only receive chunks of trajectory indices.
+        Avoid the serialization of the trajectories through the queues. Default to `False`.
+    chunk_size: None or int, optional
+        Number of trajectories integrated by a worker at once in the shared memory mode or with the threads backend.
+        If `None`, split the trajectories evenly between the workers. Default to `None`.
+    backend: str, optional
+        The kind of workers to use:
+
+        * `'processes'`: persistent worker processes fed through queues (or shared memory).
+        * `'threads'`: a pool of threads calling the Numba-jitted kernels, which release the GIL.
+          The compiled code and the memory are shared by the workers, and no process is started.
+
+        Default to `'processes'`.
 
     Attributes
     ----------
     num_threads: int
         Number of :class:`TrajectoryProcess` workers (threads) to use.
+    shared_memory: bool
+        Whether the trajectories are exchanged with the workers through shared memory buffers.
+    chunk_size: None or int
+        Number of trajectories integrated by a worker at once in the shared memory mode or with the threads backend.
+    backend: str
+        The kind of workers used, `'processes'` or `'threads'`.
     b: ~numpy.ndarray
         Vector of coefficients :math:`b_i` of the `Runge-Kutta method`_ .
     c: ~numpy.ndarray
@@ -74,13 +101,21 @@ class RungeKuttaIntegrator(object):
         Last function :math:`\\boldsymbol{f}` used by the integrator to integrate.
     """
 
-    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None):
+    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None, shared_memory=False,
+                 chunk_size=None, backend='processes'):
 
         if num_threads is None:
             self.num_threads = multiprocessing.cpu_count()
         else:
             self.num_threads = num_threads
 
+        if backend not in _backends:
+            raise ValueError("Unknown backend '" + str(backend) + "'. Should be one of " + str(_backends) + ".")
+
+        self.shared_memory = shared_memory
+        self.chunk_size = chunk_size
+        self.backend = backend
+
         # Default is RK4
         if a is None and b is None and c is None:
             self.c = np.array([0., 0.5, 0.5, 1.])
@@ -104,11 +139,16 @@ class RungeKuttaIntegrator(object):
         self._time_direction = 1
 
         self.func = None
+        # tendencies tensor of the function, if any, used to call the integration kernel cached on disk
+        self._tensor_csr = None
+        # adaptive timestep tolerances (rtol, atol, max_dt), None for a fixed timestep integration
+        self._tolerances = None
 
         self._ics_queue = None
         self._traj_queue = None
 
         self._processes_list = list()
+        self._executor = None
 
     def terminate(self):
         """Stop the workers (threads) and release the resources of the integrator."""
@@ -118,6 +158,10 @@ class RungeKuttaIntegrator(object):
             process.terminate()
             process.join()
 
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def start(self):
         """Start or restart the workers (threads) of the integrator.
 
@@ -130,12 +174,22 @@ class RungeKuttaIntegrator(object):
         self.terminate()
 
         self._processes_list = list()
+
+        if self.backend == 'threads':
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            return
+
         self._ics_queue = multiprocessing.JoinableQueue()
         self._traj_queue = multiprocessing.Queue()
 
+        if self._tensor_csr is not None and self._tolerances is None:
+            # fill the kernels cache once, before the workers load it
+            warm_up()
+
         for i in range(self.num_threads):
             self._processes_list.append(TrajectoryProcess(i, self.func, self.b, self.c, self.a,
-                                                          self._ics_queue, self._traj_queue))
+                                                          self._ics_queue, self._traj_queue, self._tolerances,
+                                                          self._tensor_csr))
 
         for process in self._processes_list:
             process.daemon = True
@@ -151,6 +205,9 @@ class RungeKuttaIntegrator(object):
         f: callable
             The `Numba`_-jitted function :math:`\\boldsymbol{f}`.
             Should have the signature ``f(t, x)`` where ``x`` is the state value and ``t`` is the time.
+            If `f` has a `tensor_csr` attribute, like the tendencies returned by
+            :func:`~.functions.tendencies.create_tendencies`, the fixed timestep integrations are performed by a
+            kernel computing the tendencies directly from this tensor, which is compiled once and cached on disk.
         ic_init: bool, optional
             Re-initialize or not the initial conditions of the integrator. Default to `True`.
 
@@ -160,6 +217,7 @@ class RungeKuttaIntegrator(object):
         """
 
         self.func = f
+        self._tensor_csr = getattr(f, 'tensor_csr', None)
         if ic_init:
             self.ic = None
         self.start()
@@ -383,6 +441,14 @@ class RungeKuttaIntegrator(object):
             if tot[-1] != self._time[-1]:
                 self.n_records += 1
 
+        if self.backend == 'threads':
+            self._integrate_threads()
+            return
+
+        if self.shared_memory:
+            self._integrate_shared()
+            return
+
         self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
 
         for i in range(self.n_traj):
@@ -394,6 +460,34 @@ class RungeKuttaIntegrator(object):
             args = self._traj_queue.get()
             self._recorded_traj[args[0]] = args[1]
 
+    def _integrate_threads(self):
+        # the threads write directly their chunk of trajectories in the result array
+        self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
+
+        def integrate_chunk(chunk):
+            self._recorded_traj[chunk] = _integrate_trajectories(self.func, self._time, self.ic[chunk],
+                                                                 self._time_direction, self._write_steps,
+                                                                 self.b, self.c, self.a, self._tolerances,
+                                                                 self._tensor_csr)
+
+        _run_threads(self._executor, integrate_chunk, _chunks(self.n_traj, self.num_threads, self.chunk_size))
+
+    def _integrate_shared(self):
+        # initial conditions and trajectories are exchanged through shared memory, the workers only get index ranges
+        ic_shm, ic = _create_shared_array((self.n_traj, self.n_dim))
+        traj_shm, traj = _create_shared_array((self.n_traj, self.n_dim, self.n_records))
+        try:
+            ic[...] = self.ic
+            for chunk in _chunks(self.n_traj, self.num_threads, self.chunk_size):
+                self._ics_queue.put((chunk, self._time, (ic_shm.name, ic.shape), (traj_shm.name, traj.shape),
+                                     self._time_direction, self._write_steps))
+
+            self._ics_queue.join()
+            self._recorded_traj = traj.copy()
+        finally:
+            del ic, traj
+            _release_shared_memory(ic_shm, traj_shm)
+
     def get_trajectories(self):
         """Returns the result of the previous integrator integration.
 
@@ -423,6 +517,69 @@ class RungeKuttaIntegrator(object):
         else:
             return self._time[-1], np.squeeze(self._recorded_traj)
 
+    def write_trajectories(self, writer, time_offset=0.):
+        """Append the result of the previous integrator integration to a trajectory file.
+
+        Parameters
+        ----------
+        writer: ~integrators.trajectory.TrajectoryWriter
+            The writer of the trajectory file.
+        time_offset: float, optional
+            Time added to the recorded times, e.g. the time elapsed before the previous integration. Default to 0.
+
+        Warnings
+        --------
+        Only the trajectory of a single initial condition can be written.
+        """
+        if self.n_traj > 1:
+            raise ValueError("Only the trajectory of a single initial condition can be written to a trajectory file.")
+
+        time, traj = self.get_trajectories()
+        writer.append(time + time_offset, traj)
+
+    def save_checkpoint(self, filename, time_offset=0.):
+        """Save the time and the state(s) reached by the previous integrator integration to a checkpoint file,
+        to be able to restart the integration from there. If no integration was performed, save the initial
+        conditions stored in :attr:`ic`.
+
+        Parameters
+        ----------
+        filename: str or ~pathlib.Path
+            The checkpoint file. Overwritten if it exists.
+        time_offset: float, optional
+            Time added to the saved time, e.g. the time elapsed before the previous integration. Default to 0.
+        """
+        if self._recorded_traj is None:
+            t = 0.
+            x = self.ic
+        elif self._time_direction == 1:
+            t = self._time[-1]
+            x = self._recorded_traj[:, :, -1]
+        else:
+            t = self._time[0]
+            x = self._recorded_traj[:, :, 0]
+
+        if x is not None and len(x.shape) > 1 and x.shape[0] == 1:
+            x = x[0]
+
+        checkpoint.save_checkpoint(filename, t + time_offset, x)
+
+    def load_checkpoint(self, filename):
+        """Restore the state(s) saved in a checkpoint file as the initial conditions :attr:`ic` of the integrator.
+
+        Parameters
+        ----------
+        filename: str or ~pathlib.Path
+            The checkpoint file.
+
+        Returns
+        -------
+        float
+            The time at which the state(s) were saved.
+        """
+        t, self.ic = checkpoint.load_checkpoint(filename)
+        return t
+
     def get_ic(self):
         """Returns the initial conditions stored in the integrator.
 
@@ -450,10 +607,101 @@ class RungeKuttaIntegrator(object):
         self.ic = ic
 
 
+class DormandPrinceIntegrator(RungeKuttaIntegrator):
+    """Class to integrate the ordinary differential equations (ODEs)
+
+    .. math:: \\dot{\\boldsymbol{x}} = \\boldsymbol{f}(t, \\boldsymbol{x})
+
+    with a set of :class:`TrajectoryProcess` and the adaptive timestep `Dormand-Prince method`_.
+    The timestep `dt` provided to :meth:`~RungeKuttaIntegrator.integrate` only defines the times at which the
+    states are recorded (every `write_steps` timesteps), and is used as the first trial timestep.
+    The actual timesteps are adapted to keep the local error estimate below the tolerances, and the recorded states
+    are interpolated with the dense output of the method.
+
+    .. _Dormand-Prince method: https://en.wikipedia.org/wiki/Dormand%E2%80%93Prince_method
+
+    Parameters
+    ----------
+    num_threads: None or int, optional
+        Number of :class:`TrajectoryProcess` workers (threads) to use. If `None`, use the number of machine's
+        cores available. Default to `None`.
+    rtol: float, optional
+        Relative tolerance of the local error. Default to 1e-6.
+    atol: float, optional
+        Absolute tolerance of the local error. Default to 1e-8.
+    max_dt: None or float, optional
+        Maximum timestep allowed. If `None`, the timestep is not bounded. Default to `None`.
+    number_of_dimensions: None or int, optional
+        Allow to hardcode the dynamical system dimension. If `None`, evaluate the dimension from the
+        callable :attr:`func`. Default to `None`.
+    shared_memory: bool, optional
+        Whether to exchange the trajectories with the workers through shared memory buffers.
+        See :class:`RungeKuttaIntegrator`. Default to `False`.
+    chunk_size: None or int, optional
+        Number of trajectories integrated by a worker at once in the shared memory mode or with the threads backend.
+        If `None`, split the trajectories evenly between the workers. Default to `None`.
+    backend: str, optional
+        The kind of workers to use, `'processes'` or `'threads'`. See :class:`RungeKuttaIntegrator`.
+        Default to `'processes'`.
+
+    Attributes
+    ----------
+    rtol: float
+        Relative tolerance of the local error.
+    atol: float
+        Absolute tolerance of the local error.
+    max_dt: float
+        Maximum timestep allowed.
+
+    Notes
+    -----
+    The Runge-Kutta coefficients :attr:`b`, :attr:`c` and :attr:`a` are the ones of the 5th order solution of the
+    Dormand-Prince method, and are not used by the adaptive timestep integration.
+    """
+
+    def __init__(self, num_threads=None, rtol=1.e-6, atol=1.e-8, max_dt=None, number_of_dimensions=None,
+                 shared_memory=False, chunk_size=None, backend='processes'):
+
+        RungeKuttaIntegrator.__init__(self, num_threads=num_threads, b=_dp_b.copy(), c=_dp_c[:-1].copy(), a=_dp_a.copy(),
+                                      number_of_dimensions=number_of_dimensions, shared_memory=shared_memory,
+                                      chunk_size=chunk_size, backend=backend)
+
+        if max_dt is None:
+            max_dt = np.inf
+
+        self.rtol = rtol
+        self.atol = atol
+        self.max_dt = max_dt
+        self._tolerances = (rtol, atol, max_dt)
+
+    def set_tolerances(self, rtol=None, atol=None, max_dt=None):
+        """Set the tolerances of the adaptive timestep integration and restart the integrator.
+
+        Parameters
+        ----------
+        rtol: None or float, optional
+            Relative tolerance of the local error. If `None`, does not change it.
+        atol: None or float, optional
+            Absolute tolerance of the local error. If `None`, does not change it.
+        max_dt: None or float, optional
+            Maximum timestep allowed. If `None`, does not change it.
+        """
+
+        if rtol is not None:
+            self.rtol = rtol
+        if atol is not None:
+            self.atol = atol
+        if max_dt is not None:
+            self.max_dt = max_dt
+        self._tolerances = (self.rtol, self.atol, self.max_dt)
+        self.start()
+
+
 class TrajectoryProcess(multiprocessing.Process):
     """:class:`RungeKuttaIntegrator`'s workers class. Allows to multi-thread time integration.
 
     .. _Runge-Kutta method: https://en.wikipedia.org/wiki/Runge%E2%80%93Kutta_methods
+    .. _Dormand-Prince method: https://en.wikipedia.org/wiki/Dormand%E2%80%93Prince_method
     .. _Numba: https://numba.pydata.org/
 
     Parameters
@@ -472,6 +720,13 @@ class TrajectoryProcess(multiprocessing.Process):
         Queue to which the worker ask for initial conditions and parameters input.
     traj_queue: multiprocessing.Queue
         Queue to which the worker returns the integration results.
+    tolerances: None or tuple(float), optional
+        Relative and absolute tolerances, and maximum timestep `(rtol, atol, max_dt)` of the adaptive timestep
+        `Dormand-Prince method`_. If `None`, integrate with the fixed timestep `Runge-Kutta method`_.
+        Default to `None`.
+    tensor_csr: None or tuple(~numpy.ndarray), optional
+        The tendencies tensor of `func` in compressed rows form. If provided, the fixed timestep integrations
+        are performed by the kernel cached on disk, and `func` is never compiled by the worker. Default to `None`.
 
     Attributes
     ----------
@@ -485,8 +740,12 @@ class TrajectoryProcess(multiprocessing.Process):
         Matrix of coefficients :math:`c_{i,j}` of the `Runge-Kutta method`_ .
     a: ~numpy.ndarray
         Vector of coefficients :math:`a_i` of the `Runge-Kutta method`_ .
+    tolerances: None or tuple(float)
+        Tolerances and maximum timestep of the adaptive timestep integration, or `None`.
+    tensor_csr: None or tuple(~numpy.ndarray)
+        The tendencies tensor of `func` in compressed rows form, or `None`.
     """
-    def __init__(self, processID, func, b, c, a, ics_queue, traj_queue):
+    def __init__(self, processID, func, b, c, a, ics_queue, traj_queue, tolerances=None, tensor_csr=None):
 
         super().__init__()
         self.processID = processID
@@ -496,6 +755,8 @@ class TrajectoryProcess(multiprocessing.Process):
         self.a = a
         self.b = b
         self.c = c
+        self.tolerances = tolerances
+        self.tensor_csr = tensor_csr
 
     def run(self):
         """Main worker computing routine. Perform the time integration with the fetched initial conditions and parameters."""
@@ -504,10 +765,21 @@ class TrajectoryProcess(multiprocessing.Process):
 
             args = self._ics_queue.get()
 
-            recorded_traj = _integrate_runge_kutta_jit(self.func, args[1], args[2][np.newaxis, :], args[3], args[4],
-                                                       self.b, self.c, self.a)
+            if isinstance(args[0], slice):
+                # shared memory mode: integrate a chunk of trajectories in place
+                chunk = args[0]
+                ic_shm, ic = _attach_shared_array(*args[2])
+                traj_shm, traj = _attach_shared_array(*args[3])
+                traj[chunk] = _integrate_trajectories(self.func, args[1], ic[chunk], args[4], args[5],
+                                                      self.b, self.c, self.a, self.tolerances, self.tensor_csr)
+                del ic, traj
+                ic_shm.close()
+                traj_shm.close()
+            else:
+                recorded_traj = _integrate_trajectories(self.func, args[1], args[2][np.newaxis, :], args[3], args[4],
+                                                        self.b, self.c, self.a, self.tolerances, self.tensor_csr)
 
-            self._traj_queue.put((args[0], recorded_traj))
+                self._traj_queue.put((args[0], recorded_traj))
 
             self._ics_queue.task_done()
 
@@ -551,11 +823,32 @@ class RungeKuttaTglsIntegrator(object):
     number_of_dimensions: None or int, optional
         Allow to hardcode the dynamical system dimension. If `None`, evaluate the dimension from the
         callable :attr:`func`. Default to `None`.
+    shared_memory: bool, optional
+        If `True`, the initial conditions and the recorded trajectories are stored in shared memory buffers
+        allocated once per integration, and the workers only receive chunks of trajectory indices.
+        Avoid the serialization of the trajectories through the queues. Default to `False`.
+    chunk_size: None or int, optional
+        Number of trajectories integrated by a worker at once in the shared memory mode or with the threads backend.
+        If `None`, split the trajectories evenly between the workers. Default to `None`.
+    backend: str, optional
+        The kind of workers to use:
+
+        * `'processes'`: persistent worker processes fed through queues (or shared memory).
+        * `'threads'`: a pool of threads calling the Numba-jitted kernels, which release the GIL.
+          The compiled code and the memory are shared by the workers, and no process is started.
+
+        Default to `'processes'`.
 
     Attributes
     ----------
     num_threads: int
         Number of :class:`TrajectoryProcess` workers (threads) to use.
+    shared_memory: bool
+        Whether the trajectories are exchanged with the workers through shared memory buffers.
+    chunk_size: None or int
+        Number of trajectories integrated by a worker at once in the shared memory mode or with the threads backend.
+    backend: str
+        The kind of workers used, `'processes'` or `'threads'`.
     b: ~numpy.ndarray
         Vector of coefficients :math:`b_i` of the `Runge-Kutta method`_ .
     c: ~numpy.ndarray
@@ -581,13 +874,21 @@ class RungeKuttaTglsIntegrator(object):
     func_jac: callable
         Last Jacobian matrix function :math:`\\boldsymbol{J}` used by the integrator to integrate.
     """
-    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None):
+    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None, shared_memory=False,
+                 chunk_size=None, backend='processes'):
 
         if num_threads is None:
             self.num_threads = multiprocessing.cpu_count()
         else:
             self.num_threads = num_threads
 
+        if backend not in _backends:
+            raise ValueError("Unknown backend '" + str(backend) + "'. Should be one of " + str(_backends) + ".")
+
+        self.shared_memory = shared_memory
+        self.chunk_size = chunk_size
+        self.backend = backend
+
         # Default is RK4
         if a is None and b is None and c is None:
             self.c = np.array([0., 0.5, 0.5, 1.])
@@ -624,6 +925,7 @@ class RungeKuttaTglsIntegrator(object):
         self._traj_queue = None
 
         self._processes_list = list()
+        self._executor = None
 
     def terminate(self):
         """Stop the workers (threads) and release the resources of the integrator."""
@@ -633,6 +935,10 @@ class RungeKuttaTglsIntegrator(object):
             process.terminate()
             process.join()
 
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def start(self):
         """Start or restart the workers (threads) of the integrator.
 
@@ -645,6 +951,11 @@ class RungeKuttaTglsIntegrator(object):
         self.terminate()
 
         self._processes_list = list()
+
+        if self.backend == 'threads':
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            return
+
         self._ics_queue = multiprocessing.JoinableQueue()
         self._traj_queue = multiprocessing.Queue()
 
@@ -979,19 +1290,24 @@ class RungeKuttaTglsIntegrator(object):
             if tot[-1] != self._time[-1]:
                 self.n_records += 1
 
-        self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
-        self._recorded_fmatrix = np.zeros((self.n_traj, self.tg_ic.shape[1], self.tg_ic.shape[2], self.n_records))
+        if self.backend == 'threads':
+            self._integrate_threads()
+        elif self.shared_memory:
+            self._integrate_shared()
+        else:
+            self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
+            self._recorded_fmatrix = np.zeros((self.n_traj, self.tg_ic.shape[1], self.tg_ic.shape[2], self.n_records))
 
-        for i in range(self.n_traj):
-            self._ics_queue.put((i, self._time, self.ic[i], self.tg_ic[i], self._time_direction, self._write_steps,
-                                 self._adjoint, self._inverse, self._boundary))
+            for i in range(self.n_traj):
+                self._ics_queue.put((i, self._time, self.ic[i], self.tg_ic[i], self._time_direction, self._write_steps,
+                                     self._adjoint, self._inverse, self._boundary))
 
-        self._ics_queue.join()
+            self._ics_queue.join()
 
-        for i in range(self.n_traj):
-            args = self._traj_queue.get()
-            self._recorded_traj[args[0]] = args[1]
-            self._recorded_fmatrix[args[0]] = args[2]
+            for i in range(self.n_traj):
+                args = self._traj_queue.get()
+                self._recorded_traj[args[0]] = args[1]
+                self._recorded_fmatrix[args[0]] = args[2]
 
         if len(tg_ic_sav.shape) == 2:
             if self._recorded_fmatrix.shape[1:3] != tg_ic_sav.shape:
@@ -1002,6 +1318,42 @@ class RungeKuttaTglsIntegrator(object):
                 if self._recorded_fmatrix.shape[:3] != tg_ic_sav.shape:
                     self._recorded_fmatrix = np.swapaxes(self._recorded_fmatrix, 1, 2)
 
+    def _integrate_threads(self):
+        # the threads write directly their chunk of trajectories in the result arrays
+        self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
+        self._recorded_fmatrix = np.zeros((self.n_traj, self.tg_ic.shape[1], self.tg_ic.shape[2], self.n_records))
+
+        def integrate_chunk(chunk):
+            self._recorded_traj[chunk], self._recorded_fmatrix[chunk] = \
+                _integrate_runge_kutta_tgls_jit(self.func, self.func_jac, self._time, self.ic[chunk], self.tg_ic[chunk],
+                                                self._time_direction, self._write_steps, self.b, self.c, self.a,
+                                                self._adjoint, self._inverse, self._boundary)
+
+        _run_threads(self._executor, integrate_chunk, _chunks(self.n_traj, self.num_threads, self.chunk_size))
+
+    def _integrate_shared(self):
+        # initial conditions and trajectories are exchanged through shared memory, the workers only get index ranges
+        ic_shm, ic = _create_shared_array((self.n_traj, self.n_dim))
+        tg_ic_shm, tg_ic = _create_shared_array(self.tg_ic.shape)
+        traj_shm, traj = _create_shared_array((self.n_traj, self.n_dim, self.n_records))
+        fmatrix_shm, fmatrix = _create_shared_array((self.n_traj, self.tg_ic.shape[1], self.tg_ic.shape[2],
+                                                     self.n_records))
+        try:
+            ic[...] = self.ic
+            tg_ic[...] = self.tg_ic
+            for chunk in _chunks(self.n_traj, self.num_threads, self.chunk_size):
+                self._ics_queue.put((chunk, self._time, (ic_shm.name, ic.shape), (tg_ic_shm.name, tg_ic.shape),
+                                     (traj_shm.name, traj.shape), (fmatrix_shm.name, fmatrix.shape),
+                                     self._time_direction, self._write_steps, self._adjoint, self._inverse,
+                                     self._boundary))
+
+            self._ics_queue.join()
+            self._recorded_traj = traj.copy()
+            self._recorded_fmatrix = fmatrix.copy()
+        finally:
+            del ic, tg_ic, traj, fmatrix
+            _release_shared_memory(ic_shm, tg_ic_shm, traj_shm, fmatrix_shm)
+
     def get_trajectories(self):
         """Returns the result of the previous integrator integration.
 
@@ -1157,16 +1509,73 @@ class TglsTrajectoryProcess(multiprocessing.Process):
 
             args = self._ics_queue.get()
 
-            recorded_traj, recorded_fmatrix = _integrate_runge_kutta_tgls_jit(self.func, self.func_jac, args[1], args[2][np.newaxis, ...],
-                                                                              args[3][np.newaxis, ...], args[4], args[5],
+            if isinstance(args[0], slice):
+                # shared memory mode: integrate a chunk of trajectories in place
+                chunk = args[0]
+                shms, arrays = zip(*[_attach_shared_array(*buf) for buf in args[2:6]])
+                ic, tg_ic, traj, fmatrix = arrays
+                traj[chunk], fmatrix[chunk] = _integrate_runge_kutta_tgls_jit(self.func, self.func_jac, args[1],
+                                                                              ic[chunk], tg_ic[chunk], args[6], args[7],
                                                                               self.b, self.c, self.a,
-                                                                              args[6], args[7], args[8])
+                                                                              args[8], args[9], args[10])
+                del arrays, ic, tg_ic, traj, fmatrix
+                for shm in shms:
+                    shm.close()
+            else:
+                recorded_traj, recorded_fmatrix = _integrate_runge_kutta_tgls_jit(self.func, self.func_jac, args[1], args[2][np.newaxis, ...],
+                                                                                  args[3][np.newaxis, ...], args[4], args[5],
+                                                                                  self.b, self.c, self.a,
+                                                                                  args[6], args[7], args[8])
 
-            self._traj_queue.put((args[0], recorded_traj, recorded_fmatrix))
+                self._traj_queue.put((args[0], recorded_traj, recorded_fmatrix))
 
             self._ics_queue.task_done()
 
 
+_backends = ('processes', 'threads')
+
+
+def _integrate_trajectories(f, time, ic, time_direction, write_steps, b, c, a, tolerances, tensor_csr=None):
+    # fixed or adaptive timestep integration of a set of trajectories
+    if tolerances is None:
+        if tensor_csr is not None:
+            return _integrate_runge_kutta_csr_jit(*tensor_csr, time, ic, time_direction, write_steps, b, c, a)
+        return _integrate_runge_kutta_jit(f, time, ic, time_direction, write_steps, b, c, a)
+    else:
+        return _integrate_dormand_prince_jit(f, time, ic, time_direction, write_steps, *tolerances)
+
+
+def _run_threads(executor, func, chunks):
+    # wait for all the chunks, re-raising the first exception raised in a thread
+    futures = [executor.submit(func, chunk) for chunk in chunks]
+    for future in futures:
+        future.result()
+
+
+def _create_shared_array(shape):
+    shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)), 1) * np.dtype(np.float64).itemsize)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def _attach_shared_array(name, shape):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+
+
+def _release_shared_memory(*shms):
+    for shm in shms:
+        shm.close()
+        shm.unlink()
+
+
+def _chunks(n, num_workers, chunk_size=None):
+    # split the range of n trajectories into slices, by default one per worker
+    if chunk_size is None:
+        chunk_size = -(-n // max(num_workers, 1))
+    chunk_size = max(chunk_size, 1)
+    return [slice(i, min(i + chunk_size, n)) for i in range(0, n, chunk_size)]
+
+
 if __name__ == "__main__":
 
     import matplotlib.pyplot as plt
@@ -0,0 +1,170 @@
+"""
+    Trajectory module
+    =================
+
+    Module to stream long trajectories to the disk, chunk by chunk, and to read them back.
+
+    The trajectories are stored in `npy`_ files, as a 2D array of shape (`n_records`, `n_dim` + 1), each row
+    containing the time followed by the state of the system at this time (the same layout as the text files
+    previously written with :func:`numpy.savetxt`). The file is a valid `npy`_ file after each chunk written, and
+    can thus be loaded with :func:`numpy.load` (possibly memory-mapped) or with :func:`load_trajectory`.
+
+    .. _npy: https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html
+
+    Description of the module classes and functions
+    -----------------------------------------------
+
+    * :class:`TrajectoryWriter`
+    * :func:`load_trajectory`
+
+"""
+
+import numpy as np
+
+# size reserved for the npy header, such that it can be rewritten in place when the number of records grows
+_header_size = 128
+
+
+class TrajectoryWriter(object):
+    """Class to write a trajectory to a `npy`_ file by appending fixed-size chunks of records.
+
+    The records are accumulated in a buffer of `chunk_size` rows, which is written at the end of the file
+    when full. The file is never read nor copied back, such that the cost of writing is linear in the number of
+    records.
+
+    .. _npy: https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html
+
+    Parameters
+    ----------
+    filename: str or ~pathlib.Path
+        The file to write. Overwritten if it exists.
+    n_dim: int
+        Dynamical system dimension.
+    dtype: ~numpy.dtype, optional
+        The type of the stored data. Use `numpy.float32` to halve the size of the file. Note that the time is stored
+        with the same type. Default to `numpy.float64`.
+    chunk_size: int, optional
+        Number of records written to the file at once. Default to 1024.
+
+    Attributes
+    ----------
+    filename: str or ~pathlib.Path
+        The file being written.
+    n_dim: int
+        Dynamical system dimension.
+    dtype: ~numpy.dtype
+        The type of the stored data.
+    chunk_size: int
+        Number of records written to the file at once.
+    n_records: int
+        Number of records appended so far.
+
+    Examples
+    --------
+
+    >>> with TrajectoryWriter("evol_fields.npy", model_parameters.ndim) as writer:
+    ...     while total_time < integration_time:
+    ...         integrator.integrate(0., write_steps * dt, dt, ic=y, write_steps=0)
+    ...         t, y = integrator.get_trajectories()
+    ...         total_time += t
+    ...         writer.append(total_time, y)
+    >>> time, traj = load_trajectory("evol_fields.npy")
+    """
+
+    def __init__(self, filename, n_dim, dtype=np.float64, chunk_size=1024):
+
+        self.filename = filename
+        self.n_dim = n_dim
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.n_records = 0
+
+        self._buffer = np.zeros((chunk_size, n_dim + 1), dtype=self.dtype)
+        self._n_buffered = 0
+        self._n_written = 0
+        self._file = open(filename, 'w+b')
+        self._write_header()
+
+    def _write_header(self):
+        header = "{'descr': " + repr(np.lib.format.dtype_to_descr(self.dtype)) + ", 'fortran_order': False, " \
+                 + "'shape': (" + str(self._n_written) + ", " + str(self.n_dim + 1) + "), }"
+        # magic string, version 1.0 and header length take 10 bytes, the header ends with a newline
+        header = header.ljust(_header_size - 11) + "\n"
+        self._file.seek(0)
+        self._file.write(np.lib.format.magic(1, 0) + np.uint16(len(header)).tobytes() + header.encode('latin1'))
+        self._file.seek(0, 2)
+
+    def append(self, time, state):
+        """Append records to the trajectory.
+
+        Parameters
+        ----------
+        time: float or ~numpy.ndarray
+            The time of the record(s). A float or an array of shape (`n`,).
+        state: ~numpy.ndarray
+            The state(s) of the system at this time. An array of shape (`n_dim`,) or of shape (`n_dim`, `n`),
+            like the trajectories returned by the integrators.
+        """
+        time = np.atleast_1d(time)
+        state = np.asarray(state)
+        if state.ndim == 1:
+            state = state[:, np.newaxis]
+
+        n = len(time)
+        i = 0
+        while i < n:
+            m = min(n - i, self.chunk_size - self._n_buffered)
+            self._buffer[self._n_buffered:self._n_buffered + m, 0] = time[i:i + m]
+            self._buffer[self._n_buffered:self._n_buffered + m, 1:] = state[:, i:i + m].T
+            self._n_buffered += m
+            i += m
+            if self._n_buffered == self.chunk_size:
+                self.flush()
+
+        self.n_records += n
+
+    def flush(self):
+        """Write the buffered records to the file."""
+        if self._n_buffered > 0:
+            self._file.write(self._buffer[:self._n_buffered].tobytes())
+            self._n_written += self._n_buffered
+            self._n_buffered = 0
+            self._write_header()
+        self._file.flush()
+
+    def close(self):
+        """Write the remaining buffered records and close the file."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_trajectory(filename, mmap_mode='r'):
+    """Load a trajectory written by a :class:`TrajectoryWriter`.
+
+    Parameters
+    ----------
+    filename: str or ~pathlib.Path
+        The file to load.
+    mmap_mode: None or str, optional
+        Memory-map mode of the file, see :func:`numpy.load`. If `None`, the whole trajectory is read in memory.
+        Default to `'r'`, i.e. the trajectory is memory-mapped read-only.
+
+    Returns
+    -------
+    time, traj: ~numpy.ndarray
+        The trajectory:
+
+        * **time:** Time of the records. Array of shape (`n_records`,).
+        * **traj:** States of the system. Array of shape (`n_dim`, `n_records`).
+
+        Both arrays are views of the memory-mapped file if `mmap_mode` is not `None`.
+    """
+    data = np.load(filename, mmap_mode=mmap_mode)
+    return data[:, 0], data[:, 1:].T
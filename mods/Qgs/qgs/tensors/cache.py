@@ -0,0 +1,184 @@
+"""
+    Tensor cache module
+    ===================
+
+    This module provides a persistent on-disk cache of the tendencies tensors :class:`~.tensors.qgtensor.QgsTensor`.
+
+    The tensors are stored in `npz` files named after a hash of the model's configuration (see :func:`configuration_key`),
+    such that a model already built once (in any process) can be loaded instead of recomputing its inner products
+    and tensor. The cache has a maximum size, above which the least recently used tensors are removed.
+
+    Description of the classes
+    --------------------------
+
+    * :class:`TensorCache`
+
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import sparse as sp
+
+from dapper.dpr_config import rc
+from dapper.mods.Qgs.qgs.tensors.qgtensor import QgsTensor
+
+# Increase when the tensor computation changes, to invalidate the previously cached tensors
+_cache_version = 1
+
+
+def configuration_key(params):
+    """Compute the key identifying the tendencies tensor of a model configuration.
+
+    The key is a hash of all the parameters values, of the spectral blocks (analytic inner products)
+    or of the symbolic basis functions (symbolic inner products) of each component of the model.
+
+    Parameters
+    ----------
+    params: QgParams
+        The parameters fully specifying the model configuration.
+
+    Returns
+    -------
+    str
+        The hexadecimal key.
+    """
+    s = "qgs tensor v" + str(_cache_version) + "\n"
+    s += params._list_params() + "\n"
+    for key in ['scale_params', 'atmospheric_params', 'atemperature_params', 'oceanic_params',
+                'ground_params', 'gotemperature_params']:
+        p = getattr(params, key, None)
+        if p is not None:
+            s += p._list_params() + "\n"
+
+    for name, blocks, basis in [('atmosphere', params.ablocks, params.atmospheric_basis),
+                                ('ocean', params.oblocks, params.oceanic_basis),
+                                ('ground', params.gblocks, params.ground_basis)]:
+        if blocks is not None:
+            s += name + " analytic: " + str(np.asarray(blocks).tolist()) + "\n"
+        elif basis is not None:
+            s += name + " symbolic: " + str(basis) + " " + str(getattr(basis, 'substitutions', '')) + "\n"
+
+    return hashlib.sha1(s.encode()).hexdigest()
+
+
+class TensorCache(object):
+    """Persistent on-disk cache of tendencies tensors, indexed by model configuration.
+
+    Parameters
+    ----------
+    directory: None or str or ~pathlib.Path, optional
+        The folder where to store the tensors. If `None`, use the `qgs_cache` subfolder of the DAPPER data folder.
+        Default to `None`.
+    max_size: int, optional
+        Maximum size of the cache in bytes. Default to 1 GB.
+
+    Attributes
+    ----------
+    directory: ~pathlib.Path
+        The folder where the tensors are stored.
+    max_size: int
+        Maximum size of the cache in bytes.
+    """
+
+    def __init__(self, directory=None, max_size=2**30):
+
+        if directory is None:
+            directory = rc.dirs.data / "qgs_cache"
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def filename(self, key):
+        """Return the file where the tensor with key `key` is stored."""
+        return self.directory / (key + ".npz")
+
+    def load(self, params):
+        """Load the tendencies tensor of a model configuration, if it is available in the cache.
+
+        Parameters
+        ----------
+        params: QgParams
+            The parameters fully specifying the model configuration.
+
+        Returns
+        -------
+        None or QgsTensor
+            The tensor, without its inner products. `None` if not in the cache.
+        """
+        filename = self.filename(configuration_key(params))
+        try:
+            with np.load(filename) as data:
+                shape = tuple(data['shape'])
+                tensor = sp.COO(data['coords'].astype(np.int64), data['data'], shape=shape)
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+
+        qgtensor = QgsTensor(params)
+        qgtensor.tensor = tensor
+        qgtensor.jacobian_tensor = tensor + tensor.transpose((0, 2, 1))
+        return qgtensor
+
+    def save(self, qgtensor):
+        """Store the tendencies tensor of a model configuration in the cache.
+
+        Parameters
+        ----------
+        qgtensor: QgsTensor
+            The tensor to store. Its attribute :attr:`~.QgsTensor.params` is used to identify it.
+        """
+        tensor = qgtensor.tensor
+        nz = tensor.data != 0.
+        coords = tensor.coords[:, nz]
+        coords = coords.astype(np.min_scalar_type(max(tensor.shape)))
+
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.filename(configuration_key(qgtensor.params))
+        # write then rename, such that concurrent processes never read a partial file
+        fd, tmp = tempfile.mkstemp(suffix=".npz", dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, coords=coords, data=tensor.data[nz], shape=np.array(tensor.shape))
+            os.replace(tmp, filename)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return
+
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used tensors until the cache size is below :attr:`max_size`."""
+        files = list()
+        for f in self.directory.glob("*.npz"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+
+        files.sort()
+        size = sum(s for _, s, _ in files)
+        for _, s, f in files:
+            if size <= self.max_size:
+                break
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            size -= s
+
+    def clear(self):
+        """Remove all the tensors from the cache."""
+        for f in self.directory.glob("*.npz"):
+            try:
+                f.unlink()
+            except OSError:
+                pass
@@ -8,6 +8,7 @@
 import numpy as np
 import sparse as sp
 import pickle
+from collections import defaultdict
 
 
 class QgsTensor(object):
@@ -26,6 +27,15 @@ class QgsTensor(object):
     ground_inner_products: None or GroundInnerProducts, optional
         The inner products of the ground basis functions on which the model's PDE ground equations are projected.
         If None, disable the ground tendencies. Default to `None`.
+    vectorized: bool, optional
+        If `True`, compute the tensor from the stored inner products with array contractions, one row of the tensor
+        at a time. If `False`, compute it with the element-by-element loops, kept as a reference.
+        Only used if the inner products are stored. Default to `True`.
+    affine: bool, optional
+        If `True`, keep the decomposition of the tensor as a sum of parameter-independent tensors weighted by the
+        parameters (see :attr:`affine_tensor`), such that the tensor can be updated for new parameters values with
+        :meth:`reparameterize`, without recomputing the inner products. Requires the vectorized computation of the
+        tensor. Default to `False`.
 
     Attributes
     ----------
@@ -40,21 +50,44 @@ class QgsTensor(object):
     ground_inner_products: None or GroundInnerProducts
         The inner products of the ground basis functions on which the model's PDE ground equations are projected.
         If None, disable the ground tendencies. Default to `None`.
+    vectorized: bool
+        Whether the tensor is computed with array contractions or with the element-by-element loops.
+    affine: bool
+        Whether the decomposition of the tensor as a sum of parameter-independent tensors is kept.
     tensor: sparse.COO(float)
         The tensor :math:`\mathcal{T}_{i,j,k}` :math:`i`-th components.
     jacobian_tensor: sparse.COO(float)
         The jacobian tensor :math:`\mathcal{T}_{i,j,k} + \mathcal{T}_{i,k,j}` :math:`i`-th components.
+    tensor_csr: tuple(~numpy.ndarray)
+        The tensor :math:`\mathcal{T}_{i,j,k}` in compressed rows form. See :meth:`compress_rows`.
+    affine_parameters: None or list(str)
+        If `affine` is `True`, the names of the parameters :math:`p_m` weighting the parameter-independent tensors,
+        see :func:`affine_parameters_values`. `None` otherwise.
+    affine_tensor: None or sparse.COO(float)
+        If `affine` is `True`, the parameter-independent tensors :math:`\mathcal{B}_{m,i,j,k}` such that
+        :math:`\mathcal{T}_{i,j,k} = \sum_m p_m \, \mathcal{B}_{m,i,j,k}`, stacked in a 4D tensor. `None` otherwise.
+    affine_csr: None or tuple(~numpy.ndarray)
+        If `affine` is `True`, the parameter-independent tensors in compressed rows form.
+        See :meth:`compress_rows_affine`. `None` otherwise.
     """
 
-    def __init__(self, params=None, atmospheric_inner_products=None, oceanic_inner_products=None, ground_inner_products=None):
+    def __init__(self, params=None, atmospheric_inner_products=None, oceanic_inner_products=None, ground_inner_products=None,
+                 vectorized=True, affine=False):
 
         self.atmospheric_inner_products = atmospheric_inner_products
         self.oceanic_inner_products = oceanic_inner_products
         self.ground_inner_products = ground_inner_products
         self.params = params
+        self.vectorized = vectorized
+        self.affine = affine
 
         self.tensor = None
         self.jacobian_tensor = None
+        self._tensor_csr = None
+        self.affine_parameters = None
+        self.affine_tensor = None
+        self._affine_csr = None
+        self._affine_structure = None
 
         self.compute_tensor()
 
@@ -136,6 +169,9 @@ class QgsTensor(object):
     def compute_tensor(self):
         """Routine to compute the tensor."""
 
+        self._tensor_csr = None
+        self._affine_csr = None
+
         if self.params is None:
             return
 
@@ -167,6 +203,14 @@ class QgsTensor(object):
         else:
             ground_temp = False
 
+        if self.vectorized and aips is not None and aips.stored and (bips is None or bips.stored):
+            self._compute_tensor_vectorized()
+            return
+
+        if self.affine:
+            raise ValueError("The parameter-affine tensor requires the vectorized computation of the tensor "
+                             "and stored inner products.")
+
         # 0-th tensor component is an empty matrix
         tensor = sp.zeros((ndim+1, ndim + 1, ndim + 1), dtype=np.float64, format='dok')
         jacobian_tensor = sp.zeros((ndim+1, ndim + 1, ndim + 1), dtype=np.float64, format='dok')
@@ -591,6 +635,396 @@ class QgsTensor(object):
             self.tensor = tensor.to_coo()
             self.jacobian_tensor = jacobian_tensor.to_coo()
 
+    def _compute_tensor_vectorized(self):
+        """Routine to compute the tensor from the stored inner products, with array contractions.
+        Gives the same tensor as the element-by-element loops of :meth:`compute_tensor`.
+
+        The tensor is first computed as a sum of parameter-independent tensors weighted by the parameters
+        (see :meth:`_compute_affine_tensor`), and then assembled for the current parameters."""
+
+        affine_parameters, affine_tensor = self._compute_affine_tensor()
+        if self.affine:
+            self.affine_parameters = affine_parameters
+            self.affine_tensor = affine_tensor
+            self._affine_structure = _affine_structure(self.params, self.oceanic_inner_products is not None)
+        values = affine_parameters_values(self.params)
+        self._assemble_tensor(affine_tensor, np.array([values[name] for name in affine_parameters]))
+
+    def _compute_affine_tensor(self):
+        """Routine to compute the decomposition of the tensor as a sum of parameter-independent tensors
+        :math:`\mathcal{B}_{m,i,j,k}` weighted by the parameters :math:`p_m`:
+
+        .. math:: \mathcal{T}_{i,j,k} = {\displaystyle \sum_m} \, p_m \, \mathcal{B}_{m,i,j,k}
+
+        Returns
+        -------
+        affine_parameters: list(str)
+            The names of the parameters :math:`p_m`, see :func:`affine_parameters_values`.
+        affine_tensor: sparse.COO(float)
+            The 4D tensor :math:`\mathcal{B}_{m,i,j,k}`.
+        """
+
+        aips = self.atmospheric_inner_products
+        par = self.params
+        ap = par.atmospheric_params
+        gp = par.ground_params
+        namod = par.nmod[0]
+        ngomod = par.nmod[1]
+        ndim = par.ndim
+
+        ocean = self.oceanic_inner_products is not None
+        ground_temp = self.ground_inner_products is not None
+        if ocean:
+            bips = self.oceanic_inner_products
+        elif ground_temp:
+            bips = self.ground_inner_products
+        else:
+            bips = None
+
+        # slices of the variables in the tensor components
+        psi_a = slice(1, namod + 1)
+        theta_a = slice(namod + 1, 2 * namod + 1)
+        psi_o = slice(2 * namod + 1, 2 * namod + ngomod + 1)
+        deltaT_o = slice(2 * namod + ngomod + 1, 2 * namod + 2 * ngomod + 1)
+        deltaT_g = slice(2 * namod + 1, 2 * namod + ngomod + 1)
+
+        a = _to_dense(aips._a)
+        u = _to_dense(aips._u)
+        c = _to_dense(aips._c)
+        b = _to_dense(aips._b)
+        g = _to_dense(aips._g)
+
+        a_inv = np.linalg.inv(a)
+        a_theta = np.linalg.inv(ap.sig0 * a - u)
+
+        oro = gp is not None and gp.hk is not None
+        if oro:
+            if gp.orographic_basis == "atmospheric":
+                gh = g
+            else:
+                gh = _to_dense(aips._gh)
+
+        if bips is not None:
+            U_inv = np.linalg.inv(_to_dense(bips._U))
+            W = _to_dense(bips._W)
+
+        terms = _AffineTerms(ndim)
+
+        # psi_a part
+        a_inv_c = a_inv @ c
+        a_inv_b = np.tensordot(a_inv, b, axes=1)
+        if oro:
+            a_inv_oro = np.tensordot(a_inv, gh, axes=1)
+        if ocean:
+            a_inv_d = a_inv @ _to_dense(aips._d)
+
+        for i in range(namod):
+            row = self._psi_a(i + 1)
+            delta = np.eye(namod)[i]
+
+            terms.add('beta', row, psi_a, 0, - a_inv_c[i])
+            terms.add('kd', row, psi_a, 0, - delta / 2)
+            terms.add('kd', row, theta_a, 0, delta / 2)
+
+            if oro:
+                for l in range(len(gp.hk)):
+                    terms.add('hk[' + str(l) + ']', row, psi_a, 0, - a_inv_oro[i, :, l] / 2)
+                    terms.add('hk[' + str(l) + ']', row, theta_a, 0, a_inv_oro[i, :, l] / 2)
+
+            terms.add('const', row, psi_a, psi_a, - a_inv_b[i])
+            terms.add('const', row, theta_a, theta_a, - a_inv_b[i])
+
+            if ocean:
+                terms.add('kd', row, psi_o, 0, a_inv_d[i] / 2)
+
+
+        # theta_a part
+        a_theta_a = a_theta @ a
+        a_theta_c = a_theta @ c
+        a_theta_u = a_theta @ u
+        a_theta_b = np.tensordot(a_theta, b, axes=1)
+        a_theta_g = np.tensordot(a_theta, g, axes=1)
+        if oro:
+            a_theta_oro = np.tensordot(a_theta, gh, axes=1)
+        if ocean:
+            a_theta_d = a_theta @ _to_dense(aips._d)
+        if ocean or ground_temp:
+            a_theta_s = a_theta @ _to_dense(aips._s)
+
+        for i in range(namod):
+            row = self._theta_a(i + 1)
+
+            for l in range(namod):
+                terms.add('Cpa[' + str(l) + ']', row, 0, 0, - a_theta_u[i, l])
+                terms.add('hd*thetas[' + str(l) + ']', row, 0, 0, - a_theta_u[i, l])
+
+            terms.add('kd', row, psi_a, 0, a_theta_a[i] * ap.sig0 / 2)
+            terms.add('kd', row, theta_a, 0, - a_theta_a[i] * ap.sig0 / 2)
+            terms.add('kdp', row, theta_a, 0, - a_theta_a[i] * 2 * ap.sig0)
+            terms.add('beta', row, theta_a, 0, - a_theta_c[i] * ap.sig0)
+
+            terms.add('LSBpa', row, theta_a, 0, a_theta_u[i])
+            terms.add('sc*Lpa', row, theta_a, 0, a_theta_u[i])
+            terms.add('hd', row, theta_a, 0, a_theta_u[i])
+
+            if oro:
+                for l in range(len(gp.hk)):
+                    terms.add('hk[' + str(l) + ']', row, theta_a, 0, - ap.sig0 * a_theta_oro[i, :, l] / 2)
+                    terms.add('hk[' + str(l) + ']', row, psi_a, 0, ap.sig0 * a_theta_oro[i, :, l] / 2)
+
+            terms.add('const', row, psi_a, theta_a, - a_theta_b[i] * ap.sig0 + a_theta_g[i])
+            terms.add('const', row, theta_a, psi_a, - a_theta_b[i] * ap.sig0)
+
+            if ocean:
+                terms.add('kd', row, psi_o, 0, - a_theta_d[i] * ap.sig0 / 2)
+                terms.add('LSBpgo', row, deltaT_o, 0, - a_theta_s[i])
+                terms.add('Lpa', row, deltaT_o, 0, - a_theta_s[i] / 2)
+
+            if ground_temp:
+                terms.add('LSBpgo', row, deltaT_g, 0, - a_theta_s[i])
+                terms.add('Lpa', row, deltaT_g, 0, - a_theta_s[i] / 2)
+
+
+        if ocean:
+            M = _to_dense(bips._M)
+            M_psio = np.linalg.inv(M + par.G * _to_dense(bips._U))
+
+            # psi_o part
+            M_psio_K = M_psio @ _to_dense(bips._K)
+            M_psio_N = M_psio @ _to_dense(bips._N)
+            M_psio_M = M_psio @ M
+            M_psio_C = np.tensordot(M_psio, _to_dense(bips._C), axes=1)
+
+            for i in range(ngomod):
+                row = self._psi_o(i + 1)
+
+                terms.add('d', row, psi_a, 0, M_psio_K[i])
+                terms.add('d', row, theta_a, 0, - M_psio_K[i])
+
+                terms.add('beta', row, psi_o, 0, - M_psio_N[i])
+                terms.add('r', row, psi_o, 0, - M_psio_M[i])
+                terms.add('d', row, psi_o, 0, - M_psio_M[i])
+
+                terms.add('const', row, psi_o, psi_o, - M_psio_C[i])
+
+
+            # deltaT_o part
+            U_inv_W = U_inv @ W
+            U_inv_O = np.tensordot(U_inv, _to_dense(bips._O), axes=1)
+
+            for i in range(ngomod):
+                row = self._deltaT_o(i + 1)
+
+                for l in range(ngomod):
+                    terms.add('Cpgo[' + str(l) + ']', row, 0, 0, W[i, l])
+                terms.add('sc*Lpgo', row, theta_a, 0, U_inv_W[i] * 2)
+                terms.add('sbpa', row, theta_a, 0, U_inv_W[i])
+                terms.add('Lpgo', row, deltaT_o, 0, - np.eye(ngomod)[i])
+                terms.add('sbpgo', row, deltaT_o, 0, - np.eye(ngomod)[i])
+                terms.add('const', row, psi_o, deltaT_o, - U_inv_O[i])
+
+
+        # deltaT_g part
+        if ground_temp:
+            U_inv_W = U_inv @ W
+
+            for i in range(ngomod):
+                row = self._deltaT_g(i + 1)
+
+                for l in range(ngomod):
+                    terms.add('Cpgo[' + str(l) + ']', row, 0, 0, W[i, l])
+                terms.add('sc*Lpgo', row, theta_a, 0, U_inv_W[i] * 2)
+                terms.add('sbpa', row, theta_a, 0, U_inv_W[i])
+                terms.add('Lpgo', row, deltaT_g, 0, - np.eye(ngomod)[i])
+                terms.add('sbpgo', row, deltaT_g, 0, - np.eye(ngomod)[i])
+
+
+        return terms.parameters, terms.to_coo()
+
+    def _assemble_tensor(self, affine_tensor, p):
+        # sum of the parameter-independent tensors weighted by the parameters
+        data = affine_tensor.data * p[affine_tensor.coords[0]]
+        nz = data != 0.
+        self.tensor = sp.COO(affine_tensor.coords[1:, nz], data[nz], shape=affine_tensor.shape[1:])
+        self.jacobian_tensor = self.tensor + self.tensor.transpose((0, 2, 1))
+        self._tensor_csr = None
+
+    @property
+    def tensor_csr(self):
+        """tuple(~numpy.ndarray): The tensor :math:`\mathcal{T}_{i,j,k}` in compressed rows form
+        `(indptr, jk, data)`, computed with :meth:`compress_rows` at the first access.
+        `None` for an empty tensor."""
+        if getattr(self, '_tensor_csr', None) is None and self.tensor is not None:
+            self._tensor_csr = self.compress_rows(self.tensor)
+        return getattr(self, '_tensor_csr', None)
+
+    @staticmethod
+    def compress_rows(tensor):
+        """Routine that converts a 3D tensor :math:`\mathcal{T}_{i,j,k}` to a compressed rows (CSR-like) form,
+        sorted by :math:`i`, then :math:`j` and :math:`k`.
+
+        Since the tensor is contracted twice with the same vector, only the symmetric part in :math:`(j, k)`
+        matters. The entries are thus folded to the upper-triangular part :math:`j \leq k`
+        (like :meth:`simplify_matrix` does), the duplicates are summed and the zeros are dropped.
+
+        Parameters
+        ----------
+        tensor: sparse.COO(float)
+            The 3D tensor to compress.
+
+        Returns
+        -------
+        indptr: ~numpy.ndarray(int)
+            A 1D array of shape (`tensor.shape[0]` + 1,). The entries of the row :math:`i` of the tensor are
+            stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` and `data` arrays.
+        jk: ~numpy.ndarray(int)
+            A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each entry.
+        data: ~numpy.ndarray(float)
+            A 1D array of shape (n_elems,), the values of the entries.
+        """
+        n_rows, n_j, n_k = tensor.shape
+        i = tensor.coords[0]
+        j = np.minimum(tensor.coords[1], tensor.coords[2])
+        k = np.maximum(tensor.coords[1], tensor.coords[2])
+
+        lin = (i * n_j + j) * n_k + k
+        lin, inverse = np.unique(lin, return_inverse=True)
+        data = np.zeros(len(lin), dtype=np.float64)
+        np.add.at(data, inverse.ravel(), tensor.data)
+
+        nz = data != 0.
+        lin = lin[nz]
+        data = data[nz]
+
+        i, jk = np.divmod(lin, n_j * n_k)
+        jk = np.stack(np.divmod(jk, n_k), axis=1)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(i, minlength=n_rows), out=indptr[1:])
+
+        return indptr, np.ascontiguousarray(jk, dtype=np.int64), data
+
+    @property
+    def affine_csr(self):
+        """tuple(~numpy.ndarray): The parameter-independent tensors :attr:`affine_tensor` in compressed rows form
+        `(indptr, jk, coeff_indptr, coeff_param, coeff_data)`, computed with :meth:`compress_rows_affine` at the
+        first access. `None` if the tensor is not parameter-affine."""
+        if getattr(self, '_affine_csr', None) is None and getattr(self, 'affine_tensor', None) is not None:
+            self._affine_csr = self.compress_rows_affine(self.affine_tensor)
+        return getattr(self, '_affine_csr', None)
+
+    @staticmethod
+    def compress_rows_affine(affine_tensor):
+        """Routine that converts the 4D tensor :math:`\mathcal{B}_{m,i,j,k}` of a parameter-affine tensor
+        :math:`\mathcal{T}_{i,j,k} = \sum_m p_m \, \mathcal{B}_{m,i,j,k}` to a compressed rows form.
+
+        The entries :math:`(i, j, k)` of all the tensors :math:`\mathcal{B}_{m}` are folded to :math:`j \leq k` and
+        gathered in the same compressed rows structure as the one given by :meth:`compress_rows`. The value of each
+        entry is then itself given in compressed form, as the list of its nonzero coefficients :math:`\mathcal{B}_{m,i,j,k}`
+        and of the corresponding parameters :math:`m`.
+
+        Parameters
+        ----------
+        affine_tensor: sparse.COO(float)
+            The 4D tensor to compress.
+
+        Returns
+        -------
+        indptr: ~numpy.ndarray(int)
+            A 1D array of shape (`affine_tensor.shape[1]` + 1,). The entries of the row :math:`i` of the tensor are
+            stored at the positions `indptr[i]` to `indptr[i+1]` of the `jk` array.
+        jk: ~numpy.ndarray(int)
+            A 2D array of shape (n_elems, 2), the indices :math:`j` and :math:`k` of each entry.
+        coeff_indptr: ~numpy.ndarray(int)
+            A 1D array of shape (n_elems + 1,). The coefficients of the entry :math:`n` are stored at the positions
+            `coeff_indptr[n]` to `coeff_indptr[n+1]` of the `coeff_param` and `coeff_data` arrays.
+        coeff_param: ~numpy.ndarray(int)
+            A 1D array of shape (n_coeffs,), the index :math:`m` of the parameter of each coefficient.
+        coeff_data: ~numpy.ndarray(float)
+            A 1D array of shape (n_coeffs,), the values of the coefficients.
+        """
+        n_params, n_rows, n_j, n_k = affine_tensor.shape
+        m = affine_tensor.coords[0]
+        i = affine_tensor.coords[1]
+        j = np.minimum(affine_tensor.coords[2], affine_tensor.coords[3])
+        k = np.maximum(affine_tensor.coords[2], affine_tensor.coords[3])
+
+        lin = (i * n_j + j) * n_k + k
+        lin, entry = np.unique(lin, return_inverse=True)
+        key, inverse = np.unique(entry.ravel() * n_params + m, return_inverse=True)
+        coeff_data = np.zeros(len(key), dtype=np.float64)
+        np.add.at(coeff_data, inverse.ravel(), affine_tensor.data)
+
+        nz = coeff_data != 0.
+        key = key[nz]
+        coeff_data = coeff_data[nz]
+        entry, coeff_param = np.divmod(key, n_params)
+
+        # drop the entries without any coefficient left
+        used, entry = np.unique(entry, return_inverse=True)
+        lin = lin[used]
+        coeff_indptr = np.zeros(len(lin) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(entry.ravel(), minlength=len(lin)), out=coeff_indptr[1:])
+
+        i, jk = np.divmod(lin, n_j * n_k)
+        jk = np.stack(np.divmod(jk, n_k), axis=1)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(i, minlength=n_rows), out=indptr[1:])
+
+        return indptr, np.ascontiguousarray(jk, dtype=np.int64), coeff_indptr, coeff_param.astype(np.int64), coeff_data
+
+    def parameter_vector(self, params=None):
+        """Return the vector of the parameters :math:`p_m` weighting the parameter-independent tensors
+        of a parameter-affine tensor, in the order of :attr:`affine_parameters`.
+
+        Parameters
+        ----------
+        params: None or QgParams, optional
+            The models parameters. If `None`, use the parameters :attr:`params` of the tensor. Default to `None`.
+
+        Returns
+        -------
+        ~numpy.ndarray(float)
+            The parameters vector, of shape (`len(affine_parameters)`,).
+        """
+        if self.affine_parameters is None:
+            raise ValueError("The tensor is not parameter-affine. Build it with the argument affine=True.")
+        if params is None:
+            params = self.params
+        values = affine_parameters_values(params)
+        return np.array([values[name] for name in self.affine_parameters])
+
+    def reparameterize(self, params):
+        """Update the tensor for new values of the models parameters, without recomputing the inner products.
+
+        The tensor is assembled again from the parameter-independent tensors :attr:`affine_tensor`, which requires
+        it to be built with `affine=True`. The parameters entering the inner products or the inverted matrices,
+        i.e. the number of modes, the aspect ratio :math:`n`, the static stability :math:`\sigma`, the ocean
+        :math:`G` parameter and the orographic basis, must be the same as the ones used to build the tensor.
+
+        Parameters
+        ----------
+        params: QgParams
+            The new models parameters. Becomes the attribute :attr:`params` of the tensor.
+
+        Notes
+        -----
+        The compressed rows form :attr:`tensor_csr` is also updated, with the structure of :attr:`affine_csr`, i.e.
+        it may contain entries which are zero for the new parameters.
+        """
+        if self.affine_tensor is None:
+            raise ValueError("The tensor is not parameter-affine. Build it with the argument affine=True.")
+        if _affine_structure(params, self.oceanic_inner_products is not None) != self._affine_structure:
+            raise ValueError("The number of modes, the aspect ratio, the static stability, the ocean G parameter "
+                             "and the orographic basis cannot be changed by the reparameterization.")
+
+        self.params = params
+        p = self.parameter_vector(params)
+        self._assemble_tensor(self.affine_tensor, p)
+
+        indptr, jk, coeff_indptr, coeff_param, coeff_data = self.affine_csr
+        entry = np.repeat(np.arange(len(jk)), np.diff(coeff_indptr))
+        self._tensor_csr = (indptr, jk, np.bincount(entry, weights=coeff_data * p[coeff_param], minlength=len(jk)))
+
     @staticmethod
     def simplify_matrix(matrix):
         """Routine that simplifies the component of the 3D tensors :math:`\mathcal{T}`.
@@ -641,6 +1075,139 @@ class QgsTensor(object):
         self.__dict__.update(tmp_dict)
 
 
+def affine_parameters_values(params):
+    """Compute the values of all the parameters which can weight the parameter-independent tensors of a
+    parameter-affine :class:`QgsTensor` (see :attr:`QgsTensor.affine_parameters`).
+
+    The parameters are the nondimensional coefficients appearing in the tendencies, or their products.
+    The spectral components are named after their vector with their index between brackets, e.g. `'hk[1]'`.
+    The coefficients which are not defined for the models parameters are set to zero.
+
+    Parameters
+    ----------
+    params: QgParams
+        The models parameters.
+
+    Returns
+    -------
+    dict(float)
+        The values of the parameters, indexed by their names.
+    """
+    ap = params.atmospheric_params
+    atp = params.atemperature_params
+    op = params.oceanic_params
+    gp = params.ground_params
+    scp = params.scale_params
+
+    values = dict()
+    values['const'] = 1.
+    values['beta'] = scp.beta
+    values['kd'] = ap.kd if ap is not None else 0.
+    values['kdp'] = ap.kdp if ap is not None else 0.
+    values['r'] = op.r if op is not None else 0.
+    values['d'] = op.d if op is not None else 0.
+
+    hd = None
+    sc = None
+    if atp is not None:
+        hd = atp.hd
+        sc = atp.sc
+        values['hd'] = hd if hd is not None else 0.
+        _add_spectral_values(values, 'Cpa', params.Cpa)
+        if hd is not None and atp.thetas is not None:
+            _add_spectral_values(values, 'hd*thetas', hd * np.array(atp.thetas, dtype=np.float64))
+
+    if gp is not None and gp.hk is not None:
+        _add_spectral_values(values, 'hk', gp.hk)
+
+    _add_spectral_values(values, 'Cpgo', params.Cpgo)
+
+    Lpa = params.Lpa
+    LSBpa = params.LSBpa
+    LSBpgo = params.LSBpgo
+    if LSBpa is not None and Lpa is not None:
+        values['LSBpa'] = LSBpa
+        values['sc*Lpa'] = sc * Lpa
+    if LSBpgo is not None and Lpa is not None:
+        values['LSBpgo'] = LSBpgo
+        values['Lpa'] = Lpa
+
+    Lpgo = params.Lpgo
+    sbpa = params.sbpa
+    sbpgo = params.sbpgo
+    if Lpgo is not None and sc is not None:
+        values['sc*Lpgo'] = sc * Lpgo
+        values['Lpgo'] = Lpgo
+    if sbpa is not None:
+        values['sbpa'] = sbpa
+    if sbpgo is not None:
+        values['sbpgo'] = sbpgo
+
+    values = {name: float(value) for name, value in values.items()}
+    return defaultdict(float, values)
+
+
+def _add_spectral_values(values, name, vector):
+    if vector is not None:
+        for l, value in enumerate(np.array(vector, dtype=np.float64)):
+            values[name + '[' + str(l) + ']'] = value
+
+
+def _affine_structure(params, ocean):
+    # the parameters which cannot be changed in a parameter-affine tensor
+    gp = params.ground_params
+    if gp is not None and gp.hk is not None:
+        orography = (gp.orographic_basis, len(gp.hk))
+    else:
+        orography = None
+    return (tuple(params.nmod), float(params.scale_params.n), float(params.atmospheric_params.sig0),
+            float(params.G) if ocean else None, orography)
+
+
+class _AffineTerms(object):
+    # accumulates the entries of the parameter-independent tensors of a parameter-affine tensor
+
+    def __init__(self, ndim):
+        self.index = np.arange(ndim + 1)
+        self.parameters = list()
+        self._position = dict()
+        self._coords = list()
+        self._data = list()
+
+    def add(self, name, i, j, k, value):
+        # add value to the entries [i, j, k] of the tensor weighted by the parameter name, where j and k can be
+        # slices as in the tensor rows
+        if name not in self._position:
+            self._position[name] = len(self.parameters)
+            self.parameters.append(name)
+
+        j, k = np.meshgrid(np.atleast_1d(self.index[j]), np.atleast_1d(self.index[k]), indexing='ij')
+        value = np.asarray(value, dtype=np.float64)
+        if value.size == j.size:
+            value = value.reshape(j.shape)
+        else:
+            value = np.broadcast_to(value, j.shape)
+
+        nz = value != 0.
+        n = np.count_nonzero(nz)
+        # folded to the upper-triangular part, like simplify_matrix does
+        self._coords.append(np.stack((np.full(n, self._position[name]), np.full(n, i),
+                                      np.minimum(j[nz], k[nz]), np.maximum(j[nz], k[nz]))))
+        self._data.append(value[nz])
+
+    def to_coo(self):
+        n = len(self.index)
+        return sp.COO(np.concatenate(self._coords, axis=1), np.concatenate(self._data),
+                      shape=(len(self.parameters), n, n, n))
+
+
+def _to_dense(arr):
+    if isinstance(arr, sp.SparseArray):
+        return arr.todense()
+    else:
+        return np.asarray(arr, dtype=np.float64)
+
+
 def _kronecker_delta(i, j):
 
     if i == j:
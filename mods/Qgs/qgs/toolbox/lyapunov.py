@@ -31,9 +31,12 @@
 from numba import njit
 import numpy as np
 import dapper.mods.Qgs.qgs.integrators.integrate as integrate
+from dapper.mods.Qgs.qgs.integrators.integrator import _backends, _chunks, _run_threads
 from dapper.mods.Qgs.qgs.functions.util import normalize_matrix_columns, solve_triangular_matrix, reverse
 
 import multiprocessing
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 
 class LyapunovsEstimator(object):
@@ -69,11 +72,26 @@ class LyapunovsEstimator(object):
     number_of_dimensions: None or int, optional
         Allow to hardcode the dynamical system dimension. If `None`, evaluate the dimension from the
         callable :attr:`func`. Default to `None`.
+    chunk_size: None or int, optional
+        Number of trajectories processed by a worker at once with the threads backend.
+        If `None`, split the trajectories evenly between the workers. Default to `None`.
+    backend: str, optional
+        The kind of workers to use:
+
+        * `'processes'`: persistent :class:`LyapProcess` workers fed through queues.
+        * `'threads'`: a pool of threads calling the Numba-jitted kernels, which release the GIL.
+          The compiled code and the memory are shared by the workers, and no process is started.
+
+        Default to `'processes'`.
 
     Attributes
     ----------
     num_threads: int
         Number of :class:`LyapProcess` workers (threads) to use.
+    chunk_size: None or int
+        Number of trajectories processed by a worker at once with the threads backend.
+    backend: str
+        The kind of workers used, `'processes'` or `'threads'`.
     b: ~numpy.ndarray
         Vector of coefficients :math:`b_i` of the `Runge-Kutta method`_ .
     c: ~numpy.ndarray
@@ -97,13 +115,20 @@ class LyapunovsEstimator(object):
         Last Jacobian matrix function :math:`\\boldsymbol{J}` used by the estimator.
     """
 
-    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None):
+    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None, chunk_size=None,
+                 backend='processes'):
 
         if num_threads is None:
             self.num_threads = multiprocessing.cpu_count()
         else:
             self.num_threads = num_threads
 
+        if backend not in _backends:
+            raise ValueError("Unknown backend '" + str(backend) + "'. Should be one of " + str(_backends) + ".")
+
+        self.chunk_size = chunk_size
+        self.backend = backend
+
         # Default is RK4
         if a is None and b is None and c is None:
             self.c = np.array([0., 0.5, 0.5, 1.])
@@ -141,6 +166,7 @@ class LyapunovsEstimator(object):
         self._lyap_queue = None
 
         self._processes_list = list()
+        self._executor = None
 
     def terminate(self):
         """Stop the workers (threads) and release the resources of the estimator."""
@@ -150,6 +176,10 @@ class LyapunovsEstimator(object):
             process.terminate()
             process.join()
 
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def start(self):
         """Start or restart the workers (threads) of the estimator.
 
@@ -162,6 +192,11 @@ class LyapunovsEstimator(object):
         self.terminate()
 
         self._processes_list = list()
+
+        if self.backend == 'threads':
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            return
+
         self._ics_queue = multiprocessing.JoinableQueue()
         self._lyap_queue = multiprocessing.Queue()
 
@@ -228,7 +263,7 @@ class LyapunovsEstimator(object):
         self.start()
 
     def compute_lyapunovs(self, t0, tw, t, dt, mdt, ic=None, write_steps=1, n_vec=None, forward=False, adjoint=False,
-                          inverse=False):
+                          inverse=False, vectors_file=None):
         """Estimate the Lyapunov vectors using the Benettin algorithm along a given trajectory, always integrating the said trajectory
         forward in time from `ic` at `t0` to time `t`.
         The result of the estimation can be obtained afterward by calling :meth:`get_lyapunovs`.
@@ -278,6 +313,16 @@ class LyapunovsEstimator(object):
             Set to 0 to return only the final state.
         n_vec: int, optional
             The number of Lyapunov vectors to compute. Should be smaller or equal to :attr:`n_dim`.
+            Only these `n_vec` tangent vectors are propagated, such that the cost of the estimation scales with
+            `n_vec` instead of :attr:`n_dim`.
+        vectors_file: None or str or ~pathlib.Path, optional
+            If provided, the Lyapunov vectors are written by the workers directly to this `npy`_ file as they are
+            computed, instead of being gathered in memory. The vectors returned by :meth:`get_lyapunovs` are then
+            memory-mapped from the file. Useful when the array of shape
+            (:attr:`n_traj`, :attr:`n_dim`, :attr:`n_vec`, :attr:`n_records`) does not fit in memory.
+            Default to `None`.
+
+        .. _npy: https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html
         """
 
         if self.func is None or self.func_jac is None:
@@ -340,20 +385,41 @@ class LyapunovsEstimator(object):
                     self.n_records += 1
 
         self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
-        self._recorded_vec = np.zeros((self.n_traj, self.n_dim, self.n_vec, self.n_records))
+        self._recorded_vec = _vectors_array((self.n_traj, self.n_dim, self.n_vec, self.n_records), vectors_file)
         self._recorded_exp = np.zeros((self.n_traj, self.n_vec, self.n_records))
 
-        for i in range(self.n_traj):
-            self._ics_queue.put((i, self._pretime, self._time, mdt, self.ic[i], self.n_vec, self.write_steps,
-                                 self._forward, self._adjoint, self._inverse))
+        if self.backend == 'threads':
+            self._compute_lyapunovs_threads(mdt)
+        else:
+            for i in range(self.n_traj):
+                self._ics_queue.put((i, self._pretime, self._time, mdt, self.ic[i], self.n_vec, self.write_steps,
+                                     self._forward, self._adjoint, self._inverse, vectors_file))
+
+            self._ics_queue.join()
 
-        self._ics_queue.join()
+            for i in range(self.n_traj):
+                args = self._lyap_queue.get()
+                self._recorded_traj[args[0]] = args[1]
+                self._recorded_exp[args[0]] = args[2]
+                if args[3] is not None:
+                    self._recorded_vec[args[0]] = args[3]
 
-        for i in range(self.n_traj):
-            args = self._lyap_queue.get()
-            self._recorded_traj[args[0]] = args[1]
-            self._recorded_exp[args[0]] = args[2]
-            self._recorded_vec[args[0]] = args[3]
+        if vectors_file is not None:
+            self._recorded_vec.flush()
+
+    def _compute_lyapunovs_threads(self, mdt):
+        # the threads write directly their chunk of trajectories in the result arrays (possibly memory-mapped)
+        if self._forward == -1:
+            compute_lyap = _compute_backward_lyap_jit
+        else:
+            compute_lyap = _compute_forward_lyap_jit
+
+        def compute_chunk(chunk):
+            compute_lyap(self.func, self.func_jac, self._pretime, self._time, mdt, self.ic[chunk], self.n_vec,
+                         self.write_steps, self._adjoint, self._inverse, self.b, self.c, self.a,
+                         self._recorded_traj[chunk], self._recorded_exp[chunk], np.asarray(self._recorded_vec[chunk]))
+
+        _run_threads(self._executor, compute_chunk, _chunks(self.n_traj, self.num_threads, self.chunk_size))
 
     def get_lyapunovs(self):
         """Returns the result of the previous Lyapunov vectors estimation.
@@ -447,64 +513,83 @@ class LyapProcess(multiprocessing.Process):
 
             args = self._ics_queue.get()
 
+            n_dim = len(args[4])
             if args[7] == -1:
-                recorded_traj, recorded_exp, recorded_vec = _compute_backward_lyap_jit(self.func, self.func_jac,
-                                                                                       args[1], args[2], args[3],
-                                                                                       args[4][np.newaxis, :], args[5],
-                                                                                       args[6], args[8], args[9],
-                                                                                       self.b, self.c, self.a)
+                compute_lyap = _compute_backward_lyap_jit
+                n_records = _number_of_records(args[2], args[6])
+            else:
+                compute_lyap = _compute_forward_lyap_jit
+                n_records = _number_of_records(args[1], args[6])
+
+            recorded_traj = np.zeros((1, n_dim, n_records))
+            recorded_exp = np.zeros((1, args[5], n_records))
+            if args[10] is not None:
+                # write the vectors directly to the memory-mapped output file
+                vectors = np.load(args[10], mmap_mode='r+')
+                recorded_vec = np.asarray(vectors[args[0]:args[0]+1])
             else:
-                recorded_traj, recorded_exp, recorded_vec = _compute_forward_lyap_jit(self.func, self.func_jac,
-                                                                                      args[1], args[2], args[3],
-                                                                                      args[4][np.newaxis, :], args[5],
-                                                                                      args[6], args[8], args[9],
-                                                                                      self.b, self.c, self.a)
+                recorded_vec = np.zeros((1, n_dim, args[5], n_records))
 
-            self._lyap_queue.put((args[0], np.squeeze(recorded_traj), np.squeeze(recorded_exp),
-                                  np.squeeze(recorded_vec)))
+            compute_lyap(self.func, self.func_jac, args[1], args[2], args[3], args[4][np.newaxis, :], args[5],
+                         args[6], args[8], args[9], self.b, self.c, self.a, recorded_traj, recorded_exp, recorded_vec)
+
+            if args[10] is not None:
+                vectors.flush()
+                del recorded_vec, vectors
+                self._lyap_queue.put((args[0], np.squeeze(recorded_traj), np.squeeze(recorded_exp), None))
+            else:
+                self._lyap_queue.put((args[0], np.squeeze(recorded_traj), np.squeeze(recorded_exp),
+                                      np.squeeze(recorded_vec)))
 
             self._ics_queue.task_done()
 
 
-@njit
-def _compute_forward_lyap_jit(f, fjac, time, posttime, mdt, ic, n_vec, write_steps, adjoint, inverse, b, c, a):
+@njit(nogil=True)
+def _compute_forward_lyap_jit(f, fjac, time, posttime, mdt, ic, n_vec, write_steps, adjoint, inverse, b, c, a,
+                              recorded_traj, recorded_exp, recorded_vec):
 
     ttraj = integrate._integrate_runge_kutta_jit(f, np.concatenate((time[:-1], posttime)), ic, 1, 1, b, c, a)
-    recorded_traj, recorded_exp, recorded_vec = _compute_forward_lyap_traj_jit(f, fjac, time, posttime, ttraj, mdt,
-                                                                               n_vec, write_steps, adjoint, inverse, b, c, a)
-    return recorded_traj, recorded_exp, recorded_vec
+    _compute_forward_lyap_traj_inplace_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, write_steps, adjoint, inverse,
+                                           b, c, a, recorded_traj, recorded_exp, recorded_vec)
 
 
-@njit
+@njit(nogil=True)
 def _compute_forward_lyap_traj_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, write_steps, adjoint, inverse, b, c, a):
 
-    traj = ttraj[:, :, :len(time)]
-    posttraj = ttraj[:, :, len(time)-1:]
-
     n_traj = ttraj.shape[0]
     n_dim = ttraj.shape[1]
 
-    Id = np.zeros((1, n_dim, n_dim))
-    Id[0] = np.eye(n_dim)
-
-    if write_steps == 0:
-        n_records = 1
-    else:
-        tot = time[::write_steps]
-        n_records = len(tot)
-        if tot[-1] != time[-1]:
-            n_records += 1
+    n_records = _number_of_records(time, write_steps)
 
     recorded_vec = np.zeros((n_traj, n_dim, n_vec, n_records))
     recorded_traj = np.zeros((n_traj, n_dim, n_records))
     recorded_exp = np.zeros((n_traj, n_vec, n_records))
 
+    _compute_forward_lyap_traj_inplace_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, write_steps, adjoint, inverse,
+                                           b, c, a, recorded_traj, recorded_exp, recorded_vec)
+
+    return recorded_traj, recorded_exp, recorded_vec
+
+
+@njit(nogil=True)
+def _compute_forward_lyap_traj_inplace_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, write_steps, adjoint, inverse,
+                                           b, c, a, recorded_traj, recorded_exp, recorded_vec):
+
+    traj = ttraj[:, :, :len(time)]
+    posttraj = ttraj[:, :, len(time)-1:]
+
+    n_traj = ttraj.shape[0]
+    n_dim = ttraj.shape[1]
+
     rposttime = reverse(posttime)
     rtime = reverse(time)
 
+    # workspace, only the n_vec tangent vectors are propagated
+    y = np.zeros((1, n_dim))
+    tg = np.zeros((1, n_dim, n_vec))
+
     for i_traj in range(n_traj):
 
-        y = np.zeros((1, n_dim))
         qr = np.linalg.qr(np.random.random((n_dim, n_vec)))
         q = qr[0]
         m_exp = np.zeros((n_dim))
@@ -512,12 +597,12 @@ def _compute_forward_lyap_traj_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, w
         for ti, (tt, dt) in enumerate(zip(rposttime[:-1], np.diff(rposttime))):
 
             y[0] = posttraj[i_traj, :, -1-ti]
+            tg[0] = q
             subtime = np.concatenate((np.arange(tt + dt, tt, mdt), np.full((1,), tt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, -1, 0, b, c, a,
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, -1, 0, b, c, a,
                                                                     adjoint, inverse, integrate._zeros_func)
 
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
 
         r = qr[1]
@@ -534,12 +619,12 @@ def _compute_forward_lyap_traj_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, w
                 recorded_vec[i_traj, :, :, iw] = q
                 iw -= 1
 
+            tg[0] = q
             subtime = np.concatenate((np.arange(tt + dt, tt, mdt), np.full((1,), tt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, -1, 0, b, c, a,
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, -1, 0, b, c, a,
                                                                     adjoint, inverse, integrate._zeros_func)
 
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
             r = qr[1]
 
@@ -547,45 +632,50 @@ def _compute_forward_lyap_traj_jit(f, fjac, time, posttime, ttraj, mdt, n_vec, w
         recorded_traj[i_traj, :, 0] = y[0]
         recorded_vec[i_traj, :, :, 0] = q
 
-    return recorded_traj, recorded_exp, recorded_vec
 
-
-@njit
-def _compute_backward_lyap_jit(f, fjac, pretime, time, mdt, ic, n_vec, write_steps, adjoint, inverse, b, c, a):
+@njit(nogil=True)
+def _compute_backward_lyap_jit(f, fjac, pretime, time, mdt, ic, n_vec, write_steps, adjoint, inverse, b, c, a,
+                               recorded_traj, recorded_exp, recorded_vec):
 
     ttraj = integrate._integrate_runge_kutta_jit(f, np.concatenate((pretime[:-1], time)), ic, 1, 1, b, c, a)
-    recorded_traj, recorded_exp, recorded_vec = _compute_backward_lyap_traj_jit(f, fjac, pretime, time, ttraj, mdt,
-                                                                                n_vec, write_steps, adjoint, inverse, b, c, a)
-    return recorded_traj, recorded_exp, recorded_vec
+    _compute_backward_lyap_traj_inplace_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, write_steps, adjoint, inverse,
+                                            b, c, a, recorded_traj, recorded_exp, recorded_vec)
 
 
-@njit
+@njit(nogil=True)
 def _compute_backward_lyap_traj_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, write_steps, adjoint, inverse, b, c, a):
 
-    pretraj = ttraj[:, :, :len(pretime)]
-    traj = ttraj[:, :, (len(pretime)-1):]
-
     n_traj = ttraj.shape[0]
     n_dim = ttraj.shape[1]
 
-    Id = np.zeros((1, n_dim, n_dim))
-    Id[0] = np.eye(n_dim)
-
-    if write_steps == 0:
-        n_records = 1
-    else:
-        tot = time[::write_steps]
-        n_records = len(tot)
-        if tot[-1] != time[-1]:
-            n_records += 1
+    n_records = _number_of_records(time, write_steps)
 
     recorded_vec = np.zeros((n_traj, n_dim, n_vec, n_records))
     recorded_traj = np.zeros((n_traj, n_dim, n_records))
     recorded_exp = np.zeros((n_traj, n_vec, n_records))
 
+    _compute_backward_lyap_traj_inplace_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, write_steps, adjoint, inverse,
+                                            b, c, a, recorded_traj, recorded_exp, recorded_vec)
+
+    return recorded_traj, recorded_exp, recorded_vec
+
+
+@njit(nogil=True)
+def _compute_backward_lyap_traj_inplace_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, write_steps, adjoint, inverse,
+                                            b, c, a, recorded_traj, recorded_exp, recorded_vec):
+
+    pretraj = ttraj[:, :, :len(pretime)]
+    traj = ttraj[:, :, (len(pretime)-1):]
+
+    n_traj = ttraj.shape[0]
+    n_dim = ttraj.shape[1]
+
+    # workspace, only the n_vec tangent vectors are propagated
+    y = np.zeros((1, n_dim))
+    tg = np.zeros((1, n_dim, n_vec))
+
     for i_traj in range(n_traj):
 
-        y = np.zeros((1, n_dim))
         y[0] = pretraj[i_traj, :, 0]
         qr = np.linalg.qr(np.random.random((n_dim, n_vec)))
         q = qr[0]
@@ -593,12 +683,12 @@ def _compute_backward_lyap_traj_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, w
 
         for ti, (tt, dt) in enumerate(zip(pretime[:-1], np.diff(pretime))):
 
+            tg[0] = q
             subtime = np.concatenate((np.arange(tt, tt + dt, mdt), np.full((1,), tt + dt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, 1, 0, b, c, a,
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, 1, 0, b, c, a,
                                                                     adjoint, inverse, integrate._zeros_func)
             y[0] = pretraj[i_traj, :, ti+1]
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
 
         r = qr[1]
@@ -614,12 +704,12 @@ def _compute_backward_lyap_traj_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, w
                 recorded_vec[i_traj, :, :, iw] = q
                 iw += 1
 
+            tg[0] = q
             subtime = np.concatenate((np.arange(tt, tt + dt, mdt), np.full((1,), tt + dt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, 1, 0, b, c, a,
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, 1, 0, b, c, a,
                                                                     adjoint, inverse, integrate._zeros_func)
             y[0] = traj[i_traj, :, ti+1]
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
             r = qr[1]
 
@@ -627,7 +717,25 @@ def _compute_backward_lyap_traj_jit(f, fjac, pretime, time, ttraj, mdt, n_vec, w
         recorded_traj[i_traj, :, -1] = y[0]
         recorded_vec[i_traj, :, :, -1] = q
 
-    return recorded_traj, recorded_exp, recorded_vec
+
+def _vectors_array(shape, vectors_file=None, suffix=''):
+    # array of recorded vectors, memory-mapped to the npy file vectors_file (with suffix appended to its name) if provided
+    if vectors_file is None:
+        return np.zeros(shape)
+    vectors_file = Path(vectors_file)
+    vectors_file = vectors_file.with_name(vectors_file.stem + suffix + vectors_file.suffix)
+    return np.lib.format.open_memmap(vectors_file, mode='w+', dtype=np.float64, shape=shape)
+
+
+@njit(nogil=True)
+def _number_of_records(time, write_steps):
+    if write_steps == 0:
+        return 1
+    tot = time[::write_steps]
+    n_records = len(tot)
+    if tot[-1] != time[-1]:
+        n_records += 1
+    return n_records
 
 
 class CovariantLyapunovsEstimator(object):
@@ -673,12 +781,23 @@ class CovariantLyapunovsEstimator(object):
         Noise perturbation amplitude parameter of the diagonal of the R matrix in the QR decomposition during the Ginelli step. Mainly done to avoid ill-conditioned matrices
         near tangencies (see :cite:`lyap-KP2012`). Default to 0 (no perturbation).
         Only apply if using the Ginelli et al. algorithm, i.e. if ``method=0``.
+    chunk_size: None or int, optional
+        Number of trajectories processed by a worker at once with the threads backend.
+        If `None`, split the trajectories evenly between the workers. Default to `None`.
+    backend: str, optional
+        The kind of workers to use, `'processes'` (:class:`ClvProcess` workers fed through queues) or `'threads'`
+        (a pool of threads calling the Numba-jitted kernels). See :class:`LyapunovsEstimator`.
+        Default to `'processes'`.
 
 
     Attributes
     ----------
     num_threads: int
         Number of :class:`LyapProcess` workers (threads) to use.
+    chunk_size: None or int
+        Number of trajectories processed by a worker at once with the threads backend.
+    backend: str
+        The kind of workers used, `'processes'` or `'threads'`.
     b: ~numpy.ndarray
         Vector of coefficients :math:`b_i` of the `Runge-Kutta method`_ .
     c: ~numpy.ndarray
@@ -713,13 +832,20 @@ class CovariantLyapunovsEstimator(object):
         Only apply if using the Ginelli et al. algorithm, i.e. if ``method=0``.
     """
 
-    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None, noise_pert=0., method=0):
+    def __init__(self, num_threads=None, b=None, c=None, a=None, number_of_dimensions=None, noise_pert=0., method=0,
+                 chunk_size=None, backend='processes'):
 
         if num_threads is None:
             self.num_threads = multiprocessing.cpu_count()
         else:
             self.num_threads = num_threads
 
+        if backend not in _backends:
+            raise ValueError("Unknown backend '" + str(backend) + "'. Should be one of " + str(_backends) + ".")
+
+        self.chunk_size = chunk_size
+        self.backend = backend
+
         # Default is RK4
         if a is None and b is None and c is None:
             self.c = np.array([0., 0.5, 0.5, 1.])
@@ -759,6 +885,7 @@ class CovariantLyapunovsEstimator(object):
         self._clv_queue = None
 
         self._processes_list = list()
+        self._executor = None
 
     def terminate(self):
         """Stop the workers (threads) and release the resources of the estimator."""
@@ -768,6 +895,10 @@ class CovariantLyapunovsEstimator(object):
             process.terminate()
             process.join()
 
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def set_noise_pert(self, noise_pert):
         """Set the noise perturbation :attr:`noise_pert` parameter.
 
@@ -823,6 +954,11 @@ class CovariantLyapunovsEstimator(object):
         self.terminate()
 
         self._processes_list = list()
+
+        if self.backend == 'threads':
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+            return
+
         self._ics_queue = multiprocessing.JoinableQueue()
         self._clv_queue = multiprocessing.Queue()
 
@@ -858,7 +994,8 @@ class CovariantLyapunovsEstimator(object):
         self.func_jac = fjac
         self.start()
 
-    def compute_clvs(self, t0, ta, tb, tc, dt, mdt, ic=None, write_steps=1, n_vec=None, method=None, backward_vectors=False, forward_vectors=False):
+    def compute_clvs(self, t0, ta, tb, tc, dt, mdt, ic=None, write_steps=1, n_vec=None, method=None, backward_vectors=False, forward_vectors=False,
+                     vectors_file=None):
         """Estimate the Covariant Lyapunov Vectors (CLVs) along a given trajectory, always integrating the said trajectory
         forward in time from `ic` at `t0` to time `tc`. Return the CLVs between `ta` and `tb`.
         The result of the estimation can be obtained afterward by calling :meth:`get_clvs`.
@@ -911,6 +1048,15 @@ class CovariantLyapunovsEstimator(object):
         forward_vectors: bool, optional
             Store also the computed Forward Lyapunov vectors between `ta` and `tb`. Only applies if ``method=1``.
             Does not store the FLVs if not provided.
+        vectors_file: None or str or ~pathlib.Path, optional
+            If provided, the CLVs are written to this `npy`_ file as the trajectories are
+            computed, instead of being gathered in memory. The vectors returned by :meth:`get_clvs` are then
+            memory-mapped from the file. The BLVs and FLVs, if stored, are written likewise to the files with the same name
+            suffixed by `_backward` and `_forward` (e.g. `clvs_backward.npy`).
+            Useful when the arrays of shape (:attr:`n_traj`, :attr:`n_dim`, :attr:`n_vec`, :attr:`n_records`) do not fit in memory.
+            Default to `None`.
+
+        .. _npy: https://numpy.org/doc/stable/reference/generated/numpy.lib.format.html
         """
 
         if self.func is None or self.func_jac is None:
@@ -959,31 +1105,64 @@ class CovariantLyapunovsEstimator(object):
             if tot[-1] != self._time[-1]:
                 self.n_records += 1
 
+        shape = (self.n_traj, self.n_dim, self.n_vec, self.n_records)
         self._recorded_traj = np.zeros((self.n_traj, self.n_dim, self.n_records))
-        self._recorded_vec = np.zeros((self.n_traj, self.n_dim, self.n_vec, self.n_records))
+        self._recorded_vec = _vectors_array(shape, vectors_file)
         self._recorded_exp = np.zeros((self.n_traj, self.n_vec, self.n_records))
         if self.method == 1:
             if forward_vectors:
-                self._recorded_fvec = np.zeros((self.n_traj, self.n_dim, self.n_vec, self.n_records))
+                self._recorded_fvec = _vectors_array(shape, vectors_file, '_forward')
             if backward_vectors:
-                self._recorded_bvec = np.zeros((self.n_traj, self.n_dim, self.n_vec, self.n_records))
-
-        for i in range(self.n_traj):
-            self._ics_queue.put((i, self._pretime, self._time, self._aftertime, mdt, self.ic[i], self.n_vec,
-                                 self.write_steps, self.method))
+                self._recorded_bvec = _vectors_array(shape, vectors_file, '_backward')
 
-        self._ics_queue.join()
-
-        for i in range(self.n_traj):
-            args = self._clv_queue.get()
-            self._recorded_traj[args[0]] = args[1]
-            self._recorded_exp[args[0]] = args[2]
-            self._recorded_vec[args[0]] = args[3]
-            if self.method == 1:
+        if self.backend == 'threads':
+            self._compute_clvs_threads(mdt, backward_vectors, forward_vectors)
+        else:
+            for i in range(self.n_traj):
+                self._ics_queue.put((i, self._pretime, self._time, self._aftertime, mdt, self.ic[i], self.n_vec,
+                                     self.write_steps, self.method))
+
+            # the results are stored as they arrive, such that they do not pile up in the queue
+            for i in range(self.n_traj):
+                args = self._clv_queue.get()
+                self._recorded_traj[args[0]] = args[1]
+                self._recorded_exp[args[0]] = args[2]
+                self._recorded_vec[args[0]] = args[3]
+                if self.method == 1:
+                    if forward_vectors:
+                        self._recorded_fvec[args[0]] = args[5]
+                    if backward_vectors:
+                        self._recorded_bvec[args[0]] = args[4]
+
+            self._ics_queue.join()
+
+        if vectors_file is not None:
+            for vectors in [self._recorded_vec, self._recorded_fvec, self._recorded_bvec]:
+                if isinstance(vectors, np.memmap):
+                    vectors.flush()
+
+    def _compute_clvs_threads(self, mdt, backward_vectors, forward_vectors):
+        # the threads write directly their chunk of trajectories in the result arrays
+
+        def compute_chunk(chunk):
+            if self.method == 0:
+                self._recorded_traj[chunk], self._recorded_exp[chunk], self._recorded_vec[chunk] = \
+                    _compute_clv_gin_jit(self.func, self.func_jac, self._pretime, self._time, self._aftertime, mdt,
+                                         self.ic[chunk], self.n_vec, self.write_steps, self.b, self.c, self.a,
+                                         self.noise_pert)
+            else:
+                recorded_traj, recorded_exp, recorded_vec, backward_vec, forward_vec = \
+                    _compute_clv_sub_jit(self.func, self.func_jac, self._pretime, self._time, self._aftertime, mdt,
+                                         self.ic[chunk], self.write_steps, self.b, self.c, self.a)
+                self._recorded_traj[chunk] = recorded_traj
+                self._recorded_exp[chunk] = recorded_exp
+                self._recorded_vec[chunk] = recorded_vec
                 if forward_vectors:
-                    self._recorded_fvec[args[0]] = args[5]
+                    self._recorded_fvec[chunk] = forward_vec
                 if backward_vectors:
-                    self._recorded_bvec[args[0]] = args[4]
+                    self._recorded_bvec[chunk] = backward_vec
+
+        _run_threads(self._executor, compute_chunk, _chunks(self.n_traj, self.num_threads, self.chunk_size))
 
     def get_clvs(self):
         """Returns the result of the previous CLVs estimation.
@@ -1169,14 +1348,15 @@ class ClvProcess(multiprocessing.Process):
 
 
 # Ginelli et al. method
-@njit
+@njit(nogil=True)
 def _compute_clv_gin_jit(f, fjac, pretime, time, aftertime, mdt, ic, n_vec, write_steps, b, c, a, noise_pert):
 
     n_traj = ic.shape[0]
     n_dim = ic.shape[1]
 
-    Id = np.zeros((1, n_dim, n_dim))
-    Id[0] = np.eye(n_dim)
+    # workspace, only the n_vec tangent vectors are propagated
+    y = np.zeros((1, n_dim))
+    tg = np.zeros((1, n_dim, n_vec))
 
     if write_steps == 0:
         n_records = 1
@@ -1193,7 +1373,6 @@ def _compute_clv_gin_jit(f, fjac, pretime, time, aftertime, mdt, ic, n_vec, writ
 
         # first part, making the backward vectors converge (initialization of the Benettin algorithm)
 
-        y = np.zeros((1, n_dim))
         y[0] = ic[i_traj]
         qr = np.linalg.qr(np.random.randn(n_dim, n_vec))
         q = qr[0]
@@ -1201,11 +1380,11 @@ def _compute_clv_gin_jit(f, fjac, pretime, time, aftertime, mdt, ic, n_vec, writ
         for tt, dt in zip(pretime[:-1], np.diff(pretime)):
 
             subtime = np.concatenate((np.arange(tt, tt + dt, mdt), np.full((1,), tt + dt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, 1, 0, b, c, a,
+            tg[0] = q
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, 1, 0, b, c, a,
                                                                     False, 1, integrate._zeros_func)
             y[0] = y_new[0, :, 0]
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
 
         # second part, stores the backward vectors and the r matrix (Benettin steps)
@@ -1223,11 +1402,11 @@ def _compute_clv_gin_jit(f, fjac, pretime, time, aftertime, mdt, ic, n_vec, writ
             tmp_traj[ti] = y[0].copy()
 
             subtime = np.concatenate((np.arange(tt, tt + dt, mdt), np.full((1,), tt + dt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, 1, 0, b, c, a,
+            tg[0] = q
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, 1, 0, b, c, a,
                                                                     False, 1, integrate._zeros_func)
             y[0] = y_new[0, :, 0]
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
             tmp_R[ti] = qr[1].copy()
 
@@ -1239,11 +1418,11 @@ def _compute_clv_gin_jit(f, fjac, pretime, time, aftertime, mdt, ic, n_vec, writ
         for ti, (tt, dt) in enumerate(zip(aftertime[:-1], np.diff(aftertime))):
 
             subtime = np.concatenate((np.arange(tt, tt + dt, mdt), np.full((1,), tt + dt)))
-            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, Id, 1, 0, b, c, a,
+            tg[0] = q
+            y_new, prop = integrate._integrate_runge_kutta_tgls_jit(f, fjac, subtime, y, tg, 1, 0, b, c, a,
                                                                     False, 1, integrate._zeros_func)
             y[0] = y_new[0, :, 0]
-            q_new = prop[0, :, :, 0] @ q
-            qr = np.linalg.qr(q_new)
+            qr = np.linalg.qr(prop[0, :, :, 0])
             q = qr[0]
             tmp_R[ti+tw] = qr[1].copy()
 
@@ -1287,7 +1466,7 @@ def _compute_clv_gin_jit(f, fjac, pretime, time, aftertime, mdt, ic, n_vec, writ
 
 
 # Subspace intersection method
-@njit
+@njit(nogil=True)
 def _compute_clv_sub_jit(f, fjac, pretime, time, aftertime, mdt, ic, write_steps, b, c, a):
 
     n_traj = ic.shape[0]
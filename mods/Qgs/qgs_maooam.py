@@ -25,6 +25,7 @@ from multiprocessing import freeze_support, get_start_method
 from dapper.mods.Qgs.qgs.params.params import QgParams
 from dapper.mods.Qgs.qgs.integrators.integrator import RungeKuttaIntegrator
 from dapper.mods.Qgs.qgs.integrators.integrate import integrate_runge_kutta
+from dapper.mods.Qgs.qgs.integrators.trajectory import TrajectoryWriter
 from dapper.mods.Qgs.qgs.functions.tendencies import create_tendencies
 
 # Initializing the random number generator (for reproducibility). -- Disable if needed.
@@ -71,8 +72,10 @@ if __name__ == "__main__":
     # integration time on the attractor
     integration_time = 5.e5
     # file where to write the output
-    filename = "evol_fields.dat"
-    filename2 = "evol_fields2.dat"
+    filename = "evol_fields.npy"
+    filename2 = "evol_fields2.npy"
+    # precision of the output (np.float32 halves the size of the files)
+    dtype = np.float64
     T = time.process_time()
 
     # Setting some model parameters
@@ -125,29 +128,28 @@ if __name__ == "__main__":
 
     # Now integrate to obtain a trajectory on the attractor
     total_time = 0.
-    traj = np.insert(y, 0, total_time)
-    traj = traj[np.newaxis, ...]
-    traj1 = np.insert(y1, 0, total_time)
-    traj1 = traj1[np.newaxis, ...]
+    writer = TrajectoryWriter(filename, model_parameters.ndim, dtype=dtype)
+    writer.append(total_time, y)
+    writer1 = TrajectoryWriter(filename2, model_parameters.ndim, dtype=dtype)
+    writer1.append(total_time, y1)
     t_up = write_steps * dt / integration_time * 100
 
     print(Bcolors.OKBLUE + "Starting the time evolution ..." + Bcolors.ENDC)
     while total_time < integration_time:
         integrator.integrate(0., write_steps * dt, dt, ic=y, write_steps=0)
+        integrator.write_trajectories(writer, total_time)
         t, y = integrator.get_trajectories()
         t1,y1 = integrate_runge_kutta(f, 0., write_steps * dt, dt, ic=y1, write_steps=0)
         total_time += t
-        ty = np.insert(y, 0, total_time)
-        traj = np.concatenate((traj, ty[np.newaxis, ...]))
-        ty1 = np.insert(y, 0, total_time)
-        traj1 = np.concatenate((traj1, ty1[np.newaxis, ...]))
+        writer1.append(total_time, y1)
         if total_time/integration_time*100 % 0.1 < t_up:
             print_progress(total_time/integration_time)
 
-    print(Bcolors.OKGREEN + "Evolution finished, writing to file " + filename + Bcolors.ENDC)
+    print(Bcolors.OKGREEN + "Evolution finished, trajectories written to files " + filename + " and " + filename2
+          + Bcolors.ENDC)
 
-    np.savetxt(filename, traj)
-    np.savetxt(filename2, traj1)
+    writer.close()
+    writer1.close()
 
     print(Bcolors.OKGREEN + "Time clock :" + Bcolors.ENDC)
     print(str(time.process_time()-T)+' seconds')
@@ -23,6 +23,7 @@ from multiprocessing import freeze_support, get_start_method
 # Importing the model's modules
 from qgs.params.params import QgParams
 from qgs.integrators.integrator import RungeKuttaIntegrator
+from qgs.integrators.trajectory import TrajectoryWriter
 from qgs.functions.tendencies import create_tendencies
 
 # Initializing the random number generator (for reproducibility). -- Disable if needed.
@@ -69,7 +70,9 @@ if __name__ == "__main__":
     # integration time on the attractor
     integration_time = 1.e4
     # file where to write the output
-    filename = "evol_fields.dat"
+    filename = "evol_fields.npy"
+    # precision of the output (np.float32 halves the size of the file)
+    dtype = np.float64
     T = time.process_time()
 
     # Setting some model parameters
@@ -112,23 +115,22 @@ if __name__ == "__main__":
 
     # Now integrate to obtain a trajectory on the attractor
     total_time = 0.
-    traj = np.insert(y, 0, total_time)
-    traj = traj[np.newaxis, ...]
+    writer = TrajectoryWriter(filename, model_parameters.ndim, dtype=dtype)
+    writer.append(total_time, y)
     t_up = write_steps * dt / integration_time * 100
 
     print(Bcolors.OKBLUE + "Starting the time evolution ..." + Bcolors.ENDC)
     while total_time < integration_time:
         integrator.integrate(0., write_steps * dt, dt, ic=y, write_steps=0)
+        integrator.write_trajectories(writer, total_time)
         t, y = integrator.get_trajectories()
         total_time += t
-        ty = np.insert(y, 0, total_time)
-        traj = np.concatenate((traj, ty[np.newaxis, ...]))
         if total_time/integration_time*100 % 0.1 < t_up:
             print_progress(total_time/integration_time)
 
-    print(Bcolors.OKGREEN + "Evolution finished, writing to file " + filename + Bcolors.ENDC)
+    print(Bcolors.OKGREEN + "Evolution finished, trajectory written to file " + filename + Bcolors.ENDC)
 
-    np.savetxt(filename, traj)
+    writer.close()
 
     print(Bcolors.OKGREEN + "Time clock :" + Bcolors.ENDC)
     print(str(time.process_time()-T)+' seconds')
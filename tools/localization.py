@@ -6,8 +6,10 @@ Sakov (2011), Computational Geosciences:
 """
 
 import itertools
+from collections import OrderedDict
 
 import numpy as np
+from scipy.spatial import cKDTree
 
 
 def pairwise_distances(A, B=None, domain=None):
@@ -140,6 +142,35 @@ def dist2coeff(dists, radius, tag=None):
     return coeffs
 
 
+def taper_support(radius, tag=None, cutoff=1e-3):
+    """Compute the distance beyond which the `dist2coeff` coeffs. are `<= cutoff`.
+
+    Example
+    -------
+    >>> dists = np.linspace(0, 10, 1001)
+    >>> coeffs = dist2coeff(dists, 2, 'Gauss')
+    >>> (dists[coeffs > 1e-3] <= taper_support(2, 'Gauss')).all()
+    True
+    """
+    if tag is None:
+        tag = 'GC'
+
+    if tag == 'Gauss':
+        return radius * np.sqrt(2*np.log(1/cutoff))
+    elif tag == 'Exp':
+        return radius * (2*np.log(1/cutoff))**(1/3)
+    elif tag == 'Cubic':
+        return radius * 1.87
+    elif tag == 'Quadro':
+        return radius * 1.64
+    elif tag == 'GC':
+        return radius * 1.82 * 2
+    elif tag == 'Step':
+        return radius
+    else:
+        raise KeyError('No such coeff function.')
+
+
 def inds_and_coeffs(dists, radius, cutoff=1e-3, tag=None):
     """Compute indices and coefficients of localization.
 
@@ -180,6 +211,89 @@ def localization_setup(y2x_distances, batches):
     return localization_now
 
 
+def _within(tree, points, radius):
+    """Sorted indices of the pts. of `tree` within `radius` of any of the `points`."""
+    # Small margin, coz the distances are computed differently by the tree.
+    found = tree.query_ball_point(np.atleast_2d(points), radius*(1 + 1e-9))
+    return np.unique(np.concatenate([np.asarray(f, dtype=int) for f in found]))
+
+
+def neighbour_localization_setup(obs_coord, state_coord, batches, domain=None, maxsize=64):
+    """Like `localization_setup`, but without the dense distance matrix.
+
+    Only the pts. within the support of the taper (`taper_support`)
+    are considered, as found by (periodic, if `domain`) KD-trees.
+    The local indices and tapering coeffs. of each batch (or obs)
+    are cached per radius and tag, for each of the `maxsize` latest obs coordinates.
+    Thus, they are only computed once if the obs coordinates are static,
+    and only for new obs coordinates (and lazily) if they are time-dependent.
+    The outputs are the same as for `localization_setup`
+    (with `y2x_distances` computed by `pairwise_distances`).
+
+    Parameters
+    ----------
+    obs_coord: function
+        Obs coordinates (array of shape `(Ny, nDims)`) as a function of `t`.
+
+    state_coord: array of shape `(Nx, nDims)`
+        State coordinates.
+
+    batches: list
+        The state batches (arrays of indices).
+
+    domain: tuple
+        As for `pairwise_distances`.
+    """
+    def wrap(coord):
+        coord = np.asarray(coord, dtype=float)
+        return np.mod(coord, domain) if domain else coord
+
+    state_coord = wrap(state_coord)
+    state_tree  = cKDTree(state_coord, boxsize=domain)
+    setups      = OrderedDict()
+
+    def neighbours(t):
+        yc  = wrap(obs_coord(t))
+        key = yc.tobytes()
+        if key in setups:
+            setups.move_to_end(key)
+        else:
+            setups[key] = yc, cKDTree(yc, boxsize=domain), {}
+            if len(setups) > maxsize:
+                setups.popitem(last=False)
+        return setups[key]
+
+    def tabulate(table, key, points, tree, coord, radius, tag):
+        if key not in table:
+            near = _within(tree, points, taper_support(radius, tag))
+            dists = pairwise_distances(points, coord[near], domain).mean(axis=0)
+            inds, coeffs = inds_and_coeffs(dists, radius, tag=tag)
+            inds = near[inds]
+            inds.flags.writeable = coeffs.flags.writeable = False
+            table[key] = inds, coeffs
+        return table[key]
+
+    def localization_now(radius, direction, t, tag=None):
+        """Provide localization setup for time t."""
+        yc, obs_tree, tables = neighbours(t)
+        table = tables.setdefault((radius, direction, tag), {})
+
+        if direction == 'x2y':
+            def obs_taperer(batch):
+                key = np.asarray(batch).tobytes()
+                return tabulate(table, key, state_coord[batch],
+                                obs_tree, yc, radius, tag)
+            return batches, obs_taperer
+
+        elif direction == 'y2x':
+            def state_taperer(obs_idx):
+                return tabulate(table, obs_idx, yc[obs_idx],
+                                state_tree, state_coord, radius, tag)
+            return state_taperer
+
+    return localization_now
+
+
 def no_localization(Nx, Ny):
 
     def obs_taperer(batch):
@@ -277,7 +391,10 @@ def nd_Id_localization(shape,
                        batch_shape=None,
                        obs_inds=None,
                        periodic=True):
-    """Localize Id (direct) point obs of an N-D, homogeneous, rectangular domain."""
+    """Localize Id (direct) point obs of an N-D, homogeneous, rectangular domain.
+
+    Uses `neighbour_localization_setup`.
+    """
     M = np.prod(shape)
 
     if batch_shape is None:
@@ -292,8 +409,8 @@ def nd_Id_localization(shape,
 
     state_coord = ind2sub(np.arange(M))
 
-    def y2x_distances(t):
-        obs_coord = ind2sub(safe_eval(obs_inds, t))
-        return pairwise_distances(obs_coord, state_coord, shape if periodic else None)
+    def obs_coord(t):
+        return ind2sub(safe_eval(obs_inds, t))
 
-    return localization_setup(y2x_distances, batches)
+    return neighbour_localization_setup(obs_coord, state_coord, batches,
+                                        tuple(shape) if periodic else None)
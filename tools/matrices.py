@@ -175,12 +175,154 @@ def chol_reduce(Right):
     return R
 
 
+class StructuredMat:
+    """Base class of matrices stored (and multiplied) in compact form.
+
+    Subclasses define `shape`, `.T` and `@` (from either side),
+    so that they can stand in for the ndarray in expressions such as
+    `Y @ R.sym_sqrt_inv.T` or `R.inv @ Y.T`, whose results are ndarrays.
+    Other operations (`+`, indexing, `np.asarray`) densify (only) what they need.
+    """
+
+    # Make ndarray defer its operators (e.g. `A @ self`) to ours.
+    __array_ufunc__ = None
+    ndim = 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self @ np.eye(self.shape[1]), dtype=dtype)
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, slice(None))
+        ii = np.arange(len(self))[rows]
+        E  = zeros((np.size(ii), len(self)))
+        E[np.arange(np.size(ii)), np.ravel(ii)] = 1
+        return (E @ self).reshape(np.shape(ii) + (-1,))[..., cols]
+
+    def __add__(self, B):
+        return np.asarray(self) + B
+
+    def __radd__(self, B):
+        return B + np.asarray(self)
+
+    def __sub__(self, B):
+        return np.asarray(self) - B
+
+    def __rsub__(self, B):
+        return B - np.asarray(self)
+
+
+class DiagMat(StructuredMat):
+    """Diagonal matrix, stored as its diagonal `d`.
+
+    A constant `d` is stored as a scalar (i.e. scalar times identity),
+    in which case the size `M` must be specified (if `d` is scalar).
+    All of `@`, `*`, `/` and `.T` are O(M).
+    """
+
+    def __init__(self, d, M=None):
+        d = np.asarray(d, dtype=float)
+        if M is None:
+            M = len(d)
+        if d.ndim == 1 and len(d) and np.all(d == d[0]):
+            d = d[0]
+        self.d     = d
+        self.shape = (M, M)
+
+    @property
+    def diag(self):
+        """The diagonal (as a vector, also if stored as a scalar)."""
+        return self.d * ones(len(self))
+
+    @property
+    def T(self):
+        return self
+
+    def __matmul__(self, B):
+        B = np.asarray(B)
+        if self.d.ndim == 0 or B.ndim == 1:
+            return self.d * B
+        return self.d[:, None] * B
+
+    def __rmatmul__(self, A):
+        return np.asarray(A) * self.d
+
+    def __mul__(self, c):
+        if np.ndim(c) == 0:
+            return DiagMat(self.d * c, len(self))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, c):
+        if np.ndim(c) == 0:
+            return DiagMat(self.d / c, len(self))
+        return NotImplemented
+
+    def __add__(self, B):
+        if isinstance(B, DiagMat):
+            return DiagMat(self.d + B.d, len(self))
+        C = np.array(np.broadcast_to(B, self.shape), dtype=float)
+        C[np.diag_indices(len(self))] += self.d
+        return C
+
+    __radd__ = __add__
+
+
+class BlockDiagMat(StructuredMat):
+    """Block-diagonal matrix, stored as its list of `blocks`.
+
+    The blocks may be (rectangular) arrays or `StructuredMat`s.
+    Products are computed block-by-block.
+    """
+
+    def __init__(self, blocks):
+        self.blocks = [b if isinstance(b, StructuredMat) else np.atleast_2d(b)
+                       for b in blocks]
+        self._rows  = np.cumsum([0] + [b.shape[0] for b in self.blocks])
+        self._cols  = np.cumsum([0] + [b.shape[1] for b in self.blocks])
+        self.shape  = (self._rows[-1], self._cols[-1])
+
+    @property
+    def T(self):
+        return BlockDiagMat([b.T for b in self.blocks])
+
+    def __matmul__(self, B):
+        B = np.asarray(B)
+        return np.concatenate([b @ B[i0:i1] for b, i0, i1 in
+                               zip(self.blocks, self._cols[:-1], self._cols[1:])])
+
+    def __rmatmul__(self, A):
+        A = np.asarray(A)
+        return np.concatenate([A[..., i0:i1] @ b for b, i0, i1 in
+                               zip(self.blocks, self._rows[:-1], self._rows[1:])],
+                              axis=-1)
+
+    def __mul__(self, c):
+        if np.ndim(c) == 0:
+            return BlockDiagMat([c*b for b in self.blocks])
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, c):
+        if np.ndim(c) == 0:
+            return BlockDiagMat([b/c for b in self.blocks])
+        return NotImplemented
+
+
 class CovMat():
     """Covariance matrix class.
 
     Main tasks:
 
-    - Unify the covariance representations: full, diagonal, reduced-rank sqrt.
+    - Unify the covariance representations: full, diagonal, block-diagonal,
+      reduced-rank sqrt.
+    - Keep the diagonal and block-diagonal ones compact:
+      their transformations (`sym_sqrt_inv`, `inv`, `Right`, ...)
+      are `StructuredMat`s, while `full` is only computed on demand.
     - Streamline init. and printing.
     - Convenience transformations with caching/memoization.
       This (hiding it internally) would be particularly useful
@@ -199,6 +341,7 @@ class CovMat():
             --------|-------------
             'full'  | full M-by-M array (P)
             'diag'  | diagonal of P (assumed diagonal)
+            'blocks'| list of the diagonal blocks of P (each a valid `CovMat` input)
             'E'     | ensemble (N-by-M) with sample cov P
             'A'     | as 'E', but pre-centred by mean(E,axis=0)
             'Right' | any R such that P = R.T@R (e.g. weighted form of 'A')
@@ -245,27 +388,18 @@ class CovMat():
                 V           = (V.T[-rk:][::-1]).T
                 self._assign_EVD(M, rk, d, V)
             elif kind == 'diag':
-                # With diagonal input, it would be great to use a sparse
-                # (or non-existant) representation of V,
-                # but that would require so much other adaption of other code.
+                # Stored as a DiagMat (a scalar if constant).
+                # The (permutation) eigenvectors are only made if requested.
                 d         = np.atleast_1d(data)
                 assert d.ndim == 1
                 self.diag = d
-                M         = len(d)
-                if np.all(d == d[0]):
-                    V   = np.eye(M)
-                    rk  = M
-                else:
-                    # Clip and sort diag
-                    d   = CovMat._clip(d)
-                    idx = np.argsort(d)[::-1]
-                    rk  = (d > 0).sum()
-                    # Sort d
-                    d = d[idx][:rk]
-                    # Make rectangular V that un-sorts d
-                    V = zeros((M, rk))
-                    V[idx[:rk], np.arange(rk)] = 1
-                self._assign_EVD(M, rk, d, V)
+                self._D   = DiagMat(d)
+                self._m   = len(d)
+            elif kind == 'blocks':
+                B         = [C if isinstance(C, CovMat) else CovMat(C) for C in data]
+                self.diag = np.concatenate([C.diag for C in B])
+                self._B   = B
+                self._m   = len(self.diag)
             else:
                 raise KeyError
 
@@ -299,6 +433,10 @@ class CovMat():
         """Full covariance matrix"""
         if hasattr(self, '_C'):
             return self._C
+        elif hasattr(self, '_D'):
+            C = np.diag(self.diag)
+        elif hasattr(self, '_B'):
+            C = sla.block_diag(*[B.full for B in self._B])
         else:
             C = self.Left @ self.Left.T
         self._C = C
@@ -323,6 +461,10 @@ class CovMat():
         """
         if hasattr(self, '_R'):
             return self._R.T
+        elif hasattr(self, '_D'):
+            return DiagMat(sqrt(self._D.d), self.M)
+        elif hasattr(self, '_B'):
+            return BlockDiagMat([B.Left for B in self._B])
         else:
             return self.V * sqrt(self.ews)
 
@@ -331,6 +473,10 @@ class CovMat():
         """Right sqrt. Ref `CovMat.Left`."""
         if hasattr(self, '_R'):
             return self._R
+        elif hasattr(self, '_D'):
+            return self.Left
+        elif hasattr(self, '_B'):
+            return BlockDiagMat([B.Right for B in self._B])
         else:
             return self.Left.T
 
@@ -348,7 +494,19 @@ class CovMat():
         return np.where(d < 1e-8*d.max(), 0, d)
 
     def _do_EVD(self):
-        if not self.has_done_EVD():
+        if self.has_done_EVD():
+            pass
+        elif hasattr(self, '_D') or hasattr(self, '_B'):
+            # Only sort the eigenvalues. The eigenvectors are made by `V`.
+            if hasattr(self, '_D'):
+                d = CovMat._clip(self.diag)
+            else:
+                d = np.concatenate([B.ews for B in self._B])
+            idx       = np.argsort(-d, kind='stable')
+            rk        = (d > 0).sum()
+            self._idx = idx[:rk]
+            self._assign_EVD(self.M, rk, d[self._idx], None)
+        else:
             V, s, UT = svd0(self._R)
             M        = UT.shape[1]
             d        = s**2
@@ -372,6 +530,13 @@ class CovMat():
     def V(self):
         """Eigenvectors, output corresponding to ews."""
         self._do_EVD()
+        if self._V is None:
+            if hasattr(self, '_D'):
+                V = zeros((self.M, self.rk))
+                V[self._idx, np.arange(self.rk)] = 1
+            else:
+                V = sla.block_diag(*[B.V for B in self._B])[:, self._idx]
+            self._V = V
         return self._V
 
     @property
@@ -384,8 +549,24 @@ class CovMat():
     # transform_by properties
     ##################################
     def transform_by(self, fun):
-        """Generalize scalar functions to covariance matrices (via Taylor expansion)."""
+        """Generalize scalar functions to covariance matrices (via Taylor expansion).
+
+        Returns a `StructuredMat` for the compact kinds,
+        in which case (for 'blocks') the truncation is applied block-wise.
+        """
+        if hasattr(self, '_B'):
+            mats = []
+            for B in self._B:
+                B._trunc = self.trunc
+                mats.append(B.transform_by(fun))
+            return BlockDiagMat(mats)
+
         r = truncate_rank(self.ews, self.trunc, True)
+        if hasattr(self, '_D'):
+            w = zeros(self.M)
+            w[self._idx[:r]] = fun(self.ews[:r])
+            return DiagMat(w)
+
         V = self.V[:, :r]
         w = self.ews[:r]
 
@@ -445,7 +626,7 @@ class CovMat():
             # Only compute corners of full matrix
             K  = np.get_printoptions()['edgeitems']
             s += " (only computing/printing corners)"
-            if hasattr(self, '_R'):
+            if not hasattr(self, '_V') or self._V is None:
                 U = self.Left[:K, :]  # Upper
                 L = self.Left[-K:, :]  # Lower
             else:
@@ -475,23 +656,3 @@ class CovMat():
 
         s = "<" + type(self).__name__ + '>' + s.replace("\n", "\n  ")
         return s
-
-# Note: The diagonal representation is NOT memory-efficient.
-#
-# But there's no simple way of making so, especially since the sparse class
-# (which would hold the eigenvectors) is a subclass of the matrix class,
-# which interprets * as @, and so, when using this class,
-# one would have to be always careful about it
-#
-# One could try to overload +-@/ (for CovMat),
-# but unfortunately there's no right/post-application version of @ and /
-# (indeed, how could there be for binary operators?)
-# which makes this less interesting.
-# Hopefully this restriction is not an issue,
-# as diagonal matrices are mainly used for observation error covariance,
-# which are usually not infeasibly large.
-#
-# Another potential solution is to subclass the sparse matrix,
-# and revert its operator definitions to that of ndarray.
-# and use it for the V (eigenvector) matrix that gets output
-# by various fields of CovMat.
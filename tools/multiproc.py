@@ -1,6 +1,15 @@
-"""Paralellisation via multiprocessing. Wraps pool.map for convenience."""
+"""Paralellisation via multiprocessing. Wraps pool.map for convenience.
+
+The pool is either created for a single call of `map`,
+or persistent: while a `Pool` is active (`with Pool(): ...`),
+`map` and `map_members` reuse its worker processes,
+which are only started at the first call.
+"""
 
 import functools
+from multiprocessing import shared_memory
+
+import numpy as np
 
 # Multiprocessing requries pickling. The package 'dill' is able to
 # pickle much more than basic pickle (e.g. nested functions),
@@ -43,6 +52,130 @@ import threadpoolctl
 threadpoolctl.threadpool_limits(1)
 
 
+NMAX = max(1, mpd.cpu_count() - 1)  # Be nice
+
+# The pool used by map() and map_members(), if any (see Pool)
+_active_pool = None
+
+
+class Pool:
+    """A persistent pool of processes, reused by `map` and `map_members`.
+
+    Creating a pool (and pickling the data for its workers) at every call
+    of `map`, e.g. at every forecast step, is often the dominant overhead
+    of parallel runs. Instead, use
+
+    >>> with Pool() as pool:  # doctest: +SKIP
+    ...     for k in range(K):
+    ...         E = map_members(step, E, t=t, dt=dt)
+
+    While it is active (within the `with` block), the pool is used
+    by all the calls of `map` and `map_members`, also those made by
+    the model or the DA method. The worker processes are only started
+    at the first call, so that an unused pool costs nothing.
+
+    The ensemble passed to `map_members` is placed in a shared memory
+    block, kept across the calls, in which the workers write their
+    members in place. Only the member indices (and `func`) are pickled.
+    """
+
+    def __init__(self, NPROC=None):
+        self.NPROC = NMAX if NPROC is None else NPROC
+        self._pool = None
+        self._shm = None
+        self._previous = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = mpd.Pool(self.NPROC)
+        return self._pool
+
+    def _run(self, func, xx):
+        try:
+            return self._get_pool().map(func, xx)
+        except Exception:
+            self.terminate()
+            raise
+
+    def map(self, func, xx, **kwargs):
+        """Like `map`, with the processes of this pool."""
+        f = functools.partial(func, **kwargs)  # Fix kwargs
+        # map vs imap: https://stackoverflow.com/a/26521507
+        return self._run(f, xx)
+
+    def map_members(self, func, E, **kwargs):
+        """Like `map_members`, with the processes of this pool."""
+        E = np.asarray(E)
+        if self._shm is None or self._shm.size < E.nbytes:
+            self._release_shared_memory()
+            self._shm = shared_memory.SharedMemory(create=True, size=max(E.nbytes, 1))
+        shared = np.ndarray(E.shape, dtype=E.dtype, buffer=self._shm.buf)
+        shared[:] = E
+
+        chunks = np.array_split(np.arange(len(E)), self.NPROC)
+        tasks = [(func, kwargs, self._shm.name, E.shape, E.dtype.str, ii)
+                 for ii in chunks if len(ii)]
+        self._run(_map_members_chunk, tasks)
+
+        E = shared.copy()
+        del shared
+        return E
+
+    def _release_shared_memory(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def close(self):
+        """Wait for the workers to finish, and release the resources."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._release_shared_memory()
+
+    def terminate(self):
+        """Stop the workers immediately, and release the resources."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._release_shared_memory()
+
+    def __enter__(self):
+        global _active_pool
+        self._previous = _active_pool
+        _active_pool = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_pool
+        _active_pool = self._previous
+        self._previous = None
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+# Shared memory blocks attached by a worker, such that
+# the block reused by a Pool is only attached once.
+_attached = {}
+
+
+def _map_members_chunk(args):
+    func, kwargs, name, shape, dtype, ii = args
+    if name not in _attached:
+        for shm in _attached.values():
+            shm.close()
+        _attached.clear()
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    E = np.ndarray(shape, dtype=dtype, buffer=_attached[name].buf)
+    for n in ii:
+        E[n] = func(E[n], **kwargs)
+
+
 def map(func, xx, **kwargs):  # noqa
     """A parallelized version of map.
 
@@ -53,8 +186,8 @@ def map(func, xx, **kwargs):  # noqa
     - KeyboardInterrupt (not any more)
 
     Note: in contrast to reading operations, writing "in-place"
-    does not work with multiprocessing. This changes with
-    "shared" arrays, but this has not been tried out here.
+    does not work with multiprocessing, except in "shared" arrays
+    (see `map_members`).
     By contrast, multithreading shares the memory,
     but was significantly slower in the tested (pertinent) cases.
 
@@ -64,22 +197,35 @@ def map(func, xx, **kwargs):  # noqa
         In fact, `func` should not reference `self` at all,
         because its serialization is rather slow.
 
-    See example use in `dapper.mods.QG`
+    If a `Pool` is active, its processes are used
+    (and `NPROC` is ignored). Otherwise, a pool is created
+    for this call only.
+
+    See example use in `dapper.da_methods.LETKF`
     """
-    NMAX = mpd.cpu_count() - 1  # Be nice
     NPROC = kwargs.pop("NPROC", NMAX)
-    pool = mpd.Pool(NPROC)
+    if _active_pool is not None:
+        return _active_pool.map(func, xx, **kwargs)
 
-    try:
-        f = functools.partial(func, **kwargs)  # Fix kwargs
+    with Pool(NPROC) as pool:
+        return pool.map(func, xx, **kwargs)
 
-        # map vs imap: https://stackoverflow.com/a/26521507
-        result = pool.map(f, xx)
 
-    except Exception:
-        pool.terminate()
-        pool.close()
-        pool.join()
-        raise
+def map_members(func, E, **kwargs):
+    """A parallelized version of `[func(x, **kwargs) for x in E]`, for ensembles.
+
+    The ensemble `E` (2D array) is placed in shared memory, where each
+    worker replaces its members `E[n]` by `func(E[n], **kwargs)` in place.
+    Hence `func` must return an array of the shape of the members.
+    Returns the new ensemble (`E` itself is not modified).
+
+    Uses the active `Pool` if any, as `map`.
+
+    See example use in `dapper.mods.QG`
+    """
+    NPROC = kwargs.pop("NPROC", NMAX)
+    if _active_pool is not None:
+        return _active_pool.map_members(func, E, **kwargs)
 
-    return result
+    with Pool(NPROC) as pool:
+        return pool.map_members(func, E, **kwargs)
@@ -0,0 +1,287 @@
+"""Cache of the simulated truth and obs, shared across experiments.
+
+Used by `dapper.xp_launch.seed_and_simulate`, so that the experiments
+(e.g. a sweep over the configurations of DA methods) that share the same HMM
+and seed only simulate the truth and obs once.
+
+The cache is content-addressed: the key is a hash of the content of the HMM
+(see `fingerprint`), its chronology and the seed. The simulations are stored on disk
+(in `rc.dirs.simulations`), from where they are memory-mapped (copy-on-write).
+Thus they are shared (via the OS page cache) by the processes of
+a local multiprocessing launch, and re-used by later runs.
+The least recently used simulations are deleted when the cache exceeds `max_size`.
+
+NB: The functions of libraries (e.g. numpy), and files (e.g. `RV(file=...)`),
+are only identified by their names. Use `clear` after modifying them.
+HMMs holding other objects of libraries, whose pickle is not known to be reproducible,
+are not cached. Disable the cache with `rc.simcache = False`.
+"""
+
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import sysconfig
+import tempfile
+import types
+from pathlib import Path
+
+import dill
+import numpy as np
+import numpy.random as rnd
+
+from dapper.dpr_config import rc
+from dapper.tools.matrices import CovMat, lazy_property
+
+# Maximum size (bytes) of the cache on disk
+max_size = 2**32
+
+# Simulations that could not be stored on disk
+_memory = {}
+
+
+_LIB_DIRS = tuple({sysconfig.get_paths()[k]
+                   for k in ['stdlib', 'platstdlib', 'purelib', 'platlib']})
+
+
+def _is_library(module_name):
+    top  = (module_name or "").partition('.')[0]
+    if top in ['dapper', '__main__']:
+        return False
+    file = getattr(sys.modules.get(top), '__file__', None)
+    return file is None or file.startswith(_LIB_DIRS)
+
+
+# Libraries whose objects (without a more specific treatment) pickle reproducibly
+_PICKLED_LIBS = ['builtins', 'datetime', 'decimal', 'fractions', 'pathlib', 'numpy', 'scipy']
+
+
+def _code_names(code):
+    names = set(code.co_names)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            names |= _code_names(c)
+    return names
+
+
+def _cell_contents(cells):
+    contents = []
+    for c in cells or ():
+        try:
+            contents.append(c.cell_contents)
+        except ValueError:  # empty cell
+            contents.append(None)
+    return contents
+
+
+def fingerprint(obj):
+    """Hash (hex) of the content of `obj`, typically an HMM.
+
+    As opposed to its pickle, it does not depend on the process,
+    on object identities, or on lazily computed attributes.
+    Functions are identified by their code, defaults, closure,
+    and the globals they refer to (except for the functions of libraries),
+    and so are the jitted functions (e.g. of numba), via their `py_func`.
+
+    Raises `TypeError` if `obj` holds an object (of a library)
+    whose pickle is not known to be reproducible.
+    """
+    h    = hashlib.sha1()
+    # Index of the objects already seen.
+    # Also keeps them alive, so that their ids are not re-used.
+    seen = {}
+
+    def put(*args):
+        h.update(repr(args).encode())
+
+    def dig(o):
+        if o is None or isinstance(o, (bool, int, float, complex, str, bytes, np.generic)):
+            put(type(o).__name__, o)
+            return
+        if isinstance(o, (types.ModuleType, type)):
+            put(getattr(o, '__module__', None), getattr(o, '__qualname__', o.__name__))
+            return
+        if isinstance(o, types.CodeType):
+            put(o.co_code, o.co_names)
+            for c in o.co_consts:
+                dig(c)
+            return
+        if id(o) in seen:
+            put('seen', seen[id(o)][0])
+            return
+        seen[id(o)] = len(seen), o
+
+        if isinstance(o, np.ndarray):
+            if o.dtype == object:
+                dig(o.tolist())
+            else:
+                put('ndarray', o.dtype.str, o.shape)
+                h.update(np.ascontiguousarray(o).tobytes())
+        elif isinstance(o, CovMat):
+            put('CovMat', o.kind, o.trunc)
+            dig(o.Right)
+        elif isinstance(o, dict):
+            put('dict', len(o))
+            for k in sorted(o, key=repr):
+                dig(k)
+                dig(o[k])
+        elif isinstance(o, (list, tuple)):
+            put(type(o).__name__, len(o))
+            for x in o:
+                dig(x)
+        elif isinstance(o, (set, frozenset)):
+            put(type(o).__name__, sorted(fingerprint(x) for x in o))
+        elif isinstance(o, types.FunctionType):
+            put('function', o.__module__, o.__qualname__)
+            if not _is_library(o.__module__):
+                code = o.__code__
+                dig(code)
+                dig((o.__defaults__, o.__kwdefaults__, vars(o)))
+                dig(_cell_contents(o.__closure__))
+                dig({n: o.__globals__[n] for n in _code_names(code) if n in o.__globals__})
+        elif isinstance(o, types.MethodType):
+            dig((o.__func__, o.__self__))
+        elif isinstance(o, functools.partial):
+            dig((o.func, o.args, o.keywords))
+        elif isinstance(getattr(o, 'py_func', None), types.FunctionType):
+            # Jitted function. Its pickle holds a uuid, which changes with the process.
+            put('jitted', type(o).__qualname__)
+            dig((o.py_func, getattr(o, 'targetoptions', None)))
+        elif hasattr(o, '__dict__') and not _is_library(type(o).__module__):
+            put(type(o).__module__, type(o).__qualname__)
+            dig({k: v for k, v in vars(o).items()
+                 if not isinstance(getattr(type(o), k, None), lazy_property)})
+        elif (type(o).__module__ or "").partition('.')[0] in _PICKLED_LIBS:
+            try:
+                put(type(o).__qualname__, pickle.dumps(o))
+            except Exception:
+                raise TypeError(f"Cannot fingerprint {type(o)}")
+        else:
+            raise TypeError(f"Cannot fingerprint {type(o)}")
+
+    dig(obj)
+    return h.hexdigest()
+
+
+def key(HMM, seed):
+    """Content-address of the simulation of `HMM` with `seed`.
+
+    Returns `None` if the cache is disabled (`rc.simcache`),
+    if the simulation is not reproducible,
+    i.e. if `seed` is not an `int` (e.g. `None`, `False` or `"clock"`),
+    or if `HMM` cannot be fingerprinted.
+    """
+    if not rc.simcache:
+        return None
+    if isinstance(seed, bool) or not isinstance(seed, (int, np.integer)):
+        return None
+    try:
+        return fingerprint((HMM, str(HMM.tseq), int(seed)))
+    except TypeError:
+        return None
+
+
+def load(k):
+    """Load (memory-mapped, copy-on-write) the simulation `(xx, yy, rng_state)`.
+
+    The arrays are new for each call, so that modifying them in place
+    affects neither the cache nor the other users (experiments).
+
+    Returns `None` if it is not in the cache.
+    """
+    if k in _memory:
+        xx, yy, state = _memory[k]
+        return xx.copy(), yy.copy(), state
+    path = rc.dirs.simulations / k
+    try:
+        xx = np.load(path/"xx.npy", mmap_mode="c")
+        yy = np.load(path/"yy.npy", mmap_mode="c")
+        with open(path/"rng.pkl", "rb") as f:
+            state = dill.load(f)
+    except (OSError, EOFError):
+        return None
+    # Mark as recently used
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return xx, yy, state
+
+
+def save(k, xx, yy, state):
+    """Store the simulation `(xx, yy)`, and the random state after it."""
+    path = rc.dirs.simulations / k
+    if not path.exists():
+        # Write to a tmp dir and rename it, coz other processes may be reading.
+        tmp = Path(tempfile.mkdtemp(dir=rc.dirs.simulations))
+        np.save(tmp/"xx.npy", xx)
+        np.save(tmp/"yy.npy", yy)
+        with open(tmp/"rng.pkl", "wb") as f:
+            dill.dump(state, f)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another process was quicker
+            shutil.rmtree(tmp)
+        evict(keep=k)
+    if load(k) is None:
+        # Failed to store, so keep (a copy) in memory
+        _memory[k] = xx.copy(), yy.copy(), state
+
+
+def evict(keep=None):
+    """Delete the least recently used simulations until the cache is below `max_size`.
+
+    The simulation `keep` is not deleted.
+    """
+    entries = []
+    for path in rc.dirs.simulations.iterdir():
+        # Skip the tmp dirs (being written)
+        if path.name.startswith("tmp"):
+            continue
+        try:
+            size = sum(f.stat().st_size for f in path.iterdir())
+            entries.append((path.stat().st_mtime, size, path))
+        except OSError:
+            continue
+
+    entries.sort()
+    size = sum(s for _, s, _ in entries)
+    for _, s, path in entries:
+        if size <= max_size:
+            break
+        if path.name != keep:
+            shutil.rmtree(path, ignore_errors=True)
+            size -= s
+
+
+def simulate(HMM, seed):
+    """Do `HMM.simulate()`, or load it from the cache.
+
+    The random number generator must have been seeded with `seed`.
+    In case of a cache hit, its state is set to that after the simulation,
+    so that the subsequent DA is not affected by the caching.
+    """
+    k = key(HMM, seed)
+
+    if k is not None:
+        cached = load(k)
+        if cached is not None:
+            xx, yy, state = cached
+            rnd.set_state(state)
+            return xx, yy
+
+    xx, yy = HMM.simulate()
+
+    if k is not None:
+        save(k, xx, yy, rnd.get_state())
+    return xx, yy
+
+
+def clear():
+    """Empty the cache (also on disk)."""
+    _memory.clear()
+    shutil.rmtree(rc.dirs.simulations, ignore_errors=True)
+    os.makedirs(rc.dirs.simulations, exist_ok=True)
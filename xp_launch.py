@@ -22,6 +22,7 @@ from tqdm.auto import tqdm
 
 import dapper.stats
 import dapper.tools.progressbar as pb
+import dapper.tools.simcache as simcache
 from dapper.tools.colors import stripe
 from dapper.tools.datafiles import create_run_dir
 from dapper.tools.remote.uplink import submit_job_GCP
@@ -52,13 +53,17 @@ def seed_and_simulate(HMM, xp):
             by setting the seed at the outset of the script.
             To avoid even that, set `xp.seed to `None` or `"clock"`.
 
+    The truth and obs are cached (see `dapper.tools.simcache`) if `xp.seed` is an `int`,
+    such that they are only simulated once for all the `xp`s with the same seed.
+
     Returns
     -------
     tuple (xx, yy)
         The simulated truth and observations.
     """
-    set_seed(getattr(xp, 'seed', False))
-    xx, yy = HMM.simulate()
+    seed = getattr(xp, 'seed', False)
+    set_seed(seed)
+    xx, yy = simcache.simulate(HMM, seed)
     return HMM, xx, yy
 
 
@@ -437,6 +442,19 @@ class xpList(list):
             - If this dict field is empty, then all python files
               in `sys.path[0]` are uploaded.
 
+        With the default `setup` (`seed_and_simulate`), the truth and obs are
+        cached (`dapper.tools.simcache`), so they are simulated once per seed,
+        also with local multiprocessing (where the seeds shared by several `xp`s
+        are simulated by the caller, before starting the processes). Example:
+
+        >>> xps = xpList()
+        >>> for N in [10, 20, 30]:  # doctest: +SKIP
+        ...     for sd in [3000, 3001]:
+        ...         xp = EnKF('Sqrt', N, infl=1.02)
+        ...         xp.seed = sd
+        ...         xps += xp
+        >>> xps.launch(HMM, mp=True)  # 2 simulations, not 6  # doctest: +SKIP
+
         See `examples/basic_2.py` and `examples/basic_3.py` for example use.
         """
         # Parse mp option
@@ -477,6 +495,18 @@ class xpList(list):
                 run_experiment(xp, None, xpi_dir(ixp), **kwargs)
             args = zip(self, range(len(self)))
 
+            # Simulate (once, and cache) the truths shared by several xps,
+            # rather than in several processes at once.
+            if kwargs.get("setup", seed_and_simulate) is seed_and_simulate:
+                seeds  = [getattr(xp, 'seed', False) for xp in self]
+                shared = {}
+                for sd, xp in zip(seeds, self):
+                    if seeds.count(sd) > 1:
+                        shared.setdefault(sd, xp)
+                for sd, xp in shared.items():
+                    if simcache.key(HMM, sd):
+                        seed_and_simulate(copy.deepcopy(HMM), xp)
+
             pb.disable_progbar          = True
             pb.disable_user_interaction = True
             NPROC = mp.get("NPROC", None)  # None => mp.cpu_count()